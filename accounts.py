@@ -0,0 +1,133 @@
+"""
+Accounts logged in to the website. Each account has its own cookies, signing session,
+HTTP client and rate limits, so that the throughput grows with the number of accounts.
+"""
+import asyncio
+import contextlib
+import functools
+import logging
+import time
+
+import httpx
+
+from rate_limit import RateScheduler
+from schema import status_adapter
+
+# The website responds these HTTP status codes when an account has to pass a captcha.
+blocked_status_codes = {461, 471}
+# The website responds "success: false" with these codes when an account is logged out
+# or banned.
+logged_out_codes = {-100, -104}
+
+
+class Account:
+    def __init__(self, name: str, cookies: dict, client: httpx.AsyncClient,
+                 rates: dict[str, tuple[float, int]], expires_at: float = float("inf"),
+                 max_details_in_flight: int = 4):
+        """
+        Args:
+            name: name in logs, e.g. file name of the cookies.
+            cookies: dict of cookies.
+            client: HTTP client sending the cookies.
+            rates: rate limits of this account, see RateScheduler.
+            expires_at: time (time.time) when the cookies expire.
+            max_details_in_flight: politeness limit of this account: no matter how many
+            workers each tool call asks for, at most this number of post pages are
+            downloaded at the same time.
+        """
+        self.name = name
+        self.cookies = cookies
+        self.client = client
+        self.rate_scheduler = RateScheduler(rates)
+        self.expires_at = expires_at
+        self.details_in_flight = asyncio.Semaphore(max_details_in_flight)
+        self.in_flight = 0
+        self.blocked = False
+
+    @functools.cached_property
+    def xhs_session(self):
+        """
+        Signing session of xhshow, created when the first request is signed.
+        """
+        from xhshow import SessionManager
+
+        return SessionManager()
+
+    @property
+    def healthy(self) -> bool:
+        return not self.blocked and time.time() < self.expires_at
+
+    def check(self, response: httpx.Response):
+        """
+        Stop using the account if the website asks for a captcha or the account is
+        logged out.
+        """
+        if response.status_code in blocked_status_codes:
+            reason = f"HTTP {response.status_code}"
+        elif (response.status_code == 200
+              and "json" in response.headers.get("content-type", "")
+              and status_adapter.validate_json(response.content)['code']
+              in logged_out_codes):
+            reason = status_adapter.validate_json(response.content)['msg']
+        else:
+            return
+        if not self.blocked:
+            logging.warning(f"Account {self.name} is removed from the pool: {reason}")
+        self.blocked = True
+
+
+class AccountPool:
+    """
+    Spread requests over healthy accounts, preferring the one with fewest requests in
+    flight.
+    """
+
+    def __init__(self, accounts: list[Account]):
+        assert accounts, "At least one account is required."
+        self.accounts = accounts
+        self.next_index = 0
+
+    def healthy(self) -> list[Account]:
+        return [account for account in self.accounts if account.healthy]
+
+    def pick(self, prefer: str = None) -> Account:
+        """
+        Args:
+            prefer: name of the account to use if it's healthy, e.g. the account which
+            fetched previous pages.
+        """
+        healthy = self.healthy()
+        assert healthy, ("Every account is expired or blocked. Please update the cookies "
+                         "and restart MCP server.")
+        for account in healthy:
+            if account.name == prefer:
+                return account
+        # Rotate the starting point, so that idle accounts are used in turn.
+        self.next_index += 1
+        start = self.next_index % len(healthy)
+        rotated = healthy[start:] + healthy[:start]
+        return min(rotated, key=lambda account: account.in_flight)
+
+    @contextlib.asynccontextmanager
+    async def use(self, prefer: str = None):
+        """
+        Borrow an account for a series of requests, e.g. pages of the same query.
+        """
+        account = self.pick(prefer)
+        account.in_flight += 1
+        try:
+            yield account
+        finally:
+            account.in_flight -= 1
+
+    def status(self) -> list[dict]:
+        return [{"name": account.name, "healthy": account.healthy,
+                 "blocked": account.blocked, "in_flight": account.in_flight,
+                 "expires_at": (time.strftime("%Y-%m-%d %H:%M:%S %z",
+                                              time.localtime(account.expires_at))
+                                if account.expires_at < float("inf") else None)}
+                for account in self.accounts]
+
+    async def aclose(self):
+        for account in self.accounts:
+            await account.client.aclose()
@@ -0,0 +1,49 @@
+"""
+Throughput of "get_details_" with different numbers of accounts, under the default rate
+limits of each account, against the local stub server. Run from the root folder of this
+repository:
+    python -m benchmarks.accounts
+"""
+import asyncio
+import time
+from argparse import ArgumentParser
+
+import get_data
+from accounts import Account, AccountPool
+from benchmarks.common import fake_cookies
+from http_pool import create_client
+from stub_server import start_stub_server
+
+parser = ArgumentParser()
+parser.add_argument("--posts", type=int, default=40)
+parser.add_argument("--latency", type=float, default=0.1,
+                    help="Seconds of delay of the stub server per request.")
+parser.add_argument("--accounts", type=int, nargs="+", default=[1, 2, 4])
+cmd, _ = parser.parse_known_args()
+
+
+async def main():
+    server, get_data.www_origin = start_stub_server(latency=cmd.latency)
+    id_list = [f"{i:024x}" for i in range(cmd.posts)]
+    print(f"{cmd.posts} posts, {cmd.latency}s latency, default rate limits.")
+    print(f"{'accounts':>8} {'seconds':>8} {'posts/s':>8} {'speedup':>8}")
+    baseline = None
+    for n in cmd.accounts:
+        pool = AccountPool([
+            Account(f"fake_{i}", fake_cookies, create_client(fake_cookies),
+                    get_data.default_rates)
+            for i in range(n)
+        ])
+        start = time.perf_counter()
+        results, _ = await get_data.get_details_(
+            pool, id_list, ["token"] * cmd.posts, max_workers=4 * n)
+        elapsed = time.perf_counter() - start
+        await pool.aclose()
+        assert len(results) == cmd.posts
+        baseline = baseline or elapsed
+        print(f"{n:>8} {elapsed:>8.2f} {cmd.posts / elapsed:>8.1f} "
+              f"{baseline / elapsed:>7.1f}x")
+    server.shutdown()
+
+
+asyncio.run(main())
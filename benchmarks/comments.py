@@ -0,0 +1,60 @@
+"""
+Latency of "get_comments" on several posts: fetching posts one by one, concurrently, and
+asking again for more comments of the same posts, when only the pages after the cached
+ones are fetched. Run against the local stub server from the root folder of this
+repository:
+    python -m benchmarks.comments
+"""
+import asyncio
+import json
+import os
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import get_data
+from benchmarks.common import load_server
+from cache import CommentCache
+
+parser = ArgumentParser()
+parser.add_argument("--posts", type=int, default=10)
+parser.add_argument("--latency", type=float, default=0.1,
+                    help="Seconds of delay of the stub server per request.")
+cmd, _ = parser.parse_known_args()
+
+server, stub = load_server(latency=cmd.latency)
+
+
+async def main():
+    id_list = [f"{i:024x}" for i in range(cmd.posts)]
+    arguments = {"id_list": id_list, "xsec_token_list": ["token"] * cmd.posts}
+    print(f"{cmd.posts} posts, 10 comments per page, {cmd.latency}s latency.")
+    print(f"{'call':>24} {'seconds':>8} {'fetched pages':>14} {'cached pages':>13}")
+
+    start = time.perf_counter()
+    _, stats = await get_data.get_comments_(server.account_pool, **arguments,
+                                            max_per_post=20, max_workers=1)
+    print(f"{'one by one, 20 each':>24} {time.perf_counter() - start:>8.2f} "
+          f"{stats['fetched_pages']:>14} {stats['cached_pages']:>13}")
+
+    server.comment_cache = CommentCache(
+        os.path.join(tempfile.mkdtemp(), "comments.sqlite3"))
+    async with create_connected_server_and_client_session(server.mcp) as session:
+        for call, max_per_post in [("concurrent, 20 each", 20), ("again, 30 each", 30)]:
+            start = time.perf_counter()
+            result = await session.call_tool("get_comments",
+                                             {**arguments, "max_per_post": max_per_post})
+            elapsed = time.perf_counter() - start
+            stats = json.loads(result.content[0].text)
+            assert all(len(post['comments']) == max_per_post for post in stats['posts'])
+            print(f"{call:>24} {elapsed:>8.2f} {stats['fetched_pages']:>14} "
+                  f"{stats['cached_pages']:>13}")
+    server.comment_cache.close()
+    await server.account_pool.aclose()
+    await server.image_client.aclose()
+    stub.shutdown()
+
+
+asyncio.run(main())
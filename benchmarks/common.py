@@ -0,0 +1,50 @@
+import asyncio
+import csv
+import os
+import tempfile
+import time
+
+import cookies as cookies_module
+import get_data
+from image_cache import ImageCache
+from note_index import NoteIndex
+from stub_server import start_stub_server
+
+fake_cookies = {"a1": "a1", "xsecappid": "xhs-pc-web"}
+
+
+def lift_rate_limits(account):
+    """
+    Measure this program alone, without the rate limit of the website.
+    """
+    account.rate_scheduler.buckets.clear()
+    account.details_in_flight = asyncio.Semaphore(1000)
+
+
+def load_server(latency: float = 0.0):
+    """
+    Import "server.py" with fake cookies, and point it to the stub server. Detail cache,
+    search cache, comment cache and prefetching are disabled, posts are indexed in
+    memory, images are stored in a temporary folder, and rate limits are lifted.
+    Returns:
+        The module "server" and the stub server.
+    """
+    cookies_module.cookies_csv_path = os.path.join(tempfile.mkdtemp(), "cookies.csv")
+    with open(cookies_module.cookies_csv_path, "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "value", "expirationDate"])
+        for name, value in fake_cookies.items():
+            writer.writerow([name, value, time.time() + 86400])
+    import server  # It loads cookies when imported.
+
+    stub, base_url = start_stub_server(latency=latency)
+    get_data.www_origin = get_data.edith_origin = base_url
+    for account in server.account_pool.accounts:
+        lift_rate_limits(account)
+    server.detail_cache = None
+    server.comment_cache = None
+    server.search_cache = None
+    server.prefetcher = None
+    server.note_index = NoteIndex(":memory:")
+    server.image_cache = ImageCache(tempfile.mkdtemp())
+    return server, stub
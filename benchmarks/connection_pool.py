@@ -0,0 +1,58 @@
+"""
+Time spent on setting up connections (DNS, TCP and TLS) when each tool call creates its
+own HTTP client, compared with one client shared by all tool calls. Run from the root
+folder of this repository:
+    python -m benchmarks.connection_pool [--origin https://www.xiaohongshu.com]
+Without "--origin", the local stub server is used, where connection setup is cheap
+because there is neither DNS nor TLS.
+"""
+import asyncio
+import time
+from argparse import ArgumentParser
+
+from http_pool import create_client
+from stub_server import start_stub_server
+
+parser = ArgumentParser()
+parser.add_argument("--origin", help="Origin to connect, default to the stub server.")
+parser.add_argument("--calls", type=int, default=10, help="Number of tool calls.")
+parser.add_argument("--requests", type=int, default=3,
+                    help="Number of requests in each tool call.")
+cmd, _ = parser.parse_known_args()
+
+if cmd.origin:
+    origin = cmd.origin
+else:
+    server, origin = start_stub_server()
+
+
+async def tool_call(client):
+    for _ in range(cmd.requests):
+        await client.head(origin)
+
+
+async def per_call_clients():
+    connections, connect_seconds = 0, 0.0
+    for _ in range(cmd.calls):
+        async with create_client({}) as client:
+            await tool_call(client)
+        connections += client._transport.connections
+        connect_seconds += client._transport.connect_seconds
+    return connections, connect_seconds
+
+
+async def shared_client():
+    async with create_client({}) as client:
+        for _ in range(cmd.calls):
+            await tool_call(client)
+    return client._transport.connections, client._transport.connect_seconds
+
+
+print(f"{cmd.calls} tool calls with {cmd.requests} requests each to {origin}")
+print(f"{'client':<12} {'seconds':>8} {'connections':>12} {'setup ms/call':>14}")
+for label, run in [("per call", per_call_clients), ("shared", shared_client)]:
+    start = time.perf_counter()
+    connections, connect_seconds = asyncio.run(run())
+    elapsed = time.perf_counter() - start
+    print(f"{label:<12} {elapsed:>8.3f} {connections:>12} "
+          f"{connect_seconds / cmd.calls * 1000:>14.3f}")
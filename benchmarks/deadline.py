@@ -0,0 +1,63 @@
+"""
+Latency and completed work of "get_details" and "get_feed" with and without a time
+budget, against the local stub server under the default rate limits. Run from the root
+folder of this repository:
+    python -m benchmarks.deadline
+"""
+import asyncio
+import json
+import time
+from argparse import ArgumentParser
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import get_data
+from benchmarks.common import load_server
+
+parser = ArgumentParser()
+parser.add_argument("--posts", type=int, default=50)
+parser.add_argument("--pages", type=int, default=10)
+parser.add_argument("--time_budget", type=float, default=5)
+parser.add_argument("--latency", type=float, default=0.2,
+                    help="Seconds of delay of the stub server per request.")
+cmd, _ = parser.parse_known_args()
+
+server, stub = load_server(latency=cmd.latency)
+for account in server.account_pool.accounts:
+    account.rate_scheduler.update(get_data.default_rates)
+    account.details_in_flight = asyncio.Semaphore(4)
+
+
+async def main():
+    id_list = [f"{i:024x}" for i in range(cmd.posts)]
+    print(f"{cmd.posts} posts, {cmd.pages} pages of feed, {cmd.latency}s latency, "
+          f"default rate limits.")
+    print(f"{'tool':>12} {'budget s':>9} {'seconds':>8} {'done':>5} {'left':>5}")
+    async with create_connected_server_and_client_session(server.mcp) as session:
+        for budget in [0, cmd.time_budget]:
+            start = time.perf_counter()
+            result = await session.call_tool("get_details", {
+                "id_list": id_list, "xsec_token_list": ["token"] * cmd.posts,
+                "time_budget": budget})
+            elapsed = time.perf_counter() - start
+            result = json.loads(result.content[0].text)
+            left = len(result.get('unfinished', {}).get('id_list', []))
+            print(f"{'get_details':>12} {budget:>9} {elapsed:>8.2f} "
+                  f"{len(result['posts']):>5} {left:>5}")
+        for budget in [0, cmd.time_budget]:
+            start = time.perf_counter()
+            result = await session.call_tool("get_feed", {
+                "pages": cmd.pages, "time_budget": budget})
+            elapsed = time.perf_counter() - start
+            pages = cmd.pages
+            if len(result.content) > 1:
+                # Pages start from 0, so the next page is the number of pages fetched.
+                info = json.loads(result.content[1].text)
+                pages = server.decode_cursor(info['next_cursor'], "feed")['page']
+            print(f"{'get_feed':>12} {budget:>9} {elapsed:>8.2f} {pages:>5} "
+                  f"{cmd.pages - pages:>5}")
+    await server.account_pool.aclose()
+    stub.shutdown()
+
+
+asyncio.run(main())
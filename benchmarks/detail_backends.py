@@ -0,0 +1,56 @@
+"""
+Bytes transferred and parsing time per post of each detail backend ("html" and "api"),
+against the local stub server. Run from the root folder of this repository:
+    python -m benchmarks.detail_backends
+The web pages of the stub server are smaller than the website's, so the real difference
+of bytes is larger.
+"""
+import asyncio
+import time
+from argparse import ArgumentParser
+
+import get_data
+import metrics
+from accounts import Account, AccountPool
+from benchmarks.common import fake_cookies
+from http_pool import create_client
+from stub_server import start_stub_server
+
+parser = ArgumentParser()
+parser.add_argument("--posts", type=int, default=50)
+cmd, _ = parser.parse_known_args()
+
+endpoints = {"html": "www/detail", "api": "edith/detail"}
+
+
+async def fetch(id_list: list[str]) -> float:
+    account = Account("fake", fake_cookies, create_client(fake_cookies), rates={})
+    start = time.perf_counter()
+    results, _ = await get_data.get_details_(
+        AccountPool([account]), id_list, ["token"] * len(id_list))
+    elapsed = time.perf_counter() - start
+    await account.client.aclose()
+    assert len(results) == len(id_list)
+    return elapsed
+
+
+def main():
+    server, base_url = start_stub_server()
+    get_data.www_origin = get_data.edith_origin = base_url
+    metrics.enabled = True
+    id_list = [f"{i:024x}" for i in range(cmd.posts)]
+    print(f"{cmd.posts} posts.")
+    print(f"{'backend':>8} {'KB/post':>8} {'parse ms':>9} {'sign ms':>8} {'total s':>8}")
+    for backend, endpoint in endpoints.items():
+        get_data.detail_backend = backend
+        elapsed = asyncio.run(fetch(id_list))
+        stages = metrics.snapshot()['stages']
+        kilobytes = metrics.bytes_downloaded[endpoint] / cmd.posts / 1024
+        parse_ms = stages[f"parse {endpoint}"]['mean_ms']
+        sign_ms = stages.get(f"sign {endpoint}", {}).get('mean_ms', 0)
+        print(f"{backend:>8} {kilobytes:>8.1f} {parse_ms:>9.3f} {sign_ms:>8.3f} "
+              f"{elapsed:>8.2f}")
+    server.shutdown()
+
+
+main()
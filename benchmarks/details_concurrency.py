@@ -0,0 +1,47 @@
+"""
+Wall-clock time of "get_details_" against the local stub server, with different numbers
+of workers. Run from the root folder of this repository:
+    python -m benchmarks.details_concurrency
+"""
+import asyncio
+import time
+from argparse import ArgumentParser
+
+import get_data
+from accounts import Account, AccountPool
+from http_pool import create_client
+from stub_server import start_stub_server
+
+parser = ArgumentParser()
+parser.add_argument("--posts", type=int, default=24)
+parser.add_argument("--latency", type=float, default=0.2,
+                    help="Seconds of delay of the stub server per request.")
+cmd, _ = parser.parse_known_args()
+
+
+async def main():
+    server, get_data.www_origin = start_stub_server(latency=cmd.latency)
+    id_list = [f"{i:024x}" for i in range(cmd.posts)]
+    xsec_token_list = ["token"] * cmd.posts
+    cookies = {"a1": "a1", "xsecappid": "xhs-pc-web"}
+
+    # Measure concurrency alone, without the rate limit of the website.
+    rates = {"www": (1000, 1000), "www/detail": (1000, 1000)}
+    print(f"{cmd.posts} posts, {cmd.latency}s latency, at most 4 in flight per account.")
+    print(f"{'workers':>8} {'seconds':>8} {'speedup':>8}")
+    baseline = None
+    for max_workers in [1, 2, 4, 8]:
+        account = Account("fake", cookies, create_client(cookies), rates)
+        async with account.client:
+            start = time.perf_counter()
+            results, _ = await get_data.get_details_(
+                AccountPool([account]), id_list, xsec_token_list,
+                max_workers=max_workers)
+            elapsed = time.perf_counter() - start
+        assert [r['title'] for r in results] == [f"Title of {id_}" for id_ in id_list]
+        baseline = baseline or elapsed
+        print(f"{max_workers:>8} {elapsed:>8.2f} {baseline / elapsed:>7.1f}x")
+    server.shutdown()
+
+
+asyncio.run(main())
@@ -0,0 +1,54 @@
+"""
+Latency of "get_feed" with and without home feed fetched in background, against the
+local stub server under the default rate limits. Run from the root folder of this
+repository:
+    python -m benchmarks.feed_pool
+"""
+import asyncio
+import time
+from argparse import ArgumentParser
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import get_data
+from benchmarks.common import load_server
+from feed_pool import FeedPool
+
+parser = ArgumentParser()
+parser.add_argument("--pages", type=int, default=2)
+parser.add_argument("--calls", type=int, default=3)
+parser.add_argument("--capacity", type=int, default=200)
+parser.add_argument("--latency", type=float, default=0.2,
+                    help="Seconds of delay of the stub server per request.")
+parser.add_argument("--think", type=float, default=3,
+                    help="Seconds between calls, when the model reads the results.")
+cmd, _ = parser.parse_known_args()
+
+server, stub = load_server(latency=cmd.latency)
+for account in server.account_pool.accounts:
+    account.rate_scheduler.update(get_data.default_rates)
+
+
+async def main():
+    print(f"{cmd.pages} pages per call, {cmd.latency}s latency, {cmd.think}s between "
+          f"calls.")
+    print(f"{'feed pool':>9} {'call':>5} {'seconds':>8}")
+    async with create_connected_server_and_client_session(server.mcp) as session:
+        for pool in [False, True]:
+            server.feed_pool = (FeedPool(server.account_pool, capacity=cmd.capacity)
+                                if pool else None)
+            if pool:
+                server.feed_pool.fill()
+            for call in range(cmd.calls):
+                await asyncio.sleep(cmd.think)
+                start = time.perf_counter()
+                result = await session.call_tool("get_feed", {"pages": cmd.pages})
+                assert not result.isError, result.content[0].text
+                print(f"{str(pool):>9} {call + 1:>5} {time.perf_counter() - start:>8.3f}")
+            if pool:
+                server.feed_pool.cancel()
+    await server.account_pool.aclose()
+    stub.shutdown()
+
+
+asyncio.run(main())
@@ -0,0 +1,119 @@
+"""
+Requests per second and latency percentiles of one MCP server process in streamable HTTP
+mode, as the number of MCP clients grows. Each client has its own MCP session and calls
+"get_details" in a loop, while the server process shares its connections, rate limits
+and caches among the sessions. The backend is the local stub server. Run from the root
+folder of this repository:
+    python -m benchmarks.http_clients
+Fake cookies are used, and the rate limits are lifted to measure the server alone.
+"""
+import asyncio
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import time
+from argparse import ArgumentParser
+
+import anyio
+
+parser = ArgumentParser()
+parser.add_argument("--clients", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                    help="Numbers of MCP clients connected at the same time.")
+parser.add_argument("--seconds", type=float, default=5,
+                    help="Seconds of load for each number of clients.")
+parser.add_argument("--posts", type=int, default=2, help="Posts per tool call.")
+parser.add_argument("--latency", type=float, default=0.05,
+                    help="Seconds of delay of the stub server per request.")
+parser.add_argument("--serve", action="store_true",
+                    help="Run the MCP server, started by this script itself.")
+cmd, _ = parser.parse_known_args()
+
+
+def serve():
+    # The options of "server.py", e.g. "--transport" and "--port", are parsed from the
+    # same command line when it's imported.
+    from benchmarks.common import load_server
+
+    server, stub = load_server(latency=cmd.latency)
+    server.cmd.time_budget = 0
+    anyio.run(server.main)
+
+
+def free_port() -> int:
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+async def wait_for_port(port: int, timeout: float = 30):
+    start = time.monotonic()
+    while time.monotonic() - start < timeout:
+        try:
+            _, writer = await asyncio.open_connection("127.0.0.1", port)
+            writer.close()
+            return
+        except OSError:
+            await asyncio.sleep(0.1)
+    raise TimeoutError(f"MCP server doesn't listen at port {port}.")
+
+
+async def client(url: str, index: int, stop_at: float) -> list[float]:
+    """
+    Returns:
+        Latency of each tool call in seconds.
+    """
+    from mcp import ClientSession
+    from mcp.client.streamable_http import streamablehttp_client
+
+    latencies = []
+    async with streamablehttp_client(url) as (read, write, _):
+        async with ClientSession(read, write) as session:
+            await session.initialize()
+            while time.perf_counter() < stop_at:
+                # Posts are different in each call, so none of them is cached.
+                n = len(latencies)
+                start = time.perf_counter()
+                result = await session.call_tool("get_details", {
+                    "id_list": [f"{index:08x}{n:08x}{j:08x}" for j in range(cmd.posts)],
+                    "xsec_token_list": ["token"] * cmd.posts,
+                })
+                latencies.append(time.perf_counter() - start)
+                assert not result.isError, result.content[0].text
+    return latencies
+
+
+async def main():
+    port = free_port()
+    process = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.http_clients", "--serve",
+         "--latency", str(cmd.latency), "--transport", "streamable-http",
+         "--port", str(port)],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL, cwd=os.getcwd())
+    try:
+        await wait_for_port(port)
+        url = f"http://127.0.0.1:{port}/mcp"
+        print(f"{cmd.posts} posts per call, {cmd.latency}s latency of stub server, "
+              f"{cmd.seconds}s per row.")
+        print(f"{'clients':>7} {'calls':>6} {'calls/s':>8} {'p50 ms':>7} {'p95 ms':>7}")
+        for n in cmd.clients:
+            stop_at = time.perf_counter() + cmd.seconds
+            start = time.perf_counter()
+            results = await asyncio.gather(*[client(url, i, stop_at) for i in range(n)])
+            elapsed = time.perf_counter() - start
+            latencies = [latency for result in results for latency in result]
+            percentiles = statistics.quantiles(latencies, n=100)
+            p50, p95 = percentiles[49] * 1000, percentiles[94] * 1000
+            print(f"{n:>7} {len(latencies):>6} {len(latencies) / elapsed:>8.1f} "
+                  f"{p50:>7.0f} {p95:>7.0f}")
+    finally:
+        process.terminate()
+        process.wait()
+
+
+if __name__ == '__main__':
+    if cmd.serve:
+        serve()
+    else:
+        asyncio.run(main())
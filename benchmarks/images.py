@@ -0,0 +1,48 @@
+"""
+Bytes downloaded, latency and peak memory of "get_images" on the images of several posts,
+the first time and when the same posts are analyzed again, against the local stub server.
+Run from the root folder of this repository:
+    python -m benchmarks.images
+"""
+import asyncio
+import json
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import get_data
+from benchmarks.common import load_server
+
+parser = ArgumentParser()
+parser.add_argument("--images", type=int, default=40)
+parser.add_argument("--latency", type=float, default=0.05,
+                    help="Seconds of delay of the stub server per request.")
+cmd, _ = parser.parse_known_args()
+
+server, stub = load_server(latency=cmd.latency)
+
+
+async def main():
+    urls = [f"{get_data.www_origin}/image/{i}" for i in range(cmd.images)]
+    print(f"{cmd.images} images of 200 KB, {cmd.latency}s latency.")
+    print(f"{'call':>6} {'seconds':>8} {'downloaded KB':>14} {'peak memory KB':>15}")
+    async with create_connected_server_and_client_session(server.mcp) as session:
+        for call in ["first", "again"]:
+            tracemalloc.start()
+            start = time.perf_counter()
+            result = await session.call_tool("get_images", {"urls": urls})
+            elapsed = time.perf_counter() - start
+            _, peak = tracemalloc.get_traced_memory()
+            tracemalloc.stop()
+            stats = json.loads(result.content[0].text)
+            assert len(stats['paths']) == cmd.images
+            print(f"{call:>6} {elapsed:>8.2f} {stats['downloaded_bytes'] / 1024:>14.0f} "
+                  f"{peak / 1024:>15.0f}")
+    await server.account_pool.aclose()
+    await server.image_client.aclose()
+    stub.shutdown()
+
+
+asyncio.run(main())
@@ -0,0 +1,113 @@
+"""
+Parse time and peak memory of extracting "window.__INITIAL_STATE__" and og:image URLs
+from explore and post detail pages, compared with the BeautifulSoup implementation which
+was used before. Run from the root folder of this repository:
+    python -m benchmarks.initial_state [--html saved_page.html ...]
+The BeautifulSoup implementation is skipped if "beautifulsoup4" is not installed.
+"""
+import json
+import re
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from stub_server import explore_page, detail_page
+from xhshow_contrib import extract_initial_state, extract_og_images
+
+try:
+    from bs4 import BeautifulSoup
+except ImportError:
+    BeautifulSoup = None
+
+
+def soup_extract_initial_state(html_content):
+    soup = BeautifulSoup(html_content, "html.parser")
+    for script in soup.find_all("script"):
+        if not script.string or "window.__INITIAL_STATE__" not in script.string:
+            continue
+        match = re.search(
+            r"window\.__INITIAL_STATE__\s*=\s*({.*})", script.string, re.S
+        )
+        if not match:
+            continue
+        js_str = match.group(1)
+        stack = []
+        for i, char in enumerate(js_str):
+            if char == "{":
+                stack.append(char)
+            elif char == "}":
+                stack.pop()
+                if not stack:
+                    js_str = js_str[: i + 1]
+                    break
+        js_str = (
+            js_str.replace("undefined", "null")
+            .replace("True", "true")
+            .replace("False", "false")
+            .replace("None", "null")
+        )
+        js_str = re.sub(r"'([^']*?)'(\s*:)", r'"\1"\2', js_str)
+        js_str = re.sub(
+            r":\s*'([^']*?)'",
+            lambda m: ': "' + m.group(1).replace('"', '\\"') + '"',
+            js_str,
+        )
+        return json.loads(js_str)
+    return None
+
+
+def soup_parse_detail(html_content):
+    tree = BeautifulSoup(html_content, "html.parser")
+    images = [
+        image.get('content')
+        for image in tree.find_all('meta', {'name': 'og:image'})
+    ]
+    script_tag = tree.find("script", string=re.compile("window.__INITIAL_STATE__"))
+    script_text = re.sub("window.__INITIAL_STATE__=", "", script_tag.text)
+    script_text = re.sub("undefined", "null", script_text)
+    return images, json.loads(script_text)
+
+
+def scanner_parse_detail(html_content):
+    return extract_og_images(html_content), extract_initial_state(html_content)
+
+
+def measure(function, html_content, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        function(html_content)
+    elapsed = (time.perf_counter() - start) / repeat
+    tracemalloc.start()
+    function(html_content)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+parser = ArgumentParser()
+parser.add_argument("--html", nargs="*", default=[],
+                    help="Saved HTML of explore or detail pages.")
+parser.add_argument("--repeat", type=int, default=20)
+cmd, _ = parser.parse_known_args()
+
+pages = {"explore (stub)": explore_page(), "detail (stub)": detail_page("0" * 24)}
+for path in cmd.html:
+    with open(path, encoding="utf-8") as f:
+        pages[path] = f.read()
+
+implementations = [("scanner", extract_initial_state, scanner_parse_detail)]
+if BeautifulSoup is not None:
+    implementations.append(
+        ("beautifulsoup", soup_extract_initial_state, soup_parse_detail))
+
+print(f"{'page':<20} {'KB':>6} {'implementation':<24} {'ms':>8} {'peak KB':>8}")
+for name, html_content in pages.items():
+    for label, extract, parse_detail in implementations:
+        functions = [(f"{label} state", extract)]
+        if "detail" in name:
+            # The detail page was parsed by inline code in "get_details_".
+            functions.append((f"{label} detail", parse_detail))
+        for function_label, function in functions:
+            elapsed, peak = measure(function, html_content, cmd.repeat)
+            print(f"{name[-20:]:<20} {len(html_content) / 1024:>6.0f} "
+                  f"{function_label:<24} {elapsed * 1000:>8.2f} {peak / 1024:>8.0f}")
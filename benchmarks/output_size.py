@@ -0,0 +1,57 @@
+"""
+Size in bytes and tokens of tables of posts in each output format, compared with the
+JSON list of all columns which was returned before. Run from the root folder of this
+repository:
+    python -m benchmarks.output_size
+Tokens are counted with "tiktoken" if installed, otherwise estimated by counting CJK
+characters, words and punctuation.
+"""
+import json
+import re
+import time
+
+from output_format import dump_posts, output_formats, post_fields
+
+try:
+    import tiktoken
+    encoding = tiktoken.get_encoding("o200k_base")
+    count_tokens = lambda text: len(encoding.encode(text))
+    token_label = "tokens"
+except ImportError:
+    token_pattern = re.compile(r"[\u3000-\u9fff\uff00-\uffef]|\w+|[^\w\s]")
+    count_tokens = lambda text: len(token_pattern.findall(text))
+    token_label = "~tokens"
+
+with open("tests/feed_subsequent_page_response.json", encoding="utf-8") as f:
+    items = json.load(f)['data']['items']
+posts = [
+    {
+        'id': item['id'],
+        'xsec_token': item['xsec_token'],
+        'title': item['note_card'].get('display_title', ''),
+        'cover_median_url': item['note_card']['cover']['url_default'],
+        'user_id': item['note_card']['user']['user_id'],
+        'user_name': item['note_card']['user']['nick_name'],
+        'user_xsec_token': item['note_card']['user']['xsec_token'],
+    }
+    for item in items
+]
+# About the size of 4 pages of searching results.
+posts = posts * 2
+
+cases = [("before: json.dumps", "all", lambda: json.dumps(posts))]
+for output_format in output_formats:
+    cases.append((output_format, "all", lambda f=output_format: dump_posts(
+        posts, f, post_fields)))
+    cases.append((output_format, "default", lambda f=output_format: dump_posts(
+        posts, f)))
+
+print(f"{len(posts)} posts")
+print(f"{'format':<20} {'fields':<8} {'bytes':>8} {token_label:>8} {'ms':>6}")
+for label, fields, dump in cases:
+    start = time.perf_counter()
+    for _ in range(100):
+        text = dump()
+    elapsed = (time.perf_counter() - start) / 100
+    print(f"{label:<20} {fields:<8} {len(text.encode('utf-8')):>8} "
+          f"{count_tokens(text):>8} {elapsed * 1000:>6.2f}")
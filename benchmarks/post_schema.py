@@ -0,0 +1,68 @@
+"""
+CPU time and peak memory of decoding posts from a home feed response, by "json.loads"
+followed by a hand-written mapping, and by the schema in "schema.py"; and of encoding
+the table of posts by "json.dumps" and by "schema.dumps". Run from the root folder of
+this repository:
+    python -m benchmarks.post_schema
+"""
+import json
+import time
+import tracemalloc
+from argparse import ArgumentParser
+
+from output_format import post_fields
+from schema import dumps, homefeed_adapter
+
+parser = ArgumentParser()
+parser.add_argument("--repeat", type=int, default=2000)
+cmd, _ = parser.parse_known_args()
+
+with open("tests/feed_subsequent_page_response.json", "rb") as f:
+    content = f.read()
+
+
+def decode_by_mapping():
+    """
+    How posts were decoded before the schema.
+    """
+    response_json = json.loads(content)
+    posts = []
+    for item in response_json['data']['items']:
+        posts.append({
+            'id': item['id'],
+            'xsec_token': item['xsec_token'],
+            'title': item['note_card'].get('display_title', ''),
+            'cover_median_url': item['note_card']['cover']['url_default'],
+            'user_id': item['note_card']['user']['user_id'],
+            'user_name': item['note_card']['user']['nick_name'],
+            'user_xsec_token': item['note_card']['user']['xsec_token'],
+        })
+    return posts
+
+
+def decode_by_schema():
+    return homefeed_adapter.validate_json(content)['data']['items']
+
+
+posts = decode_by_schema()
+assert posts == decode_by_mapping()
+table = {"columns": post_fields, "rows": [[post[k] for k in post_fields] for post in posts]}
+cases = {
+    "decode, json.loads + mapping": decode_by_mapping,
+    "decode, schema": decode_by_schema,
+    "encode, json.dumps": lambda: json.dumps(table, ensure_ascii=False),
+    "encode, schema.dumps": lambda: dumps(table),
+}
+
+print(f"{len(content) / 1024:.1f} KB response, {len(posts)} posts.")
+print(f"{'':<30} {'us/page':>8} {'peak KB':>8}")
+for name, function in cases.items():
+    start = time.perf_counter()
+    for _ in range(cmd.repeat):
+        function()
+    microseconds = (time.perf_counter() - start) / cmd.repeat * 1e6
+    tracemalloc.start()
+    function()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    print(f"{name:<30} {microseconds:>8.1f} {peak / 1024:>8.1f}")
@@ -0,0 +1,61 @@
+"""
+Latency of "get_details" on the top results of "search", with and without prefetching,
+against the local stub server under the default rate limits. Run from the root folder of
+this repository:
+    python -m benchmarks.prefetch
+"""
+import asyncio
+import json
+import time
+from argparse import ArgumentParser
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import get_data
+from benchmarks.common import load_server
+from cache import DetailCache
+from prefetch import Prefetcher
+
+parser = ArgumentParser()
+parser.add_argument("--top_k", type=int, default=5)
+parser.add_argument("--latency", type=float, default=0.2,
+                    help="Seconds of delay of the stub server per request.")
+parser.add_argument("--think", type=float, default=2,
+                    help="Seconds between \"search\" and \"get_details\", when the model "
+                         "reads the results.")
+cmd, _ = parser.parse_known_args()
+
+server, stub = load_server(latency=cmd.latency)
+for account in server.account_pool.accounts:
+    account.rate_scheduler.update(get_data.default_rates)
+    account.details_in_flight = asyncio.Semaphore(4)
+
+
+async def main():
+    print(f"Top {cmd.top_k} results, {cmd.latency}s latency, {cmd.think}s between calls.")
+    print(f"{'prefetch':>8} {'search s':>9} {'get_details s':>14} {'cache_hits':>11}")
+    async with create_connected_server_and_client_session(server.mcp) as session:
+        for i, prefetch in enumerate([False, True]):
+            server.detail_cache = DetailCache(":memory:")
+            server.prefetcher = (Prefetcher(server.account_pool, server.detail_cache,
+                                            top_k=cmd.top_k) if prefetch else None)
+            start = time.perf_counter()
+            result = await session.call_tool("search", {
+                "query": f"query {i}", "pages": 1, "output_format": "records"})
+            search_seconds = time.perf_counter() - start
+            posts = json.loads(result.content[0].text)[:cmd.top_k]
+            await asyncio.sleep(cmd.think)
+            start = time.perf_counter()
+            result = await session.call_tool("get_details", {
+                "id_list": [post['id'] for post in posts],
+                "xsec_token_list": [post['xsec_token'] for post in posts],
+            })
+            details_seconds = time.perf_counter() - start
+            cache_hits = json.loads(result.content[0].text)['cache_hits']
+            print(f"{str(prefetch):>8} {search_seconds:>9.2f} {details_seconds:>14.2f} "
+                  f"{cache_hits:>11}")
+    await server.account_pool.aclose()
+    stub.shutdown()
+
+
+asyncio.run(main())
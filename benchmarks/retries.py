@@ -0,0 +1,73 @@
+"""
+Work of an agent fetching details of posts from a flaky website, with and without
+retries: the agent calls "get_details" again with the failed posts until every post is
+fetched. Run against the local stub server from the root folder of this repository:
+    python -m benchmarks.retries
+"""
+import asyncio
+import json
+import random
+import time
+from argparse import ArgumentParser
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import retry
+from benchmarks.common import load_server
+
+parser = ArgumentParser()
+parser.add_argument("--posts", type=int, default=40)
+parser.add_argument("--error_rate", type=float, default=0.2)
+parser.add_argument("--latency", type=float, default=0.05,
+                    help="Seconds of delay of the stub server per request.")
+parser.add_argument("--runs", type=int, default=5)
+cmd, _ = parser.parse_known_args()
+
+server, stub = load_server(latency=cmd.latency)
+stub.RequestHandlerClass.error_rate = cmd.error_rate
+retry.base_delay = 0.1
+
+
+async def fetch_all(session, id_list: list[str]) -> tuple[int, float]:
+    """
+    Returns:
+        Number of tool calls and seconds until every post is fetched.
+    """
+    start = time.perf_counter()
+    calls = 0
+    while id_list:
+        calls += 1
+        result = await session.call_tool("get_details", {
+            "id_list": id_list, "xsec_token_list": ["token"] * len(id_list)})
+        if result.isError:
+            continue
+        stats = json.loads(result.content[0].text)
+        id_list = list(stats.get('errors', {}))
+    return calls, time.perf_counter() - start
+
+
+async def main():
+    print(f"{cmd.posts} posts, {cmd.error_rate:.0%} errors, {cmd.latency}s latency, "
+          f"mean of {cmd.runs} runs.")
+    print(f"{'attempts':>9} {'tool calls':>11} {'requests':>9} {'seconds':>8} "
+          f"{'worst s':>8}")
+    async with create_connected_server_and_client_session(server.mcp) as session:
+        for attempts in [1, 3]:
+            retry.max_attempts = attempts
+            random.seed(0)
+            calls, elapsed = [], []
+            stub.hits.clear()
+            for run in range(cmd.runs):
+                id_list = [f"{run:04x}{attempts:04x}{i:016x}" for i in range(cmd.posts)]
+                run_calls, run_elapsed = await fetch_all(session, id_list)
+                calls.append(run_calls)
+                elapsed.append(run_elapsed)
+            print(f"{attempts:>9} {sum(calls) / cmd.runs:>11.1f} "
+                  f"{sum(stub.hits.values()) / cmd.runs:>9.1f} "
+                  f"{sum(elapsed) / cmd.runs:>8.2f} {max(elapsed):>8.2f}")
+    await server.account_pool.aclose()
+    await server.image_client.aclose()
+    stub.shutdown()
+
+
+asyncio.run(main())
@@ -0,0 +1,55 @@
+"""
+Latency of searching several queries by calling "search" for each query in turn, and by
+one "search_many" call, against the local stub server. Run from the root folder of this
+repository:
+    python -m benchmarks.search_many
+"""
+import asyncio
+import json
+import time
+from argparse import ArgumentParser
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+import get_data
+from benchmarks.common import load_server
+
+parser = ArgumentParser()
+parser.add_argument("--queries", nargs="+",
+                    default=["露营", "露营装备", "露营地推荐", "周末露营"])
+parser.add_argument("--pages", type=int, default=2)
+parser.add_argument("--latency", type=float, default=0.2,
+                    help="Seconds of delay of the stub server per request.")
+parser.add_argument("--rate_limits", action="store_true",
+                    help="Keep the default rate limits, which serialize requests of one "
+                         "account.")
+cmd, _ = parser.parse_known_args()
+
+server, stub = load_server(latency=cmd.latency)
+if cmd.rate_limits:
+    for account in server.account_pool.accounts:
+        account.rate_scheduler.update(get_data.default_rates)
+
+
+async def main():
+    print(f"{len(cmd.queries)} queries, {cmd.pages} pages each, {cmd.latency}s latency.")
+    print(f"{'tool':>12} {'seconds':>8} {'posts':>6}")
+    async with create_connected_server_and_client_session(server.mcp) as session:
+        start = time.perf_counter()
+        ids = set()
+        for query in cmd.queries:
+            result = await session.call_tool("search", {
+                "query": query, "pages": cmd.pages, "output_format": "records"})
+            ids.update(post['id'] for post in json.loads(result.content[0].text))
+        print(f"{'search':>12} {time.perf_counter() - start:>8.2f} {len(ids):>6}")
+
+        start = time.perf_counter()
+        result = await session.call_tool("search_many", {
+            "queries": cmd.queries, "pages": cmd.pages, "output_format": "records"})
+        posts = json.loads(result.content[0].text)
+        print(f"{'search_many':>12} {time.perf_counter() - start:>8.2f} {len(posts):>6}")
+    await server.account_pool.aclose()
+    stub.shutdown()
+
+
+asyncio.run(main())
@@ -0,0 +1,98 @@
+"""
+Cold start of the MCP server: wall time of importing "server.py", which loads the
+cookies, the modules and the caches, and the modules which take the most time according
+to "python -X importtime". The MCP SDK is imported first and timed separately, because
+it's needed by any MCP server, and the budget applies to the rest. Run from the root
+folder of this repository:
+    python -m benchmarks.startup
+It exits with status 1 if the median time exceeds the budget. The default budget, 300 ms,
+is above the median of 124-259 ms measured on a loaded development machine where the
+package "trio" is installed: httpcore imports it if present, which takes about 100 ms,
+although this program doesn't depend on it. Without trio, the median is 89-132 ms. The
+budget catches regressions like the former pandas import, which took 500 ms.
+"""
+import csv
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from argparse import ArgumentParser
+
+from benchmarks.common import fake_cookies
+
+parser = ArgumentParser()
+parser.add_argument("--runs", type=int, default=5)
+parser.add_argument("--budget_ms", type=float, default=300,
+                    help="Target of the median time of importing \"server.py\" after the "
+                         "MCP SDK.")
+parser.add_argument("--top", type=int, default=10,
+                    help="Number of the slowest modules imported by \"server.py\" shown.")
+cmd, _ = parser.parse_known_args()
+
+# The child process reports the time of importing the MCP SDK and "server.py" by itself,
+# which excludes starting the interpreter.
+child_code = ("import time; start = time.perf_counter(); import mcp.server.fastmcp; "
+              "middle = time.perf_counter(); import server; "
+              "print(middle - start, time.perf_counter() - middle)")
+
+
+def parse_importtime(stderr: str) -> list[tuple[str, float, float]]:
+    """
+    Returns:
+        list of (module, self milliseconds, cumulative milliseconds) of the modules
+        imported by "server.py" directly.
+    """
+    modules = []
+    for line in stderr.splitlines():
+        if not line.startswith("import time:") or "|" not in line:
+            continue
+        self_us, cumulative_us, name = line.removeprefix("import time:").split("|")
+        # Nesting is indented by 2 spaces per level, after 1 space of the column.
+        if not self_us.strip().isdigit() or len(name) - len(name.lstrip()) != 3:
+            continue
+        modules.append((name.strip(), int(self_us) / 1000, int(cumulative_us) / 1000))
+    return modules
+
+
+def main():
+    cookies_dir = tempfile.mkdtemp()
+    with open(os.path.join(cookies_dir, "fake.csv"), "w", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["name", "value", "expirationDate"])
+        for name, value in fake_cookies.items():
+            writer.writerow([name, value, time.time() + 86400])
+    options = ["--cookies_dir", cookies_dir, "--image_cache_mb", "0"]
+    sdk_times, times = [], []
+    for _ in range(cmd.runs):
+        process = subprocess.run([sys.executable, "-c", child_code, *options],
+                                 capture_output=True, text=True, check=True)
+        sdk_seconds, seconds = process.stdout.strip().splitlines()[-1].split()
+        sdk_times.append(float(sdk_seconds) * 1000)
+        times.append(float(seconds) * 1000)
+    # "-X importtime" slows down importing, so it's only used for the breakdown.
+    process = subprocess.run([sys.executable, "-X", "importtime", "-c", child_code,
+                              *options], capture_output=True, text=True, check=True)
+    modules = parse_importtime(process.stderr)
+    median = statistics.median(times)
+    print(f"import mcp.server.fastmcp: median {statistics.median(sdk_times):.0f} ms.")
+    print(f"import server after it: median {median:.0f} ms, min {min(times):.0f} ms "
+          f"of {cmd.runs} runs, budget {cmd.budget_ms:.0f} ms.")
+    print(f"{'module':<24} {'cumulative ms':>14} {'self ms':>8}")
+    for name, self_ms, cumulative_ms in sorted(modules, key=lambda m: -m[2])[:cmd.top]:
+        print(f"{name:<24} {cumulative_ms:>14.1f} {self_ms:>8.1f}")
+    trio_ms = [int(line.split("|")[1]) / 1000 for line in process.stderr.splitlines()
+               if line.startswith("import time:") and line.split("|")[-1].strip() == "trio"]
+    if trio_ms:
+        # httpcore imports trio whenever it's installed, although this program doesn't
+        # depend on it.
+        print(f"Package \"trio\", which isn't a dependency, is installed and imported by "
+              f"httpcore, taking {trio_ms[0]:.0f} ms with \"-X importtime\".")
+    if median > cmd.budget_ms:
+        print("Over budget.")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
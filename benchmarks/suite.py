@@ -0,0 +1,154 @@
+"""
+Benchmark suite timing each stage of the tools separately, and each MCP tool end to end
+against the local stub server. Results are saved as JSON, so that regressions can be
+found by comparing commits. Run from the root folder of this repository:
+    python -m benchmarks.suite [--compare raw/benchmarks/<commit>.json]
+"""
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import time
+from argparse import ArgumentParser
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from xhshow import SessionManager
+
+import get_data
+from benchmarks.common import fake_cookies, load_server
+from output_format import dump_posts, post_fields
+from schema import homefeed_adapter
+from stub_server import detail_page, explore_page
+from xhshow_contrib import extract_initial_state
+
+parser = ArgumentParser()
+parser.add_argument("--repeat", type=int, default=200,
+                    help="Number of runs of each stage.")
+parser.add_argument("--tool_repeat", type=int, default=20,
+                    help="Number of runs of each tool.")
+parser.add_argument("--output_dir", default="raw/benchmarks")
+parser.add_argument("--compare", help="Results of another commit to compare with.")
+cmd, _ = parser.parse_known_args()
+
+
+def summarize(seconds: list[float]) -> dict:
+    seconds = sorted(seconds)
+    return {
+        "runs": len(seconds),
+        "median_ms": statistics.median(seconds) * 1000,
+        "p95_ms": seconds[int(len(seconds) * 0.95) - 1] * 1000,
+        "min_ms": seconds[0] * 1000,
+    }
+
+
+def time_stage(function, repeat: int) -> dict:
+    seconds = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        seconds.append(time.perf_counter() - start)
+    return summarize(seconds)
+
+
+def stages(repeat: int) -> dict:
+    client = get_data.signer()
+    session = SessionManager()
+    payload = {"keyword": "旅行", "page": 1, "page_size": 20, "search_id": "x",
+               "sort": "general", "note_type": 0, "image_formats": ["jpg", "webp"]}
+    explore_html = explore_page()
+    id_ = "0" * 24
+    detail_html = detail_page(id_)
+    with open("tests/feed_subsequent_page_response.json", encoding="utf-8") as f:
+        homefeed_bytes = f.read().encode("utf-8")
+    posts = homefeed_adapter.validate_json(homefeed_bytes)['data']['items'] * 2
+    details = [get_data.parse_detail(detail_html, id_, "url")] * 20
+    timestamp = int(time.time() * 1000)
+
+    cases = {
+        "sign_headers_get": lambda: client.sign_headers_get(
+            uri=f"{get_data.www_origin}/explore", cookies=fake_cookies,
+            timestamp=timestamp, session=session),
+        "sign_headers_post": lambda: client.sign_headers_post(
+            uri=f"{get_data.edith_origin}/api/sns/web/v1/search/notes",
+            cookies=fake_cookies, payload=payload, timestamp=timestamp,
+            session=session),
+        "build_json_body": lambda: client.build_json_body(payload),
+        "extract_initial_state (explore)": lambda: extract_initial_state(explore_html),
+        "parse_detail": lambda: get_data.parse_detail(detail_html, id_, "url"),
+        "decode homefeed posts": lambda: homefeed_adapter.validate_json(homefeed_bytes),
+        "dump_posts (78 posts, columns)": lambda: dump_posts(posts, "columns",
+                                                             post_fields),
+        "json.dumps (20 details)": lambda: json.dumps({"posts": details}),
+    }
+    return {name: time_stage(function, repeat) for name, function in cases.items()}
+
+
+async def tools(repeat: int) -> dict:
+    server, stub = load_server()
+    calls = {
+        "get_feed (2 pages)": ("get_feed", {"pages": 2}),
+        "search (2 pages)": ("search", {"query": "旅行", "pages": 2}),
+        "get_details (10 posts)": ("get_details", {
+            "id_list": [f"{i:024x}" for i in range(10)],
+            "xsec_token_list": ["token"] * 10,
+        }),
+    }
+    results = {}
+    async with create_connected_server_and_client_session(server.mcp) as session:
+        for name, (tool, arguments) in calls.items():
+            seconds = []
+            for _ in range(repeat):
+                start = time.perf_counter()
+                result = await session.call_tool(tool, arguments)
+                seconds.append(time.perf_counter() - start)
+                assert not result.isError, result.content
+            results[name] = summarize(seconds)
+    await server.account_pool.aclose()
+    stub.shutdown()
+    return results
+
+
+def commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            check=True,
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def main():
+    results = {
+        "commit": commit(),
+        "time": time.strftime("%Y-%m-%d %H:%M:%S %z"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "stages": stages(cmd.repeat),
+        "tools": asyncio.run(tools(cmd.tool_repeat)),
+    }
+    os.makedirs(cmd.output_dir, exist_ok=True)
+    output_path = os.path.join(cmd.output_dir, f"{results['commit']}.json")
+    with open(output_path, "w") as f:
+        json.dump(results, f, indent=4)
+
+    baseline = {}
+    if cmd.compare:
+        with open(cmd.compare) as f:
+            baseline = json.load(f)
+        print(f"Compared with commit {baseline['commit']}.")
+    print(f"{'':<34} {'median ms':>10} {'p95 ms':>10} {'vs base':>8}")
+    for group in ["stages", "tools"]:
+        print(group)
+        for name, result in results[group].items():
+            base = baseline.get(group, {}).get(name)
+            ratio = f"{result['median_ms'] / base['median_ms']:>7.2f}x" if base else ""
+            print(f"  {name:<32} {result['median_ms']:>10.3f} {result['p95_ms']:>10.3f} "
+                  f"{ratio:>8}")
+    print(f"Results are saved to {output_path}")
+
+
+main()
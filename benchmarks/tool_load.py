@@ -0,0 +1,48 @@
+"""
+Throughput of MCP tool calls sent in parallel to one server process, whose backend is
+the local stub server. Run from the root folder of this repository:
+    python -m benchmarks.tool_load
+Fake cookies are used, and the rate limits are lifted to measure the server alone.
+"""
+import asyncio
+import time
+from argparse import ArgumentParser
+
+from mcp.shared.memory import create_connected_server_and_client_session
+
+from benchmarks.common import load_server
+
+parser = ArgumentParser()
+parser.add_argument("--posts", type=int, default=4, help="Posts per tool call.")
+parser.add_argument("--latency", type=float, default=0.2,
+                    help="Seconds of delay of the stub server per request.")
+parser.add_argument("--parallel", type=int, nargs="+", default=[1, 2, 4, 8, 16],
+                    help="Numbers of tool calls sent at the same time.")
+cmd, _ = parser.parse_known_args()
+
+server, stub = load_server(latency=cmd.latency)
+
+
+async def main():
+    async with create_connected_server_and_client_session(server.mcp) as session:
+        print(f"{cmd.posts} posts per call, {cmd.latency}s latency of stub server.")
+        print(f"{'parallel':>8} {'seconds':>8} {'calls/s':>8} {'posts/s':>8}")
+        for n in cmd.parallel:
+            calls = [
+                session.call_tool("get_details", {
+                    "id_list": [f"{i:012x}{j:012x}" for j in range(cmd.posts)],
+                    "xsec_token_list": ["token"] * cmd.posts,
+                })
+                for i in range(n)
+            ]
+            start = time.perf_counter()
+            results = await asyncio.gather(*calls)
+            elapsed = time.perf_counter() - start
+            assert not any(result.isError for result in results)
+            print(f"{n:>8} {elapsed:>8.2f} {n / elapsed:>8.1f} "
+                  f"{n * cmd.posts / elapsed:>8.1f}")
+    await server.account_pool.aclose()
+
+
+asyncio.run(main())
+stub.shutdown()
@@ -0,0 +1,235 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+
+
+class DetailCache:
+    """
+    Persistent cache of post details, keyed by post ID. Each entry expires after its TTL,
+    and the least recently used entries are evicted when the number of entries exceeds
+    the cap.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400, max_entries: int = 10000):
+        """
+        Args:
+            path: path of SQLite database file.
+            ttl: default seconds before an entry expires.
+            max_entries: maximum number of entries kept on disk.
+        """
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS details ("
+            "id TEXT PRIMARY KEY, record TEXT NOT NULL, "
+            "expires_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS details_accessed_at ON details (accessed_at)")
+        self.connection.commit()
+
+    def get_many(self, id_list: list[str]) -> dict[str, dict]:
+        """
+        Returns:
+            dict mapping post IDs to details, for posts cached and not expired.
+        """
+        if not id_list:
+            return {}
+        now = time.time()
+        placeholders = ",".join("?" * len(id_list))
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT id, record FROM details "
+                f"WHERE id IN ({placeholders}) AND expires_at > ?",
+                [*id_list, now],
+            ).fetchall()
+            self.connection.executemany(
+                "UPDATE details SET accessed_at = ? WHERE id = ?",
+                [(now, id_) for id_, _ in rows],
+            )
+            self.connection.commit()
+        return {id_: json.loads(record) for id_, record in rows}
+
+    def put_many(self, records: dict[str, dict], ttl: float = None):
+        """
+        Args:
+            records: dict mapping post IDs to details.
+            ttl: seconds before these entries expire, default to the cache's TTL.
+        """
+        if not records:
+            return
+        now = time.time()
+        expires_at = now + (self.ttl if ttl is None else ttl)
+        with self.lock:
+            self.connection.executemany(
+                "INSERT OR REPLACE INTO details (id, record, expires_at, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(id_, json.dumps(record), expires_at, now)
+                 for id_, record in records.items()],
+            )
+            self.connection.execute("DELETE FROM details WHERE expires_at <= ?", [now])
+            # Evict least recently used entries.
+            self.connection.execute(
+                "DELETE FROM details WHERE id IN ("
+                "SELECT id FROM details ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                [self.max_entries],
+            )
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class SearchCache:
+    """
+    Cache of searching results in memory and on disk, keyed by normalized query, page and
+    filters. Entries younger than "ttl" are fresh. Older entries are still served until
+    "stale_ttl", while a background task fetches them again (stale-while-revalidate).
+    """
+
+    def __init__(self, path: str, ttl: float = 300, stale_ttl: float = 3600):
+        """
+        Args:
+            path: path of SQLite database file.
+            ttl: seconds before an entry becomes stale.
+            stale_ttl: seconds before an entry is no longer served.
+        """
+        assert stale_ttl >= ttl, "Stale TTL must not be less than TTL."
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.memory = {}
+        # Keys being fetched in background, so that a stale entry is refreshed once.
+        self.refreshing = {}
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS search_pages ("
+            "key TEXT PRIMARY KEY, record TEXT NOT NULL, fetched_at REAL NOT NULL)"
+        )
+        self.connection.commit()
+
+    @staticmethod
+    def key(query: str, page: int, filters: dict) -> str:
+        normalized_query = " ".join(query.split()).lower()
+        return f"{normalized_query}\t{page}\t{json.dumps(filters, sort_keys=True)}"
+
+    def get(self, key: str):
+        """
+        Returns:
+            The cached value and its age in seconds, or None if it's missing or older
+            than "stale_ttl".
+        """
+        entry = self.memory.get(key)
+        if entry is None:
+            with self.lock:
+                row = self.connection.execute(
+                    "SELECT record, fetched_at FROM search_pages WHERE key = ?", [key]
+                ).fetchone()
+            if row is None:
+                return None
+            entry = self.memory[key] = (json.loads(row[0]), row[1])
+        value, fetched_at = entry
+        age = time.time() - fetched_at
+        if age >= self.stale_ttl:
+            return None
+        return value, age
+
+    def put(self, key: str, value):
+        now = time.time()
+        self.memory[key] = (value, now)
+        self.memory = {k: v for k, v in self.memory.items()
+                       if v[1] > now - self.stale_ttl}
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO search_pages (key, record, fetched_at) "
+                "VALUES (?, ?, ?)",
+                [key, json.dumps(value), now],
+            )
+            self.connection.execute(
+                "DELETE FROM search_pages WHERE fetched_at <= ?", [now - self.stale_ttl])
+            self.connection.commit()
+
+    def refresh(self, key: str, fetch):
+        """
+        Fetch the value again in background, unless it's being fetched.
+        Args:
+            fetch: coroutine function returning the new value.
+        """
+        if key in self.refreshing:
+            return
+        self.refreshing[key] = asyncio.create_task(self.refresh_(key, fetch))
+
+    async def refresh_(self, key: str, fetch):
+        try:
+            self.put(key, await fetch())
+        except Exception as e:
+            # The stale entry is kept and served until it expires.
+            logging.warning(f"Fail to refresh searching results in background: {e}")
+        finally:
+            del self.refreshing[key]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
+
+
+class CommentCache:
+    """
+    Persistent cache of pages of comments, keyed by post ID and the cursor of the page,
+    so that a later call asking for more comments of a post only fetches the pages after
+    the cached ones. Each page expires after the TTL.
+    """
+
+    def __init__(self, path: str, ttl: float = 3600):
+        """
+        Args:
+            path: path of SQLite database file.
+            ttl: seconds before a page expires.
+        """
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS comment_pages ("
+            "id TEXT NOT NULL, cursor TEXT NOT NULL, record TEXT NOT NULL, "
+            "fetched_at REAL NOT NULL, PRIMARY KEY (id, cursor))"
+        )
+        self.connection.commit()
+
+    def get(self, id_: str, cursor: str):
+        """
+        Returns:
+            The cached page, or None if it's missing or expired.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT record FROM comment_pages "
+                "WHERE id = ? AND cursor = ? AND fetched_at > ?",
+                [id_, cursor, time.time() - self.ttl],
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, id_: str, cursor: str, page):
+        now = time.time()
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO comment_pages (id, cursor, record, fetched_at) "
+                "VALUES (?, ?, ?, ?)",
+                [id_, cursor, json.dumps(page, ensure_ascii=False), now],
+            )
+            self.connection.execute(
+                "DELETE FROM comment_pages WHERE fetched_at <= ?", [now - self.ttl])
+            self.connection.commit()
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
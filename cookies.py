@@ -1,38 +1,123 @@
+import csv
 import json
+import logging
 import os
 import time
 from argparse import ArgumentParser
 
-import pandas as pd
-
 cookies_csv_path = "raw/cookies.csv"
 
 
-def dump_cookies(cookies_path):
+def compiled_path(cookies_path: str) -> str:
+    """
+    Path of the compiled cookies next to the CSV file, e.g. "raw/cookies.json".
+    """
+    return os.path.splitext(cookies_path)[0] + ".json"
+
+
+def dump_cookies(cookies_path, output_path=cookies_csv_path):
+    """
+    Save cookies exported by the browser extension to a CSV file for reading, and
+    compile the names, values and expiry to a JSON file next to it, which the server
+    loads at start.
+    """
     with open(cookies_path) as f:
         raw_cookies = json.load(f)
-    cookies = pd.DataFrame(raw_cookies['cookies'])
-    cookies.to_csv(cookies_csv_path, index=False)
+    # Columns of every cookie, in the order they first appear.
+    columns = list(dict.fromkeys(k for cookie in raw_cookies['cookies'] for k in cookie))
+    os.makedirs(os.path.dirname(output_path) or ".", exist_ok=True)
+    with open(output_path, "w", newline="") as f:
+        writer = csv.DictWriter(f, columns)
+        writer.writeheader()
+        writer.writerows(raw_cookies['cookies'])
+    cookies, expiry_datetime = read_csv_cookies(output_path)
+    with open(compiled_path(output_path), "w") as f:
+        json.dump({"cookies": cookies, "expires_at": expiry_datetime}, f)
 
 
-def load_cookies():
-    if not os.path.isfile(cookies_csv_path):
+def read_csv_cookies(cookies_path: str):
+    with open(cookies_path, newline="") as f:
+        rows = list(csv.DictReader(f))
+    # Session cookies have no expiration date.
+    expiration_dates = [float(row['expirationDate']) for row in rows
+                        if row.get('expirationDate')]
+    expiry_datetime = (min(expiration_dates) + 86400 if expiration_dates
+                       else float("inf"))
+    cookies = {row['name']: row['value'] for row in rows}
+    return cookies, expiry_datetime
+
+
+def read_cookies(cookies_path: str):
+    """
+    Read the compiled cookies if they are up to date with the CSV file, otherwise parse
+    the CSV file.
+    Returns:
+        dict of cookies.
+        Time (time.time) when the cookies expire.
+    """
+    json_path = compiled_path(cookies_path)
+    if (os.path.isfile(json_path)
+            and os.path.getmtime(json_path) >= os.path.getmtime(cookies_path)):
+        with open(json_path) as f:
+            compiled = json.load(f)
+        return compiled['cookies'], float(compiled['expires_at'])
+    return read_csv_cookies(cookies_path)
+
+
+def load_cookies_file(cookies_path: str = None):
+    """
+    Read cookies, raising an error if they don't exist or expired.
+    Args:
+        cookies_path: CSV file of cookies, default to "cookies_csv_path".
+
+    Returns:
+        dict of cookies.
+        Time (time.time) when the cookies expire.
+    """
+    cookies_path = cookies_path or cookies_csv_path
+    if not os.path.isfile(cookies_path):
         raise Exception("Cookies file doesn't exist.")
-    cookies = pd.read_csv(cookies_csv_path)
-    expiry_datetime = cookies['expirationDate'].min() + 86400
+    cookies, expiry_datetime = read_cookies(cookies_path)
     if time.time() > expiry_datetime:
         raise Exception("Cookies expired. ")
-    cookies = {row['name']: row['value'] for _, row in cookies.iterrows()}
-    return cookies
+    return cookies, expiry_datetime
+
+
+def load_cookies():
+    return load_cookies_file()[0]
+
+
+def load_cookies_dir(cookies_dir: str):
+    """
+    Load cookies of several accounts, one CSV file per account. Expired cookies are
+    skipped.
+    Returns:
+        dict mapping file names to (dict of cookies, time when the cookies expire).
+    """
+    accounts = {}
+    for file_name in sorted(os.listdir(cookies_dir)):
+        if not file_name.endswith(".csv"):
+            continue
+        cookies, expiry_datetime = read_cookies(os.path.join(cookies_dir, file_name))
+        if time.time() > expiry_datetime:
+            logging.warning(f"Cookies {file_name} expired.")
+            continue
+        accounts[file_name] = cookies, expiry_datetime
+    if not accounts:
+        raise Exception(f"No valid cookies in {cookies_dir}.")
+    return accounts
 
 
 if __name__ == '__main__':
     parser = ArgumentParser()
     parser.add_argument("--input_path", required=True)
+    parser.add_argument("--output_path", default=cookies_csv_path,
+                        help="For several accounts, save each account's cookies to "
+                             "raw/cookies/$account_name.csv instead.")
     cmd, _ = parser.parse_known_args()
 
     try:
-        dump_cookies(cmd.input_path)
+        dump_cookies(cmd.input_path, cmd.output_path)
     except FileNotFoundError:
         raise Exception(
             f"Cookies file not found at {cmd.input_path}")
@@ -0,0 +1,70 @@
+"""
+Time budget of tool calls. When the deadline arrives, a tool returns what is finished so
+far and what is left, instead of running until the MCP client times out and discards
+everything.
+"""
+import asyncio
+import logging
+import time
+
+
+def deadline_after(seconds: float | None) -> float | None:
+    """
+    Returns:
+        Deadline (time.monotonic) after the time budget, or None if there is no budget.
+    """
+    if not seconds:
+        return None
+    assert seconds > 0, "Time budget must be a positive number of seconds."
+    return time.monotonic() + seconds
+
+
+def remaining(deadline: float | None) -> float | None:
+    """
+    Returns:
+        Seconds left before the deadline, or None if there is no deadline.
+    """
+    if deadline is None:
+        return None
+    return max(deadline - time.monotonic(), 0.0)
+
+
+async def gather_until(coroutines: dict, deadline: float | None = None):
+    """
+    Run coroutines concurrently until all of them finish or the deadline arrives. The
+    coroutines unfinished at the deadline are cancelled, and a coroutine which raises
+    doesn't affect the others.
+    Args:
+        coroutines: dict mapping keys, e.g. post IDs, to coroutines.
+        deadline: time.monotonic of the deadline, or None to wait for all.
+
+    Returns:
+        dict mapping keys to results of the coroutines which finish.
+        dict mapping keys to error messages of the coroutines which raise.
+        list of keys of the coroutines unfinished at the deadline.
+    """
+    tasks = {key: asyncio.ensure_future(coroutine)
+             for key, coroutine in coroutines.items()}
+    pending = set()
+    try:
+        if tasks:
+            _, pending = await asyncio.wait(tasks.values(), timeout=remaining(deadline))
+    except asyncio.CancelledError:
+        pending = set(tasks.values())
+        raise
+    finally:
+        for task in pending:
+            task.cancel()
+        # Wait until cancelled tasks release their accounts and connections.
+        await asyncio.gather(*pending, return_exceptions=True)
+    results, errors, unfinished = {}, {}, []
+    for key, task in tasks.items():
+        if task in pending:
+            unfinished.append(key)
+        elif task.exception() is not None:
+            error = task.exception()
+            logging.warning(f"Fail to fetch {key}: {error}")
+            errors[key] = str(error) or type(error).__name__
+        else:
+            results[key] = task.result()
+    return results, errors, unfinished
@@ -0,0 +1,139 @@
+"""
+Buffer of home feed posts fetched in background, so that "get_feed" is answered in
+milliseconds instead of waiting for the home page and each following page.
+"""
+import asyncio
+import collections
+import logging
+import time
+
+from deadline import remaining
+from get_data import feed_page, new_feed_state
+
+# Number of posts of the first page and of each following page of home feed.
+first_page_size = 39
+page_size = 15
+
+
+def feed_post_count(pages: int) -> int:
+    """
+    Number of posts of the first "pages" pages of home feed.
+    """
+    assert pages >= 1, "Number of pages must be a positive integer."
+    return first_page_size + page_size * (pages - 1)
+
+
+class FeedPool:
+    """
+    Keep up to "capacity" fresh posts of home feed. A worker fetches pages in background,
+    continuing from the last page, until the buffer is full, and runs again whenever
+    posts are taken. Posts older than "max_age" are dropped, and the feed restarts from
+    the home page when its pages are older than that, because the website recommends new
+    posts when the home page is refreshed.
+    """
+
+    def __init__(self, account_pool, capacity: int = 200, max_age: float = 600):
+        """
+        Args:
+            account_pool: accounts.AccountPool.
+            capacity: number of posts kept in the buffer.
+            max_age: seconds before a buffered post is dropped.
+        """
+        self.account_pool = account_pool
+        self.capacity = capacity
+        self.max_age = max_age
+        # Posts with the time they are fetched, oldest first.
+        self.buffer = collections.deque()
+        # IDs of posts buffered or taken since the feed started from the home page.
+        self.seen = set()
+        self.state = new_feed_state()
+        self.fetched_at = 0.0
+        # Number of posts waited for by "take", which may exceed the capacity.
+        self.wanted = 0
+        self.worker = None
+        self.error = None
+        self.changed = asyncio.Event()
+
+    def expire(self):
+        now = time.time()
+        while self.buffer and self.buffer[0][1] < now - self.max_age:
+            self.buffer.popleft()
+        if self.fetched_at < now - self.max_age and self.state['page'] > 0:
+            self.state = new_feed_state()
+            self.seen = {post['id'] for post, _ in self.buffer}
+
+    def fill(self):
+        """
+        Start the worker unless it's running or the buffer is full.
+        """
+        if self.worker is not None and not self.worker.done():
+            return
+        if len(self.buffer) >= max(self.capacity, self.wanted):
+            return
+        self.worker = asyncio.create_task(self.run())
+
+    async def run(self):
+        self.error = None
+        try:
+            while len(self.buffer) < max(self.capacity, self.wanted):
+                self.expire()
+                async with self.account_pool.use(prefer=self.state.get('account')) \
+                        as account:
+                    self.state['account'] = account.name
+                    posts, _ = await feed_page(account, self.state)
+                self.state['page'] += 1
+                self.fetched_at = time.time()
+                new_posts = [post for post in posts if post['id'] not in self.seen]
+                assert new_posts, "Home feed has no new posts."
+                self.seen.update(post['id'] for post in new_posts)
+                self.buffer.extend((post, self.fetched_at) for post in new_posts)
+                self.notify()
+        except Exception as e:
+            # The page is fetched again when posts are taken next time.
+            logging.warning(f"Fail to fetch home feed in background: {e}")
+            self.error = str(e)
+        finally:
+            self.notify()
+
+    def notify(self):
+        self.changed.set()
+        self.changed = asyncio.Event()
+
+    async def take(self, count: int, deadline: float = None):
+        """
+        Take the oldest fresh posts, waiting for the worker if there are not enough.
+        Args:
+            count: number of posts.
+            deadline: optional time.monotonic when the posts buffered so far are taken.
+
+        Returns:
+            list of posts, fewer than "count" if the worker fails or the deadline
+            arrives.
+            Error message if the worker fails or the deadline arrives before "count"
+            posts are buffered, otherwise None.
+        """
+        self.expire()
+        self.wanted = count
+        self.fill()
+        error = None
+        try:
+            while len(self.buffer) < count:
+                if self.worker.done():
+                    error = self.error
+                    break
+                try:
+                    await asyncio.wait_for(self.changed.wait(), remaining(deadline))
+                except TimeoutError:
+                    error = ("Time budget is used up before enough posts of home feed "
+                             "arrive.")
+                    break
+        finally:
+            self.wanted = 0
+        posts = [self.buffer.popleft()[0] for _ in range(min(count, len(self.buffer)))]
+        assert posts or error is None, error
+        self.fill()
+        return posts, error
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.cancel()
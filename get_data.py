@@ -1,14 +1,20 @@
+import asyncio
+import functools
 import json
 import logging
-import random
-import re
 import time
+from datetime import datetime
+from urllib.parse import quote
 
-import pandas as pd
-from bs4 import BeautifulSoup
-from xhshow import Xhshow, SessionManager, CryptoConfig
+import httpx
 
-from xhshow_contrib import extract_initial_state, search_id
+import metrics
+import retry
+from deadline import gather_until
+from schema import (comments_adapter, detail_adapter, homefeed_adapter, posts_adapter,
+                    search_adapter, status_adapter)
+from xhshow_contrib import (china_timezone, extract_initial_state, extract_og_images,
+                            search_id)
 
 with open("headers/explore.json", "r") as f:
     header_explore = json.load(f)
@@ -16,60 +22,180 @@ with open("headers/homefeed.json", "r") as f:
     header_homefeed = json.load(f)
 with open("headers/search.json", "r") as f:
     header_search = json.load(f)
+# Comments are fetched by GET, without body.
+header_comments = {k: v for k, v in header_homefeed.items() if k != "content-type"}
 # Humans use the same browser to visit any page of xiaohongshu.com forum, so user-agent
 # should be the same.
 assert header_explore['user-agent'] == header_homefeed['user-agent'] == header_search ['user-agent'], \
     ("Source code check fails, because user agent of explore & homefeed & search header are "
      "not unified.")
-client_config = CryptoConfig().with_overrides(
-    PUBLIC_USERAGENT=header_explore['user-agent']
-)
-client = Xhshow(config=client_config)
-# Intermediate constant may be generated
-xhs_session = SessionManager()
 
 
-def feed_first_page(session, cookies):
-    current_timestamp = int(time.time() * 1000)
-    header = client.sign_headers_get(
-        uri="https://www.xiaohongshu.com/explore",
-        cookies=cookies,
-        xsec_appid=cookies['xsecappid'],
-        timestamp=current_timestamp,
-        session=xhs_session,
-    )
-    header.update(header_explore)
-    response = session.get(
-        url="https://www.xiaohongshu.com/explore",
-        headers=header,
-        cookies=cookies,
+@functools.cache
+def signer():
+    """
+    Client of xhshow signing requests. xhshow takes tens of milliseconds to import, so
+    it's imported when the first request is signed instead of at start.
+    """
+    from xhshow import CryptoConfig, Xhshow
+
+    client_config = CryptoConfig().with_overrides(
+        PUBLIC_USERAGENT=header_explore['user-agent']
     )
-    assert response.status_code == 200, "Fail to fetch home page of xiaohongshu."
-    initial_state = extract_initial_state(response.text)
-    posts = []
-    for feed in initial_state['feed']['feeds']:
-        post = {
-            "id": feed['id'],
-            "xsec_token": feed['xsecToken'],
-            # no title is possible
-            "title": feed['noteCard'].get('displayTitle', ''),
-            # resolution: blur, median, original (not available in feed)
-            "cover_median_url": feed['noteCard']['cover']['urlDefault'],
-            'user_id': feed['noteCard']['user']['userId'],
-            'user_name': feed['noteCard']['user']['nickName'],
-            'user_xsec_token': feed['noteCard']['user']['xsecToken'],
-        }
-        posts.append(post)
-    time.sleep(random.uniform(0.7, 1.3))
+    return Xhshow(config=client_config)
+
+
+www_origin = "https://www.xiaohongshu.com"
+edith_origin = "https://edith.xiaohongshu.com"
+# Requests per second and burst of each host and endpoint for each account, see
+# RateScheduler. Requests wait before being sent instead of sleeping afterward, so there
+# is no delay after the last page.
+default_rates = {
+    "www": (5, 5),
+    "www/explore": (1, 1),
+    "www/detail": (4, 4),
+    "edith": (5, 5),
+    "edith/homefeed": (1, 1),
+    "edith/search": (1, 1),
+    "edith/detail": (4, 4),
+    "edith/comments": (2, 2),
+}
+# How details of posts are fetched: "html" downloads the web page of the post, and "api"
+# calls the JSON API which the web page calls when a post is opened from the feed,
+# falling back to the web page if the API fails.
+detail_backends = ["html", "api"]
+detail_backend = "html"
+
+
+class ResponseError(Exception):
+    """
+    The website rejects a request, by an HTTP error or "success: false", or responds
+    something which can't be parsed.
+    """
+
+
+# Responses worth sending the request again. 406 means the signature is rejected, e.g.
+# its timestamp is too old after waiting in a queue, and each attempt is signed again.
+retry_status_codes = {406, 429, 500, 502, 503, 504}
+# APIs respond "success: false" with this code when requests are too frequent.
+throttled_codes = {300013}
+
+
+def response_ok(response) -> bool:
+    """
+    Whether the website accepts the request. APIs respond "success: false" with HTTP 200
+    when rejecting requests.
+    """
+    if response.status_code != 200:
+        return False
+    if "json" in response.headers.get("content-type", ""):
+        return status_adapter.validate_json(response.content)['success'] == True
+    return True
+
+
+def should_retry(response) -> bool:
+    """
+    Whether the request failed for a transient reason. Requests rejected because the
+    account has to pass a captcha or is logged out are not sent again.
+    """
+    if response.status_code in retry_status_codes:
+        return True
+    return (response.status_code == 200
+            and "json" in response.headers.get("content-type", "")
+            and status_adapter.validate_json(response.content)['code'] in throttled_codes)
+
+
+async def send(account, endpoint: str, method: str, url: str, headers: dict,
+               sign=None, content: str = None):
+    """
+    Send a request when the account's rate limit of the endpoint allows, and adapt the
+    rate by the response. Transient failures are retried up to "retry.max_attempts"
+    times after a random backoff, and requests to a host which keeps failing fail at once
+    while its circuit breaker is open.
+    Args:
+        account: accounts.Account.
+        endpoint: name of the endpoint in "default_rates", e.g. "edith/search".
+        method: "GET" or "POST".
+        url: URL of the request.
+        headers: headers of the browser.
+        sign: optional function returning signature headers. It's called after waiting
+        for the rate limit of each attempt, so the signature's timestamp is fresh.
+        content: body of POST request.
+
+    Returns:
+        httpx.Response of the last attempt.
+    """
+    host = httpx.URL(url).netloc.decode("ascii")
+    breaker = retry.breaker(host)
+    for attempt in range(retry.max_attempts):
+        if not breaker.allow():
+            raise retry.CircuitOpenError(f"{host} keeps failing, so requests are paused "
+                                         f"for {breaker.retry_after():.0f} seconds.")
+        if attempt > 0:
+            retry.count(endpoint)
+            await asyncio.sleep(retry.backoff_delay(attempt - 1))
+        with metrics.span("rate_wait", endpoint):
+            await account.rate_scheduler.acquire(endpoint)
+        header = {}
+        if sign is not None:
+            with metrics.span("sign", endpoint):
+                header = sign()
+        header.update(headers)
+        try:
+            with metrics.span("http", endpoint):
+                response = await account.client.request(method, url, headers=header,
+                                                        content=content)
+        except httpx.TransportError as e:
+            breaker.report(False)
+            account.rate_scheduler.report(endpoint, False)
+            logging.warning(f"Request to {endpoint} fails, attempt {attempt + 1}: {e!r}")
+            if attempt + 1 == retry.max_attempts:
+                raise
+            continue
+        metrics.count_response(endpoint, response.status_code,
+                               response.num_bytes_downloaded)
+        # Only server errors tell that the host is down, throttling is per account.
+        breaker.report(response.status_code < 500)
+        ok = response_ok(response)
+        account.rate_scheduler.report(endpoint, ok)
+        if ok:
+            return response
+        account.check(response)
+        if not should_retry(response) or account.blocked:
+            return response
+        logging.warning(f"Request to {endpoint} fails, attempt {attempt + 1}: "
+                        f"HTTP {response.status_code}.")
+    return response
+
+
+async def feed_first_page(account):
+    cookies = account.cookies
+
+    def sign():
+        return signer().sign_headers_get(
+            uri=f"{www_origin}/explore",
+            cookies=cookies,
+            xsec_appid=cookies['xsecappid'],
+            timestamp=int(time.time() * 1000),
+            session=account.xhs_session,
+        )
+
+    response = await send(account, "www/explore", "GET", f"{www_origin}/explore",
+                          headers=header_explore, sign=sign)
+    if response.status_code != 200:
+        raise ResponseError("Fail to fetch home page of xiaohongshu.")
+    with metrics.span("parse", "www/explore"):
+        initial_state = extract_initial_state(response.text)
+        posts = posts_adapter.validate_python(initial_state['feed']['feeds'])
     return posts
 
 
-def feed_subsequent_page(session, cookies, note_index, page, cursor_score):
+async def feed_subsequent_page(account, note_index, page, cursor_score):
+    cookies = account.cookies
     if page == 1:  # second page
         refresh_type = 1
     else:
         refresh_type = 3
-    current_timestamp = int(time.time() * 1000)
     payload = {
         "cursor_score": cursor_score,
         "num": 39,
@@ -85,56 +211,82 @@ def feed_subsequent_page(session, cookies, note_index, page, cursor_score):
         "need_filter_image": False,
     }
 
-    header = client.sign_headers_post(
-        uri="https://edith.xiaohongshu.com/api/sns/web/v1/homefeed",
-        cookies=cookies,
-        xsec_appid=cookies['xsecappid'],
-        payload=payload,
-        timestamp=current_timestamp,
-        session=xhs_session,
-    )
-    header.update(header_homefeed)
+    def sign():
+        return signer().sign_headers_post(
+            uri=f"{edith_origin}/api/sns/web/v1/homefeed",
+            cookies=cookies,
+            xsec_appid=cookies['xsecappid'],
+            payload=payload,
+            timestamp=int(time.time() * 1000),
+            session=account.xhs_session,
+        )
+
     logging.info(f"POST --URL /api/sns/web/v1/homefeed --Payload {payload}")
-    payload_str = client.build_json_body(payload)
+    payload_str = signer().build_json_body(payload)
 
-    response = session.post(
-        url="https://edith.xiaohongshu.com/api/sns/web/v1/homefeed",
-        data=payload_str,
-        cookies=cookies,
-        headers=header,
+    response = await send(
+        account, "edith/homefeed", "POST", f"{edith_origin}/api/sns/web/v1/homefeed",
+        headers=header_homefeed, sign=sign, content=payload_str,
     )
-    assert response.status_code == 200, \
-        (f"Fail to fetch xiaohongshu thread. Page: {page} (starts from 0). "
-         f"Status code: {response.status_code}. Text: {response.text}")
-    response_json = response.json()
-    assert response_json['success'] == True, \
-        f"Fail to fetch, website's message: {response_json['msg']}."
-    cursor_score = response_json['data']['cursor_score']
-    posts = []
-    for item in response_json['data']['items']:
-        post = {
-            'id': item['id'],
-            'xsec_token': item['xsec_token'],
-            'title': item['note_card'].get('display_title', ''),
-            'cover_median_url': item['note_card']['cover']['url_default'],
-            'user_id': item['note_card']['user']['user_id'],
-            'user_name': item['note_card']['user']['nick_name'],
-            'user_xsec_token': item['note_card']['user']['xsec_token'],
-        }
-        posts.append(post)
-    time.sleep(random.uniform(0.7, 1.3))
+    if response.status_code != 200:
+        raise ResponseError(
+            f"Fail to fetch xiaohongshu thread. Page: {page} (starts from 0). "
+            f"Status code: {response.status_code}. Text: {response.text}")
+    with metrics.span("parse", "edith/homefeed"):
+        response_json = homefeed_adapter.validate_json(response.content)
+        if response_json['success'] != True:
+            raise ResponseError(
+                f"Fail to fetch, website's message: {response_json['msg']}.")
+        cursor_score = response_json['data']['cursor_score']
+        posts = response_json['data']['items']
     return posts, cursor_score
 
 
-def search_page(session, cookies, query, page):
+def new_feed_state() -> dict:
+    """
+    State of the first page of home feed, see "feed_page".
+    """
+    return {"page": 0, "cursor_score": "", "post_count": 0}
+
+
+async def feed_page(account, state: dict):
+    """
+    Fetch the page of home feed described by "state", and update "state" for the next
+    page except "page", as "fetch_page" of "pagination.fetch_pages".
+    Returns:
+        list of posts.
+        Whether there are more pages, always True.
+    """
+    if state['page'] == 0:
+        posts = await feed_first_page(account)
+    else:
+        posts, state['cursor_score'] = await feed_subsequent_page(
+            account=account,
+            note_index=state['post_count'] - 1,
+            page=state['page'],
+            cursor_score=state['cursor_score']
+        )
+    state['post_count'] += len(posts)
+    return posts, True
+
+
+# Sort order and type of posts in searching results.
+search_filters = {"sort": "general", "note_type": 0}
+
+
+async def search_page(account, query, page, search_id_: str = None):
+    """
+    Args:
+        search_id_: ID shared by pages of the same query, generated if not given.
+    """
+    cookies = account.cookies
     current_timestamp = int(time.time() * 1000)
     payload = {
         "keyword": query,
         "page": page + 1,
         "page_size": 20,
-        "search_id": search_id(current_timestamp),
-        "sort": "general",
-        "note_type": 0,
+        "search_id": search_id_ or search_id(current_timestamp),
+        **search_filters,
         "ext_flags": [],
         "filters": [{"tags": ["general"], "type": "sort_type"},
                     {"tags": ["不限"], "type": "filter_note_type"},
@@ -145,94 +297,384 @@ def search_page(session, cookies, query, page):
         "image_formats": ["jpg", "webp", "avif"],
     }
 
-    header = client.sign_headers_post(
-        uri="https://edith.xiaohongshu.com/api/sns/web/v1/search/notes",
-        cookies=cookies,
-        xsec_appid=cookies['xsecappid'],
-        payload=payload,
-        timestamp=current_timestamp,
-        session=xhs_session,
-    )
-    header.update(header_search)
+    def sign():
+        return signer().sign_headers_post(
+            uri=f"{edith_origin}/api/sns/web/v1/search/notes",
+            cookies=cookies,
+            xsec_appid=cookies['xsecappid'],
+            payload=payload,
+            timestamp=int(time.time() * 1000),
+            session=account.xhs_session,
+        )
+
     logging.info(f"POST --URL /api/sns/web/v1/search/notes --Payload {payload}")
-    payload_str = client.build_json_body(payload)
+    payload_str = signer().build_json_body(payload)
 
-    response = session.post(
-        url="https://edith.xiaohongshu.com/api/sns/web/v1/search/notes",
-        data=payload_str,
-        cookies=cookies,
-        headers=header,
+    response = await send(
+        account, "edith/search", "POST", f"{edith_origin}/api/sns/web/v1/search/notes",
+        headers=header_search, sign=sign, content=payload_str,
     )
-    assert response.status_code == 200, \
-        f"Fail to fetch searching results of page {page+1}."
-    response_json = response.json()
-    assert response_json['success'] == True, \
-        f"Fail to fetch, website's message: {response_json['msg']}."
-    posts = []
-    if 'items' not in response_json['data'].keys():
-        logging.info(f"The current page is {page+1} and no more searching results.")
-        has_more = False
-        return posts, has_more
-
-    for item in response_json['data']['items']:
-        if not item['model_type'] == 'note':
-            continue
-        post = {
-            'id': item['id'],
-            'xsec_token': item['xsec_token'],
-            # no title is possible
-            'title': item['note_card'].get('display_title', ''),
-            'cover_median_url': item['note_card']['cover']['url_default'],
-            'user_id': item['note_card']['user']['user_id'],
-            'user_name': item['note_card']['user']['nick_name'],
-            'user_xsec_token': item['note_card']['user']['xsec_token'],
-        }
-        posts.append(post)
-    has_more = response_json['data']['has_more']
-    time.sleep(random.uniform(0.7, 1.3))
+    if response.status_code != 200:
+        raise ResponseError(f"Fail to fetch searching results of page {page+1}.")
+    with metrics.span("parse", "edith/search"):
+        response_json = search_adapter.validate_json(response.content)
+        if response_json['success'] != True:
+            raise ResponseError(
+                f"Fail to fetch, website's message: {response_json['msg']}.")
+        posts = []
+        if response_json['data'] is None or response_json['data']['items'] is None:
+            logging.info(f"The current page is {page+1} and no more searching results.")
+            has_more = False
+            return posts, has_more
+
+        posts = [item for item in response_json['data']['items']
+                 if item.pop('model_type') == 'note']
+        has_more = response_json['data']['has_more']
     return posts, has_more
 
 
-def get_details_(session, cookies, id_list: list[str], xsec_token_list: list[str]):
-    results = []
-    for id_, xsec_token in zip(id_list, xsec_token_list):
-        url = f"https://www.xiaohongshu.com/explore/{id_}?xsec_token={xsec_token}"
-        response = session.get(url, cookies=cookies, headers=header_explore)
-        assert response.status_code == 200, \
-            f"Fail to fetch the post's detail from xiaohongshu. URL: {url}"
-        logging.info(f"GET --URL {url}")
-        tree = BeautifulSoup(response.text, "html.parser")
-        images = [
-            image.get('content')
-            for image in tree.find_all('meta', {'name': 'og:image'})
-        ]
-
-        initial_state_regex = re.compile("window.__INITIAL_STATE__")
-        script_tag = tree.find("script", string=initial_state_regex)
-        script_text = script_tag.text
-        script_text = re.sub("window.__INITIAL_STATE__=", "", script_text)
-        script_text = re.sub("undefined", "null", script_text)
-        initial_state = json.loads(script_text)
+async def search_page_cached(account, query, page, cache, account_pool,
+                             search_id_: str = None):
+    """
+    Same as "search_page", but read from the cache if possible. A stale page is returned
+    at once, and fetched again in background.
+    Args:
+        cache: cache.SearchCache.
+        account_pool: accounts.AccountPool, which the background fetching borrows an
+        account from, because "account" is returned to the pool when this call ends.
+
+    Returns:
+        list of posts.
+        Whether there are more pages.
+        Age of the page in seconds if it's read from the cache, otherwise None.
+    """
+    key = cache.key(query, page, search_filters)
+    cached = cache.get(key)
+    if cached is None:
+        posts, has_more = await search_page(account, query, page, search_id_)
+        cache.put(key, [posts, has_more])
+        return posts, has_more, None
+    (posts, has_more), age = cached
+    if age >= cache.ttl:
+        async def fetch():
+            async with account_pool.use() as refresh_account:
+                return list(await search_page(refresh_account, query, page, search_id_))
+        cache.refresh(key, fetch)
+    return posts, has_more, age
 
+
+async def get_detail(account, id_: str, xsec_token: str):
+    if detail_backend == "api":
         try:
-            note = initial_state['note']['noteDetailMap'][id_]['note']
-        except KeyError:
+            return await get_detail_api(account, id_, xsec_token)
+        except (ResponseError, httpx.HTTPError, ValueError, retry.CircuitOpenError) as e:
+            # ValueError includes responses which are not JSON, e.g. a captcha page.
+            logging.warning(f"{e!r} Fetch the web page instead.")
+    return await get_detail_html(account, id_, xsec_token)
+
+
+async def get_detail_html(account, id_: str, xsec_token: str):
+    url = f"{www_origin}/explore/{id_}?xsec_token={xsec_token}"
+    async with account.details_in_flight:
+        response = await send(account, "www/detail", "GET", url, headers=header_explore)
+    if response.status_code != 200:
+        raise ResponseError(
+            f"Fail to fetch the post's detail from xiaohongshu. URL: {url}")
+    logging.info(f"GET --URL {url}")
+    with metrics.span("parse", "www/detail"):
+        return parse_detail(response.text, id_, url)
+
+
+async def get_detail_api(account, id_: str, xsec_token: str):
+    cookies = account.cookies
+    url = f"{www_origin}/explore/{id_}?xsec_token={xsec_token}"
+    payload = {
+        "source_note_id": id_,
+        "image_formats": ["jpg", "webp", "avif"],
+        "extra": {"need_body_topic": "1"},
+        "xsec_source": "pc_feed",
+        "xsec_token": xsec_token,
+    }
+
+    def sign():
+        return signer().sign_headers_post(
+            uri=f"{edith_origin}/api/sns/web/v1/feed",
+            cookies=cookies,
+            xsec_appid=cookies['xsecappid'],
+            payload=payload,
+            timestamp=int(time.time() * 1000),
+            session=account.xhs_session,
+        )
+
+    logging.info(f"POST --URL /api/sns/web/v1/feed --Payload {payload}")
+    payload_str = signer().build_json_body(payload)
+
+    async with account.details_in_flight:
+        response = await send(
+            account, "edith/detail", "POST", f"{edith_origin}/api/sns/web/v1/feed",
+            headers=header_homefeed, sign=sign, content=payload_str,
+        )
+    if response.status_code != 200:
+        raise ResponseError(f"Fail to fetch the post's detail by API. Status code: "
+                            f"{response.status_code}.")
+    with metrics.span("parse", "edith/detail"):
+        response_json = detail_adapter.validate_json(response.content)
+        if response_json['success'] != True:
+            raise ResponseError(
+                f"Fail to fetch the post's detail by API, website's message: "
+                f"{response_json['msg']}.")
+        items = (response_json['data'] or {}).get('items') or []
+        if not items:
             logging.warning(f"Post {url} does not exist.")
-            continue
-        published_time_stamp = note.get('time')
-        if published_time_stamp:
-            published_time = pd.Timestamp(
-                published_time_stamp, unit='ms', tz='Asia/Shanghai')
-            published_time = published_time.strftime("%Y-%m-%d %H:%M:%S %z")
-        else:
-            published_time = ''
-        results.append({
-            "url": url,
-            "title": note.get('title', ''),
-            "description": note.get('desc', ''),
-            "images": images,
-            "labels": [a.get('name', '') for a in note.get('tagList')],
-            "location": note.get('ipLocation', ''),
-            "published_time": published_time
-        })
-    return results
+            return None
+        note = items[0]['note_card']
+        images = [image['url_default'] for image in note.get('image_list') or []]
+        return note_record(url, note, images=images, labels=note.get('tag_list') or [],
+                           location=note.get('ip_location', ''))
+
+
+def parse_detail(html_content: str, id_: str, url: str) -> dict | None:
+    """
+    Extract details from the web page of a post.
+    Returns:
+        Details of the post, or None if the post doesn't exist.
+    """
+    images = extract_og_images(html_content)
+    initial_state = extract_initial_state(html_content)
+    if initial_state is None:
+        raise ResponseError(
+            f"Fail to find the post's data in the web page. URL: {url}")
+
+    try:
+        note = initial_state['note']['noteDetailMap'][id_]['note']
+    except KeyError:
+        logging.warning(f"Post {url} does not exist.")
+        return None
+    return note_record(url, note, images=images, labels=note.get('tagList') or [],
+                       location=note.get('ipLocation', ''))
+
+
+def format_time(timestamp_ms) -> str:
+    """
+    Format a timestamp in milliseconds of the website in China Standard Time, or return
+    an empty string if it's missing.
+    """
+    if not timestamp_ms:
+        return ''
+    published_time = datetime.fromtimestamp(int(timestamp_ms) / 1000, china_timezone)
+    return published_time.strftime("%Y-%m-%d %H:%M:%S %z")
+
+
+def note_record(url: str, note: dict, images: list[str], labels: list[dict],
+                location: str) -> dict:
+    """
+    Details of a post returned by tools, from the web page or the API, whose keys are
+    in camel case and snake case respectively.
+    """
+    return {
+        "url": url,
+        "title": note.get('title', ''),
+        "description": note.get('desc', ''),
+        "images": images,
+        "labels": [a.get('name', '') for a in labels],
+        "location": location,
+        "published_time": format_time(note.get('time'))
+    }
+
+
+async def get_details_(account_pool, id_list: list[str], xsec_token_list: list[str],
+                       max_workers: int = 4, cache=None, index=None,
+                       deadline: float = None):
+    """
+    Fetch details of posts concurrently.
+    Args:
+        account_pool: accounts.AccountPool. Each post is fetched by the least busy
+        account.
+        id_list: list of post IDs.
+        xsec_token_list: list of access tokens corresponding to the post IDs.
+        max_workers: maximum number of posts fetched by this call at the same time. The
+        limit "details_in_flight" of each account still applies. 1 means fetching one
+        by one.
+        cache: optional cache.DetailCache. Cached posts are not fetched from the website,
+        and fetched posts are written to the cache.
+        index: optional note_index.NoteIndex, which fetched posts are added to.
+        deadline: optional time.monotonic when posts not fetched yet are given up.
+
+    Returns:
+        list of post details in the same order as "id_list". Posts that don't exist,
+        fail or are unfinished at the deadline are skipped.
+        dict of statistics: "cache_hits" and "cache_misses", with "retries", number of
+        requests sent again after transient failures, "errors" mapping IDs of failed
+        posts to error messages, and "unfinished" of the posts given up at the deadline
+        as {"id_list": [...], "xsec_token_list": [...]}, if any.
+    """
+    assert max_workers >= 1, "Number of workers must be a positive integer."
+    assert len(id_list) == len(xsec_token_list), \
+        "Each post ID must have its access token."
+    cached = cache.get_many(id_list) if cache is not None else {}
+    tasks = {id_: xsec_token for id_, xsec_token in zip(id_list, xsec_token_list)
+             if id_ not in cached}
+    workers = asyncio.Semaphore(max_workers)
+
+    async def worker(id_, xsec_token):
+        async with workers, account_pool.use() as account:
+            return await get_detail(account, id_, xsec_token)
+
+    with retry.counting() as retries:
+        fetched, errors, unfinished = await gather_until(
+            {id_: worker(id_, xsec_token) for id_, xsec_token in tasks.items()},
+            deadline)
+    if errors and not (cached or fetched or unfinished):
+        raise ResponseError(
+            "Fail to fetch every post: " + "; ".join(set(errors.values())))
+    fetched = {id_: result for id_, result in fetched.items() if result is not None}
+    if cache is not None:
+        cache.put_many(fetched)
+    if index is not None:
+        index.add_many(fetched, tasks)
+    results = [cached.get(id_) or fetched[id_] for id_ in id_list
+               if id_ in cached or id_ in fetched]
+    stats = {"cache_hits": len(cached), "cache_misses": len(tasks)}
+    if retries:
+        stats['retries'] = retries.total()
+    if errors:
+        stats['errors'] = errors
+    if unfinished:
+        stats['unfinished'] = {"id_list": unfinished,
+                               "xsec_token_list": [tasks[id_] for id_ in unfinished]}
+    return results, stats
+
+
+def signed_url(uri: str, params: dict[str, str]) -> str:
+    """
+    URL of a signed GET request. The query string must be encoded as xhshow signs it,
+    which keeps commas, e.g. in "jpg,webp,avif", unlike "httpx" and "urlencode".
+    """
+    query = "&".join(f"{key}={quote(str(value), safe=',')}"
+                     for key, value in params.items())
+    return f"{uri}?{query}"
+
+
+async def comments_page(account, id_: str, xsec_token: str, cursor: str = ""):
+    """
+    Fetch a page of comments of a post, newest replies of each comment included.
+    Args:
+        cursor: "cursor" returned by the previous page, empty for the first page.
+
+    Returns:
+        dict with "comments", list of comments, "cursor" of the next page and
+        "has_more", whether there are more pages.
+    """
+    cookies = account.cookies
+    params = {
+        "note_id": id_,
+        "cursor": cursor,
+        "top_comment_id": "",
+        "image_formats": "jpg,webp,avif",
+        "xsec_token": xsec_token,
+    }
+    uri = f"{edith_origin}/api/sns/web/v2/comment/page"
+
+    def sign():
+        return signer().sign_headers_get(
+            uri=uri,
+            cookies=cookies,
+            xsec_appid=cookies['xsecappid'],
+            params=params,
+            timestamp=int(time.time() * 1000),
+            session=account.xhs_session,
+        )
+
+    logging.info(f"GET --URL /api/sns/web/v2/comment/page --Params {params}")
+    url = signed_url(uri, params)
+    response = await send(account, "edith/comments", "GET", url,
+                          headers=header_comments, sign=sign)
+    if response.status_code != 200:
+        raise ResponseError(f"Fail to fetch comments of post {id_}. Status code: "
+                            f"{response.status_code}.")
+    with metrics.span("parse", "edith/comments"):
+        response_json = comments_adapter.validate_json(response.content)
+        if response_json['success'] != True:
+            raise ResponseError(
+                f"Fail to fetch, website's message: {response_json['msg']}.")
+        data = response_json['data'] or {"comments": [], "cursor": "", "has_more": False}
+        data['comments'] = [comment_record(comment) for comment in data['comments']]
+    return data
+
+
+def comment_record(comment: dict) -> dict:
+    return {
+        "id": comment['id'],
+        "user_name": comment['user_name'],
+        "content": comment['content'],
+        "like_count": comment['like_count'],
+        "published_time": format_time(comment['create_time']),
+        "location": comment['ip_location'],
+        "reply_count": comment['sub_comment_count'],
+        "replies": comment['sub_comments'],
+    }
+
+
+async def get_comments_(account_pool, id_list: list[str], xsec_token_list: list[str],
+                        max_per_post: int = 20, max_workers: int = 4, cache=None,
+                        deadline: float = None):
+    """
+    Fetch comments of posts concurrently, each post page by page following the cursors.
+    Args:
+        account_pool: accounts.AccountPool. Pages of a post are fetched by the same
+        account.
+        id_list: list of post IDs.
+        xsec_token_list: list of access tokens corresponding to the post IDs.
+        max_per_post: maximum number of comments of each post. Pages are fetched until
+        there are enough comments.
+        max_workers: maximum number of posts fetched by this call at the same time.
+        cache: optional cache.CommentCache. Cached pages are not fetched from the
+        website, and fetched pages are written to the cache.
+        deadline: optional time.monotonic when posts not finished yet are given up.
+
+    Returns:
+        list of {"id", "comments", "has_more"} in the same order as "id_list", for posts
+        which are finished.
+        dict of statistics: "cached_pages" and "fetched_pages", with "retries",
+        "errors" and "unfinished" as "get_details_", if any.
+    """
+    assert max_per_post >= 1, "Maximum number of comments must be a positive integer."
+    assert len(id_list) == len(xsec_token_list), \
+        "Each post ID must have its access token."
+    tokens = dict(zip(id_list, xsec_token_list))
+    workers = asyncio.Semaphore(max_workers)
+    stats = {"cached_pages": 0, "fetched_pages": 0}
+
+    async def worker(id_):
+        comments, cursor, has_more = [], "", True
+        async with workers, account_pool.use() as account:
+            while has_more and len(comments) < max_per_post:
+                page = cache.get(id_, cursor) if cache is not None else None
+                if page is not None:
+                    stats['cached_pages'] += 1
+                else:
+                    page = await comments_page(account, id_, tokens[id_], cursor)
+                    stats['fetched_pages'] += 1
+                    if cache is not None:
+                        cache.put(id_, cursor, page)
+                comments += page['comments']
+                # A page without a new cursor is the last one.
+                has_more = page['has_more'] and page['cursor'] not in ("", cursor)
+                cursor = page['cursor']
+        return {"id": id_, "comments": comments[:max_per_post],
+                "has_more": has_more or len(comments) > max_per_post}
+
+    with retry.counting() as retries:
+        results, errors, unfinished = await gather_until(
+            {id_: worker(id_) for id_ in tokens}, deadline)
+    if errors and not (results or unfinished):
+        raise ResponseError(
+            "Fail to fetch comments of every post: " + "; ".join(set(errors.values())))
+    if retries:
+        stats['retries'] = retries.total()
+    if errors:
+        stats['errors'] = errors
+    if unfinished:
+        stats['unfinished'] = {"id_list": unfinished,
+                               "xsec_token_list": [tokens[id_] for id_ in unfinished]}
+    return [results[id_] for id_ in tokens if id_ in results], stats
@@ -0,0 +1,112 @@
+import contextvars
+import functools
+import importlib.util
+import logging
+import time
+
+import httpx
+
+from replay import RecordingTransport, ReplayTransport
+
+
+# Start time of the connection being set up by the current task.
+connect_started = contextvars.ContextVar("connect_started")
+
+
+class TracedTransport(httpx.AsyncHTTPTransport):
+    """
+    HTTP transport that counts new connections and the time spent on setting them up
+    (DNS, TCP and TLS), so that the benefit of reusing connections is measurable.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connections = 0
+        self.connect_seconds = 0.0
+        self.requests = 0
+
+    async def trace(self, event_name: str, info: dict):
+        # Events are "connection.connect_tcp.started", "connection.start_tls.complete",
+        # etc. TCP and TLS setup happen one after another in the same task.
+        if event_name in ("connection.connect_tcp.started",
+                          "connection.start_tls.started"):
+            connect_started.set(time.perf_counter())
+        elif event_name in ("connection.connect_tcp.complete",
+                            "connection.start_tls.complete"):
+            elapsed = time.perf_counter() - connect_started.get()
+            self.connect_seconds += elapsed
+            if event_name == "connection.connect_tcp.complete":
+                self.connections += 1
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        request.extensions["trace"] = self.trace
+        self.requests += 1
+        return await super().handle_async_request(request)
+
+
+@functools.cache
+def ssl_context():
+    """
+    SSL context shared by every client. Loading the certificates takes tens of
+    milliseconds, which would otherwise be paid by each account at start.
+    """
+    return httpx.create_ssl_context()
+
+
+def create_client(cookies: dict, http2: bool = False, max_connections: int = 20,
+                  max_keepalive_connections: int = 10, keepalive_expiry: float = 120,
+                  timeout: float = 30, record_path: str = None,
+                  replay_path: str = None) -> httpx.AsyncClient:
+    """
+    Create a long-lived HTTP client whose connections are kept alive and reused by every
+    tool call.
+    Args:
+        cookies: dict of cookies, sent with every request.
+        http2: whether to use HTTP/2 if the server supports it. It requires the "h2"
+        package, otherwise HTTP/1.1 is used.
+        max_connections: maximum number of connections opened at the same time.
+        max_keepalive_connections: maximum number of idle connections kept open.
+        keepalive_expiry: seconds before an idle connection is closed.
+        timeout: seconds to wait for connecting, reading and writing.
+        record_path: if set, requests and responses are appended to this JSON lines file.
+        replay_path: if set, responses are served from this file recorded before, and
+        nothing is sent to the network.
+
+    Returns:
+        The client. Its transport is a TracedTransport unless recording or replaying.
+    """
+    if http2 and importlib.util.find_spec("h2") is None:
+        logging.warning("Package \"h2\" is not installed, so HTTP/1.1 is used.")
+        http2 = False
+    if replay_path:
+        transport = ReplayTransport(replay_path)
+    else:
+        transport = TracedTransport(
+            verify=ssl_context(),
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=max_keepalive_connections,
+                keepalive_expiry=keepalive_expiry,
+            ),
+        )
+        if record_path:
+            transport = RecordingTransport(transport, record_path)
+    return httpx.AsyncClient(
+        transport=transport,
+        cookies=cookies,
+        timeout=timeout,
+        follow_redirects=True,
+    )
+
+
+async def warm_up(client: httpx.AsyncClient, origins: list[str]):
+    """
+    Open a connection to each origin in advance, so that the first tool call doesn't pay
+    for DNS, TCP and TLS setup. Failures are ignored.
+    """
+    for origin in origins:
+        try:
+            await client.head(origin)
+        except httpx.HTTPError as e:
+            logging.warning(f"Fail to warm up connection to {origin}: {e}")
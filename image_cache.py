@@ -0,0 +1,235 @@
+"""
+Images of posts stored on disk by the SHA-256 of their content, so that the same image is
+downloaded once no matter how many times the model looks at it, and images shared by
+several URLs are stored once. Images are streamed to disk instead of held in memory, and
+the least recently used files are deleted when the store exceeds its size cap.
+"""
+import asyncio
+import hashlib
+import importlib.util
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+import httpx
+
+import metrics
+from deadline import gather_until
+
+# Extensions of the image types served by the website's CDN.
+extensions = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp",
+              "image/gif": ".gif", "image/avif": ".avif", "image/heic": ".heic"}
+chunk_size = 64 * 1024
+
+
+def downscale(source: str, target: str, max_side: int):
+    """
+    Save a copy of the image whose longer side is at most "max_side" pixels as JPEG.
+    """
+    from PIL import Image
+
+    with Image.open(source) as image:
+        image.thumbnail((max_side, max_side))
+        image.convert("RGB").save(target, "JPEG", quality=85)
+
+
+class ImageCache:
+    """
+    Content-addressed store of images with least recently used eviction by total size.
+    """
+
+    def __init__(self, folder: str, max_bytes: int = 512 * 1024 * 1024,
+                 max_workers: int = 8):
+        """
+        Args:
+            folder: folder of image files and the SQLite database indexing them.
+            max_bytes: maximum total size of image files.
+            max_workers: maximum number of images downloaded at the same time.
+        """
+        self.folder = folder
+        self.max_bytes = max_bytes
+        self.max_workers = max_workers
+        os.makedirs(folder, exist_ok=True)
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(os.path.join(folder, "images.sqlite3"),
+                                          check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        # A file is either an image named by its hash, or a downscaled copy named by the
+        # hash and its size, e.g. "{sha256}-512".
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "key TEXT PRIMARY KEY, path TEXT NOT NULL, size INTEGER NOT NULL, "
+            "accessed_at REAL NOT NULL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS files_accessed_at ON files (accessed_at)")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS urls (url TEXT PRIMARY KEY, key TEXT NOT NULL)")
+        self.connection.commit()
+        self.downscaling = importlib.util.find_spec("PIL") is not None
+
+    def lookup(self, key: str) -> str | None:
+        """
+        Returns:
+            Path of the file, or None if it isn't stored.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT path FROM files WHERE key = ?", [key]).fetchone()
+            if row is None:
+                return None
+            if not os.path.exists(row[0]):
+                self.connection.execute("DELETE FROM files WHERE key = ?", [key])
+                self.connection.commit()
+                return None
+            self.connection.execute(
+                "UPDATE files SET accessed_at = ? WHERE key = ?", [time.time(), key])
+            self.connection.commit()
+        return row[0]
+
+    def add(self, key: str, path: str, url: str = None):
+        with self.lock:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO files (key, path, size, accessed_at) "
+                "VALUES (?, ?, ?, ?)",
+                [key, path, os.path.getsize(path), time.time()],
+            )
+            if url is not None:
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO urls (url, key) VALUES (?, ?)", [url, key])
+            self.connection.commit()
+
+    def evict(self, keep=()):
+        """
+        Delete the least recently used files until the total size is within the cap.
+        Args:
+            keep: paths which are not deleted, e.g. those returned by the current call,
+            even if the total size stays above the cap.
+        """
+        with self.lock:
+            total, = self.connection.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM files").fetchone()
+            if total <= self.max_bytes:
+                return
+            rows = self.connection.execute(
+                "SELECT key, path, size FROM files ORDER BY accessed_at").fetchall()
+            evicted = []
+            for key, path, size in rows:
+                if total <= self.max_bytes:
+                    break
+                if path in keep:
+                    continue
+                evicted.append(key)
+                total -= size
+                if os.path.exists(path):
+                    os.remove(path)
+            self.connection.executemany(
+                "DELETE FROM files WHERE key = ?", [(key,) for key in evicted])
+            self.connection.executemany(
+                "DELETE FROM urls WHERE key = ?", [(key,) for key in evicted])
+            self.connection.commit()
+
+    async def download(self, client: httpx.AsyncClient, url: str) -> tuple[str, str]:
+        """
+        Stream an image to a temporary file while hashing it, then move it to the path
+        named by the hash.
+        Returns:
+            Key (SHA-256) and path of the image.
+        """
+        temporary_path = os.path.join(self.folder, f"download-{uuid.uuid4().hex}")
+        sha256 = hashlib.sha256()
+        try:
+            with metrics.span("http", "images"):
+                async with client.stream("GET", url) as response:
+                    assert response.status_code == 200, \
+                        f"Fail to download image, HTTP {response.status_code}."
+                    content_type = response.headers.get("content-type", "")
+                    with open(temporary_path, "wb") as f:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            sha256.update(chunk)
+                            f.write(chunk)
+            metrics.count_response("images", response.status_code,
+                                   response.num_bytes_downloaded)
+            key = sha256.hexdigest()
+            extension = extensions.get(content_type.split(";")[0].strip(), "")
+            path = os.path.join(self.folder, key[:2], key + extension)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            # The same content always has the same path, so replacing is harmless.
+            os.replace(temporary_path, path)
+        finally:
+            if os.path.exists(temporary_path):
+                os.remove(temporary_path)
+        return key, path
+
+    async def get(self, client: httpx.AsyncClient, url: str,
+                  max_side: int = 0) -> tuple[str, int | None]:
+        """
+        Args:
+            client: HTTP client downloading the image.
+            url: URL of the image.
+            max_side: if positive, return a copy whose longer side is at most this
+            number of pixels. It requires the "Pillow" package, otherwise the original
+            image is returned.
+
+        Returns:
+            Path of the image.
+            Bytes downloaded, or None if the image is read from the store.
+        """
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT key FROM urls WHERE url = ?", [url]).fetchone()
+        key = row[0] if row is not None else None
+        path = self.lookup(key) if key is not None else None
+        downloaded = None
+        if path is None:
+            key, path = await self.download(client, url)
+            self.add(key, path, url)
+            downloaded = os.path.getsize(path)
+        if max_side > 0 and self.downscaling:
+            scaled_key = f"{key}-{max_side}"
+            scaled_path = self.lookup(scaled_key)
+            if scaled_path is None:
+                scaled_path = os.path.join(self.folder, key[:2], f"{scaled_key}.jpg")
+                await asyncio.to_thread(downscale, path, scaled_path, max_side)
+                self.add(scaled_key, scaled_path)
+            path = scaled_path
+        return path, downloaded
+
+    async def get_many(self, client: httpx.AsyncClient, urls: list[str],
+                       max_side: int = 0, deadline: float = None):
+        """
+        Fetch images concurrently, see "get".
+        Args:
+            deadline: optional time.monotonic when images not fetched yet are given up.
+        Returns:
+            dict mapping URLs to paths of the images.
+            dict mapping URLs to error messages, for images which fail.
+            dict of statistics: "cache_hits" and "downloaded_bytes", with "unfinished",
+            URLs given up at the deadline, if any.
+        """
+        if max_side > 0 and not self.downscaling:
+            logging.warning("Package \"Pillow\" is not installed, so images are not "
+                            "downscaled.")
+        urls = list(dict.fromkeys(urls))
+        semaphore = asyncio.Semaphore(self.max_workers)
+
+        async def worker(url):
+            async with semaphore:
+                return await self.get(client, url, max_side)
+
+        results, errors, unfinished = await gather_until(
+            {url: worker(url) for url in urls}, deadline)
+        self.evict(keep={path for path, _ in results.values()})
+        downloads = [downloaded for _, downloaded in results.values()]
+        stats = {"cache_hits": downloads.count(None),
+                 "downloaded_bytes": sum(filter(None, downloads))}
+        if unfinished:
+            stats['unfinished'] = unfinished
+        return {url: path for url, (path, _) in results.items()}, errors, stats
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
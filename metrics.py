@@ -0,0 +1,166 @@
+"""
+Latency of each stage of fetching data (rate limit waiting, signing, HTTP, parsing, tool
+calls), HTTP status codes, bytes transferred and retries. Disabled by default; when
+disabled, "span" returns a shared no-op context manager and nothing is recorded.
+"""
+import bisect
+import contextlib
+import os
+import random
+import time
+from collections import Counter
+
+enabled = False
+# Upper bounds (seconds) of histogram buckets.
+buckets = [0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5,
+           10, 30, 60]
+# Number of samples kept for percentiles of each stage.
+reservoir_size = 1024
+null_span = contextlib.nullcontext()
+
+
+class Histogram:
+    def __init__(self):
+        self.count = 0
+        self.sum = 0.0
+        self.bucket_counts = [0] * (len(buckets) + 1)
+        self.samples = []
+
+    def observe(self, seconds: float):
+        self.count += 1
+        self.sum += seconds
+        self.bucket_counts[bisect.bisect_left(buckets, seconds)] += 1
+        # Reservoir sampling keeps a uniform sample of all observations.
+        if len(self.samples) < reservoir_size:
+            self.samples.append(seconds)
+        else:
+            i = random.randrange(self.count)
+            if i < reservoir_size:
+                self.samples[i] = seconds
+
+    def percentile(self, q: float) -> float:
+        samples = sorted(self.samples)
+        return samples[min(int(len(samples) * q), len(samples) - 1)]
+
+
+class Span:
+    def __init__(self, key: tuple[str, str]):
+        self.key = key
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        observe(*self.key, time.perf_counter() - self.start)
+
+
+histograms: dict[tuple[str, str], Histogram] = {}
+status_codes: Counter[tuple[str, int]] = Counter()
+bytes_downloaded: Counter[str] = Counter()
+retries: Counter[str] = Counter()
+
+
+def span(stage: str, endpoint: str = ""):
+    """
+    Context manager timing a stage.
+    Args:
+        stage: e.g. "rate_wait", "sign", "http", "parse", "tool".
+        endpoint: e.g. "edith/search", or the tool name for "tool" stage.
+    """
+    if not enabled:
+        return null_span
+    return Span((stage, endpoint))
+
+
+def observe(stage: str, endpoint: str, seconds: float):
+    key = (stage, endpoint)
+    if key not in histograms:
+        histograms[key] = Histogram()
+    histograms[key].observe(seconds)
+
+
+def count_response(endpoint: str, status_code: int, num_bytes: int):
+    if not enabled:
+        return
+    status_codes[(endpoint, status_code)] += 1
+    bytes_downloaded[endpoint] += num_bytes
+
+
+def count_retry(endpoint: str):
+    if not enabled:
+        return
+    retries[endpoint] += 1
+
+
+def snapshot() -> dict:
+    """
+    Returns:
+        Statistics of each stage in milliseconds, status codes and bytes downloaded.
+    """
+    stages = {}
+    for (stage, endpoint), histogram in sorted(histograms.items()):
+        stages[f"{stage} {endpoint}".strip()] = {
+            "count": histogram.count,
+            "mean_ms": histogram.sum / histogram.count * 1000,
+            "p50_ms": histogram.percentile(0.5) * 1000,
+            "p95_ms": histogram.percentile(0.95) * 1000,
+            "p99_ms": histogram.percentile(0.99) * 1000,
+        }
+    return {
+        "enabled": enabled,
+        "stages": stages,
+        "status_codes": {f"{endpoint} {code}": n
+                         for (endpoint, code), n in sorted(status_codes.items())},
+        "bytes_downloaded": dict(sorted(bytes_downloaded.items())),
+        "retries": dict(sorted(retries.items())),
+    }
+
+
+def prometheus_text() -> str:
+    """
+    Returns:
+        Metrics in Prometheus text exposition format.
+    """
+    lines = [
+        "# HELP rednote_stage_seconds Latency of each stage.",
+        "# TYPE rednote_stage_seconds histogram",
+    ]
+    for (stage, endpoint), histogram in sorted(histograms.items()):
+        labels = f'stage="{stage}",endpoint="{endpoint}"'
+        cumulative = 0
+        for bound, n in zip(buckets + ["+Inf"], histogram.bucket_counts):
+            cumulative += n
+            lines.append(f'rednote_stage_seconds_bucket{{{labels},le="{bound}"}} '
+                         f'{cumulative}')
+        lines.append(f"rednote_stage_seconds_sum{{{labels}}} {histogram.sum}")
+        lines.append(f"rednote_stage_seconds_count{{{labels}}} {histogram.count}")
+    lines += [
+        "# HELP rednote_responses_total HTTP responses by status code.",
+        "# TYPE rednote_responses_total counter",
+    ]
+    for (endpoint, code), n in sorted(status_codes.items()):
+        lines.append(
+            f'rednote_responses_total{{endpoint="{endpoint}",code="{code}"}} {n}')
+    lines += [
+        "# HELP rednote_downloaded_bytes_total Bytes downloaded from the website.",
+        "# TYPE rednote_downloaded_bytes_total counter",
+    ]
+    for endpoint, n in sorted(bytes_downloaded.items()):
+        lines.append(f'rednote_downloaded_bytes_total{{endpoint="{endpoint}"}} {n}')
+    lines += [
+        "# HELP rednote_retries_total Requests sent again after transient failures.",
+        "# TYPE rednote_retries_total counter",
+    ]
+    for endpoint, n in sorted(retries.items()):
+        lines.append(f'rednote_retries_total{{endpoint="{endpoint}"}} {n}')
+    return "\n".join(lines) + "\n"
+
+
+def write_prometheus(path: str):
+    """
+    Write metrics to a file atomically, e.g. for the textfile collector of node exporter.
+    """
+    with open(path + ".tmp", "w") as f:
+        f.write(prometheus_text())
+    os.replace(path + ".tmp", path)
@@ -0,0 +1,153 @@
+import json
+import sqlite3
+import threading
+from datetime import datetime
+
+from xhshow_contrib import china_timezone
+
+# The trigram tokenizer matches any substring of at least 3 characters, which suits
+# Chinese text without word segmentation. Shorter terms, e.g. most Chinese words, are
+# matched by LIKE instead.
+min_match_length = 3
+
+
+def parse_time(time_string: str) -> float:
+    """
+    Args:
+        time_string: e.g. "2025-01-31", "2025-01-31 20:00:00", or "2025-01-31 20:00:00
+        +0800". Time without timezone is in China Standard Time.
+    Returns:
+        Unix timestamp.
+    """
+    parsed = None
+    for time_format in ["%Y-%m-%d %H:%M:%S %z", "%Y-%m-%d %H:%M:%S", "%Y-%m-%d"]:
+        try:
+            parsed = datetime.strptime(time_string.strip(), time_format)
+            break
+        except ValueError:
+            continue
+    assert parsed is not None, \
+        f"Time {time_string} must be formatted as \"YYYY-MM-DD\" or " \
+        f"\"YYYY-MM-DD HH:MM:SS\"."
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=china_timezone)
+    return parsed.timestamp()
+
+
+class NoteIndex:
+    """
+    Full-text index of every post fetched by "get_details_", searchable without network.
+    Entries never expire; a post fetched again replaces its entry.
+    """
+
+    def __init__(self, path: str):
+        """
+        Args:
+            path: path of SQLite database file.
+        """
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS notes ("
+            "rowid INTEGER PRIMARY KEY, id TEXT UNIQUE NOT NULL, xsec_token TEXT, "
+            "record TEXT NOT NULL, labels TEXT NOT NULL, published_at REAL)"
+        )
+        self.connection.execute(
+            "CREATE INDEX IF NOT EXISTS notes_published_at ON notes (published_at)")
+        self.connection.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS notes_text USING fts5("
+            "title, description, labels, location, tokenize='trigram')"
+        )
+        self.connection.commit()
+
+    def add_many(self, records: dict[str, dict], xsec_tokens: dict[str, str] = None):
+        """
+        Args:
+            records: dict mapping post IDs to details returned by "parse_detail".
+            xsec_tokens: dict mapping post IDs to access tokens.
+        """
+        if not records:
+            return
+        xsec_tokens = xsec_tokens or {}
+        with self.lock:
+            for id_, record in records.items():
+                published_at = (parse_time(record['published_time'])
+                                if record.get('published_time') else None)
+                # Upserting keeps the rowid, which is shared with the full-text table.
+                rowid, = self.connection.execute(
+                    "INSERT INTO notes (id, xsec_token, record, labels, published_at) "
+                    "VALUES (?, ?, ?, ?, ?) ON CONFLICT (id) DO UPDATE SET "
+                    "xsec_token = excluded.xsec_token, record = excluded.record, "
+                    "labels = excluded.labels, published_at = excluded.published_at "
+                    "RETURNING rowid",
+                    [id_, xsec_tokens.get(id_), json.dumps(record, ensure_ascii=False),
+                     json.dumps(record['labels'], ensure_ascii=False), published_at],
+                ).fetchone()
+                self.connection.execute(
+                    "INSERT OR REPLACE INTO notes_text "
+                    "(rowid, title, description, labels, location) "
+                    "VALUES (?, ?, ?, ?, ?)",
+                    [rowid, record['title'], record['description'],
+                     " ".join(record['labels']), record['location']],
+                )
+            self.connection.commit()
+
+    def search(self, query: str = "", since: str = None, until: str = None,
+               labels: list[str] = None, limit: int = 20) -> list[dict]:
+        """
+        Args:
+            query: space-separated terms, each of which must appear in the title,
+            description, labels or location. Empty to match every post.
+            since: earliest published time, see "parse_time".
+            until: latest published time, see "parse_time". A date without time
+            includes the whole day.
+            labels: labels which every matched post must have.
+            limit: maximum number of posts returned.
+
+        Returns:
+            list of post details with "id" and "xsec_token", most relevant first when
+            searching by terms of at least 3 characters, otherwise newest first.
+        """
+        assert limit >= 1, "Limit must be a positive integer."
+        conditions, parameters = [], []
+        match_terms = []
+        for term in query.split():
+            if len(term) >= min_match_length:
+                match_terms.append('"' + term.replace('"', '""') + '"')
+            else:
+                conditions.append(
+                    "(t.title LIKE ? OR t.description LIKE ? OR t.labels LIKE ? "
+                    "OR t.location LIKE ?)")
+                parameters += [f"%{term}%"] * 4
+        if match_terms:
+            conditions.append("notes_text MATCH ?")
+            parameters.append(" AND ".join(match_terms))
+        if since:
+            conditions.append("n.published_at >= ?")
+            parameters.append(parse_time(since))
+        if until:
+            conditions.append("n.published_at < ?")
+            if len(until.strip()) == len("YYYY-MM-DD"):
+                parameters.append(parse_time(until) + 86400)
+            else:
+                parameters.append(parse_time(until) + 1)
+        for label in labels or []:
+            conditions.append(
+                "EXISTS (SELECT 1 FROM json_each(n.labels) WHERE json_each.value = ?)")
+            parameters.append(label)
+        where = " AND ".join(conditions) or "1"
+        order = "bm25(notes_text)" if match_terms else "n.published_at DESC"
+        with self.lock:
+            rows = self.connection.execute(
+                f"SELECT n.id, n.xsec_token, n.record FROM notes_text t "
+                f"JOIN notes n ON n.rowid = t.rowid WHERE {where} "
+                f"ORDER BY {order} LIMIT ?",
+                [*parameters, limit],
+            ).fetchall()
+        return [{"id": id_, "xsec_token": xsec_token, **json.loads(record)}
+                for id_, xsec_token, record in rows]
+
+    def close(self):
+        with self.lock:
+            self.connection.close()
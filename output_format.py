@@ -0,0 +1,58 @@
+from schema import dumps, post_fields
+
+# Fields returned when the model doesn't ask for specific ones. Authors' fields are not
+# useful in the general workflow.
+default_post_fields = ["id", "xsec_token", "title", "cover_median_url"]
+output_formats = ["columns", "records", "tsv"]
+
+
+def check_output(output_format: str, fields: list[str] | None,
+                 extra_fields: list[str] = ()) -> list[str]:
+    """
+    Check the output options before fetching anything.
+    Args:
+        extra_fields: fields added by the tool besides the post's, e.g. "queries" of
+        "search_many". They are returned by default.
+    Returns:
+        Columns to keep.
+    """
+    assert output_format in output_formats, \
+        f"Output format must be one of {output_formats}."
+    if not fields:
+        return default_post_fields + list(extra_fields)
+    available_fields = post_fields + list(extra_fields)
+    unknown_fields = set(fields) - set(available_fields)
+    assert not unknown_fields, \
+        f"Unknown fields {sorted(unknown_fields)}, available fields are " \
+        f"{available_fields}."
+    return fields
+
+
+def dump_posts(posts: list[dict], output_format: str = "columns",
+               fields: list[str] | None = None, extra_fields: list[str] = ()) -> str:
+    """
+    Serialize a table of posts for the model.
+    Args:
+        posts: list of posts, each post is a dict.
+        output_format: "columns" for {"columns": [...], "rows": [[...], ...]}, "records"
+        for [{column: value, ...}, ...], or "tsv" for tab-separated values with a header
+        line.
+        fields: columns to keep, default to "default_post_fields".
+        extra_fields: see "check_output".
+
+    Returns:
+        Serialized table.
+    """
+    fields = check_output(output_format, fields, extra_fields)
+    # Chinese characters are much shorter without escaping.
+    if output_format == "records":
+        return dumps([{k: post[k] for k in fields} for post in posts])
+    rows = [[post[k] for k in fields] for post in posts]
+    if output_format == "columns":
+        return dumps({"columns": fields, "rows": rows})
+    lines = ["\t".join(fields)]
+    for row in rows:
+        lines.append("\t".join(
+            " ".join(str(value).split()) if not isinstance(value, list)
+            else ", ".join(value) for value in row))
+    return "\n".join(lines)
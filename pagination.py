@@ -0,0 +1,113 @@
+"""
+Fetch pages of a feed or searching results across several tool calls. The state of the
+next page is handed to the model as an opaque cursor, so that a call returns as soon as
+its pages arrive, and a failed page doesn't discard the pages fetched before it.
+"""
+import base64
+import json
+import asyncio
+import logging
+
+from deadline import remaining
+
+
+def encode_cursor(state: dict) -> str:
+    text = json.dumps(state, separators=(",", ":"), ensure_ascii=False)
+    return base64.urlsafe_b64encode(text.encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, kind: str) -> dict:
+    """
+    Args:
+        cursor: returned by "encode_cursor".
+        kind: "feed" or "search", the kind of pages the cursor must belong to.
+    Returns:
+        State of the next page.
+    """
+    try:
+        state = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except ValueError:
+        state = None
+    assert isinstance(state, dict) and state.get('kind') == kind, \
+        "Invalid cursor. Use \"next_cursor\" returned by the last call of this tool."
+    return state
+
+
+async def fetch_pages(account_pool, fetch_page, state: dict, pages: int, ctx=None,
+                      deadline: float = None):
+    """
+    Fetch pages one by one, using the same account as the previous call if it's healthy.
+    Args:
+        account_pool: accounts.AccountPool.
+        fetch_page: coroutine function (account, state) -> (posts, has_more), which
+        fetches the page described by "state", and updates "state" for the next page
+        except "page".
+        state: state of the first page to fetch, with "kind" and "page".
+        pages: number of pages to fetch.
+        ctx: optional mcp.server.fastmcp.Context, which progress is reported to after
+        each page.
+        deadline: optional time.monotonic when the page being fetched is cancelled, and
+        the pages fetched so far are returned.
+
+    Returns:
+        list of posts.
+        State of the next page, or None if there are no more pages.
+        Error message if a page fails after some pages succeeded, or the deadline
+        arrives, otherwise None.
+    """
+    assert pages >= 1, "Number of pages must be a positive integer."
+    posts = []
+    error = None
+    async with account_pool.use(prefer=state.get('account')) as account:
+        state['account'] = account.name
+        for i in range(pages):
+            try:
+                new_posts, has_more = await asyncio.wait_for(fetch_page(account, state),
+                                                             remaining(deadline))
+            except TimeoutError:
+                # "fetch_page" updates the state after the page arrives, so the state
+                # still points to the cancelled page.
+                logging.warning(f"Time budget is used up before page {state['page'] + 1}.")
+                error = (f"Time budget is used up after {i} of {pages} pages. Pass "
+                         f"\"next_cursor\" to continue.")
+                break
+            except Exception as e:
+                if not posts:
+                    raise
+                logging.warning(f"Fail to fetch page {state['page'] + 1}: {e}")
+                error = str(e)
+                break
+            posts += new_posts
+            state['page'] += 1
+            if ctx is not None:
+                await ctx.report_progress(i + 1, pages,
+                                          f"{len(posts)} posts of {i + 1} pages")
+            if not has_more:
+                return posts, None, error
+    return posts, state, error
+
+
+def merge_results(results: list[tuple[str, list[dict]]]) -> list[dict]:
+    """
+    Merge searching results of several queries, taking the posts of the same rank from
+    each query in turn, so that the top posts of every query come first.
+    Args:
+        results: list of (query, posts).
+
+    Returns:
+        list of unique posts, each with "queries", the queries which found the post.
+    """
+    merged = {}
+    for rank in range(max((len(posts) for _, posts in results), default=0)):
+        for query, posts in results:
+            if rank >= len(posts):
+                continue
+            post = posts[rank]
+            if post['id'] in merged:
+                if query not in merged[post['id']]['queries']:
+                    merged[post['id']]['queries'].append(query)
+            else:
+                # Posts may be shared with the cache, so they are copied before adding
+                # the queries.
+                merged[post['id']] = {**post, 'queries': [query]}
+    return list(merged.values())
@@ -0,0 +1,101 @@
+import asyncio
+import contextlib
+import logging
+
+from deadline import remaining
+from get_data import get_details_
+
+
+class Prefetcher:
+    """
+    Fetch details of the top results of "search" and "get_feed" in background, so that
+    the following "get_details" call is answered from the cache. Prefetching pauses
+    while any tool call is running, so it only uses the rate budget left over by the
+    foreground, and new results replace the posts waiting to be prefetched.
+    """
+
+    def __init__(self, account_pool, cache, index=None, top_k: int = 5):
+        """
+        Args:
+            account_pool: accounts.AccountPool.
+            cache: cache.DetailCache which prefetched posts are written to.
+            index: optional note_index.NoteIndex which prefetched posts are added to.
+            top_k: number of top results prefetched after each call.
+        """
+        self.account_pool = account_pool
+        self.cache = cache
+        self.index = index
+        self.top_k = top_k
+        # Posts waiting to be prefetched, as (id, xsec_token).
+        self.queue = []
+        # Prefetching tasks in flight, keyed by post ID.
+        self.tasks = {}
+        self.worker = None
+        self.foreground_calls = 0
+        self.idle = asyncio.Event()
+        self.idle.set()
+
+    @contextlib.asynccontextmanager
+    async def foreground(self):
+        """
+        Pause prefetching during a tool call.
+        """
+        self.foreground_calls += 1
+        self.idle.clear()
+        try:
+            yield
+        finally:
+            self.foreground_calls -= 1
+            if self.foreground_calls == 0:
+                self.idle.set()
+
+    def schedule(self, posts: list[dict]):
+        """
+        Prefetch the top posts of the latest results, instead of the posts still waiting
+        from earlier results.
+        """
+        candidates = [(post['id'], post['xsec_token']) for post in posts[:self.top_k]]
+        cached = self.cache.get_many([id_ for id_, _ in candidates])
+        self.queue = [(id_, xsec_token) for id_, xsec_token in candidates
+                      if id_ not in cached and id_ not in self.tasks]
+        if self.queue and (self.worker is None or self.worker.done()):
+            self.worker = asyncio.create_task(self.run())
+
+    async def run(self):
+        while self.queue:
+            await self.idle.wait()
+            if not self.queue:
+                break
+            id_, xsec_token = self.queue.pop(0)
+            self.tasks[id_] = asyncio.create_task(self.fetch(id_, xsec_token))
+            await self.tasks[id_]
+
+    async def fetch(self, id_: str, xsec_token: str):
+        try:
+            await get_details_(self.account_pool, [id_], [xsec_token], cache=self.cache,
+                               index=self.index)
+        except Exception as e:
+            # The foreground fetches the post again if it's asked for.
+            logging.info(f"Fail to prefetch post {id_}: {e}")
+        finally:
+            del self.tasks[id_]
+
+    async def claim(self, id_list: list[str], deadline: float = None):
+        """
+        Called before fetching posts in the foreground: posts waiting are no longer
+        prefetched, and posts being prefetched are waited for, so that they are read from
+        the cache instead of fetched twice.
+        Args:
+            deadline: optional time.monotonic when waiting stops. Posts whose prefetching
+            is unfinished by then are left to the foreground.
+        """
+        self.queue = [(id_, xsec_token) for id_, xsec_token in self.queue
+                      if id_ not in id_list]
+        in_flight = [self.tasks[id_] for id_ in id_list if id_ in self.tasks]
+        if in_flight:
+            await asyncio.wait(in_flight, timeout=remaining(deadline))
+
+    def cancel(self):
+        self.queue = []
+        if self.worker is not None:
+            self.worker.cancel()
@@ -0,0 +1,107 @@
+import asyncio
+import random
+import threading
+import time
+
+
+class TokenBucket:
+    """
+    Token bucket which spaces out requests with random jitter, like a human clicking
+    around. Unused tokens accumulate up to "burst", so a request after an idle period
+    doesn't wait at all. The interval grows when the website reports errors, and shrinks
+    back gradually when requests succeed.
+    """
+
+    def __init__(self, rate: float, burst: int = 1, jitter: float = 0.3,
+                 max_slowdown: float = 16):
+        """
+        Args:
+            rate: requests per second.
+            burst: maximum number of requests sent without waiting after idle.
+            jitter: when a request has to wait, the waiting time changes by a random
+            fraction of the interval in [-jitter, jitter].
+            max_slowdown: maximum factor which the interval is multiplied by after errors.
+        """
+        self.lock = threading.Lock()
+        self.interval = 1 / rate
+        self.burst = burst
+        self.jitter = jitter
+        self.max_slowdown = max_slowdown
+        self.slowdown = 1.0
+        self.full_at = 0.0
+
+    def reserve(self) -> float:
+        """
+        Reserve a token.
+        Returns:
+            Time (time.monotonic) when the token is available.
+        """
+        with self.lock:
+            interval = self.interval * self.slowdown
+            now = time.monotonic()
+            # Theoretical time when the bucket is full again.
+            self.full_at = max(self.full_at, now)
+            slot = self.full_at - (self.burst - 1) * interval
+            self.full_at += interval
+        if slot <= now:
+            return now
+        return slot + interval * random.uniform(-self.jitter, self.jitter)
+
+    def penalize(self):
+        with self.lock:
+            self.slowdown = min(self.slowdown * 2, self.max_slowdown)
+
+    def reward(self):
+        with self.lock:
+            self.slowdown = max(self.slowdown * 0.9, 1.0)
+
+
+class RateScheduler:
+    """
+    Rate limits of one account, shared by every request which the account sends; each
+    account of accounts.AccountPool has its own scheduler, so the total rate grows with
+    the number of accounts. Endpoints are named as "host/endpoint", e.g. "edith/search".
+    A request waits for a token of both its host and its endpoint.
+    """
+
+    def __init__(self, rates: dict[str, tuple[float, int]]):
+        """
+        Args:
+            rates: dict mapping host names and endpoint names to (requests per second,
+            burst). Hosts or endpoints without rates are not limited.
+        """
+        self.buckets = {}
+        self.update(rates)
+
+    def update(self, rates: dict[str, tuple[float, int]]):
+        for name, (rate, burst) in rates.items():
+            self.buckets[name] = TokenBucket(rate, burst)
+
+    def buckets_of(self, endpoint: str) -> list[TokenBucket]:
+        host = endpoint.split("/")[0]
+        return [self.buckets[name] for name in (host, endpoint) if name in self.buckets]
+
+    async def acquire(self, endpoint: str) -> float:
+        """
+        Wait until a request to the endpoint is allowed.
+        Returns:
+            Seconds waited.
+        """
+        slot = max([bucket.reserve() for bucket in self.buckets_of(endpoint)],
+                   default=0.0)
+        delay = slot - time.monotonic()
+        if delay <= 0:
+            return 0.0
+        await asyncio.sleep(delay)
+        return delay
+
+    def report(self, endpoint: str, ok: bool):
+        """
+        Adapt the rate by the outcome of a request: slow down when the website responds
+        an error or "success: false", and speed up gradually when it succeeds.
+        """
+        for bucket in self.buckets_of(endpoint):
+            if ok:
+                bucket.reward()
+            else:
+                bucket.penalize()
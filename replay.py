@@ -0,0 +1,115 @@
+"""
+Record requests to the website and their responses, and serve them back without network,
+so that tools can be run and measured reproducibly.
+"""
+import base64
+import json
+import logging
+from collections import defaultdict
+
+import httpx
+
+# Keys of request payloads which are random for every request.
+volatile_payload_keys = {"search_id"}
+# Content types recorded as text, others, e.g. images, are recorded in base64.
+text_content_types = ("text/", "application/json", "application/javascript")
+
+
+def encode_content(content_type: str, content: bytes) -> dict:
+    """
+    Returns:
+        {"text": ...} if the content is text, otherwise {"base64": ...}.
+    """
+    if content_type.startswith(text_content_types):
+        try:
+            return {"text": content.decode("utf-8")}
+        except UnicodeDecodeError:
+            pass
+    return {"base64": base64.b64encode(content).decode("ascii")}
+
+
+def decode_content(record: dict) -> bytes:
+    if "base64" in record:
+        return base64.b64decode(record["base64"])
+    return record["text"].encode("utf-8")
+
+
+def request_key(method: str, url: httpx.URL, body: bytes) -> str:
+    """
+    Identify a request by its method, path, query and payload. Hosts are ignored, so that
+    recordings of the website can be replayed for a local server and vice versa.
+    """
+    payload = json.loads(body) if body else None
+    if isinstance(payload, dict):
+        payload = {k: v for k, v in payload.items() if k not in volatile_payload_keys}
+    target = url.raw_path.decode("ascii")
+    return f"{method} {target} {json.dumps(payload, sort_keys=True, ensure_ascii=False)}"
+
+
+class RecordingTransport(httpx.AsyncBaseTransport):
+    """
+    Transport which forwards requests to another transport, and appends each pair of
+    request and response to a JSON lines file. Cookies and signatures are not recorded.
+    Responses are read into memory before they are returned, so images downloaded while
+    recording are not streamed to disk by image_cache.ImageCache.
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport, path: str):
+        self.transport = transport
+        self.path = path
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        response = await self.transport.handle_async_request(request)
+        # Reading decodes the content, so it's readable and replayed without content
+        # encoding.
+        content = await response.aread()
+        await response.aclose()
+        record = {
+            "key": request_key(request.method, request.url, request.content),
+            "url": str(request.url),
+            "status_code": response.status_code,
+            "content_type": response.headers.get("content-type", ""),
+            **encode_content(response.headers.get("content-type", ""), content),
+        }
+        with open(self.path, "a", encoding="utf-8") as f:
+            f.write(json.dumps(record, ensure_ascii=False) + "\n")
+        return httpx.Response(
+            status_code=response.status_code,
+            headers={"content-type": record["content_type"]},
+            content=content,
+            request=request,
+        )
+
+    async def aclose(self):
+        await self.transport.aclose()
+
+
+class ReplayTransport(httpx.AsyncBaseTransport):
+    """
+    Transport which serves responses recorded by RecordingTransport. When a request was
+    recorded several times, the responses are served in the recorded order, and the last
+    one is repeated. Requests not recorded get HTTP 404.
+    """
+
+    def __init__(self, path: str):
+        self.responses = defaultdict(list)
+        with open(path, encoding="utf-8") as f:
+            for line in f:
+                record = json.loads(line)
+                self.responses[record["key"]].append(record)
+        self.served = defaultdict(int)
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        key = request_key(request.method, request.url, await request.aread())
+        records = self.responses.get(key)
+        if not records:
+            logging.warning(f"No recorded response: {key}")
+            return httpx.Response(404, text="No recorded response.", request=request)
+        record = records[min(self.served[key], len(records) - 1)]
+        self.served[key] += 1
+        return httpx.Response(
+            status_code=record["status_code"],
+            headers={"content-type": record["content_type"]},
+            content=decode_content(record),
+            request=request,
+        )
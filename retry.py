@@ -0,0 +1,117 @@
+"""
+Retrying requests which fail for transient reasons, e.g. HTTP 5xx or throttling, after a
+random exponential backoff, and a circuit breaker per host, which fails requests at once
+instead of retrying them while the host keeps failing.
+"""
+import contextlib
+import contextvars
+import random
+import threading
+import time
+from collections import Counter
+
+import metrics
+
+# Attempts of each request, including the first one.
+max_attempts = 3
+# Backoff before the n-th retry is random in [0, min(max_delay, base_delay * 2 ** n)].
+base_delay = 0.5
+max_delay = 8.0
+
+
+def backoff_delay(retry: int) -> float:
+    """
+    Seconds to wait before a retry, with "full jitter", so that requests failed together
+    are not retried together.
+    Args:
+        retry: number of retries so far, 0 before the first retry.
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** retry))
+
+
+class CircuitBreaker:
+    """
+    After "failure_threshold" failures in a row, the circuit opens and requests fail at
+    once for "reset_after" seconds. Then one request is let through, while the others
+    still fail at once: the circuit closes if it succeeds, and stays open for another
+    "reset_after" seconds if it fails.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_after: float = 30):
+        self.lock = threading.Lock()
+        self.failure_threshold = failure_threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+
+    def allow(self) -> bool:
+        with self.lock:
+            if self.opened_at is None:
+                return True
+            if time.monotonic() - self.opened_at < self.reset_after:
+                return False
+            # Half open: let this request through, and fail the others at once until
+            # "reset_after" passes again or it succeeds.
+            self.opened_at = time.monotonic()
+            return True
+
+    def retry_after(self) -> float:
+        """
+        Returns:
+            Seconds before a request is let through again.
+        """
+        if self.opened_at is None:
+            return 0.0
+        return max(self.reset_after - (time.monotonic() - self.opened_at), 0.0)
+
+    def report(self, ok: bool):
+        with self.lock:
+            if ok:
+                self.failures = 0
+                self.opened_at = None
+                return
+            self.failures += 1
+            if self.failures >= self.failure_threshold:
+                self.opened_at = time.monotonic()
+
+
+class CircuitOpenError(Exception):
+    """
+    Raised instead of sending a request while the circuit breaker of its host is open.
+    """
+
+
+breakers: dict[str, CircuitBreaker] = {}
+
+
+def breaker(host: str) -> CircuitBreaker:
+    if host not in breakers:
+        breakers[host] = CircuitBreaker()
+    return breakers[host]
+
+
+# Retries of each endpoint during the current tool call, see "counting".
+retry_counter: contextvars.ContextVar[Counter | None] = contextvars.ContextVar(
+    "retry_counter", default=None)
+
+
+@contextlib.contextmanager
+def counting():
+    """
+    Count retries inside the block, including in tasks created inside it.
+    Returns:
+        Counter of retries by endpoint.
+    """
+    counter = Counter()
+    token = retry_counter.set(counter)
+    try:
+        yield counter
+    finally:
+        retry_counter.reset(token)
+
+
+def count(endpoint: str):
+    counter = retry_counter.get()
+    if counter is not None:
+        counter[endpoint] += 1
+    metrics.count_retry(endpoint)
@@ -0,0 +1,150 @@
+"""
+Schema of posts in home feed and searching results, and of the responses containing
+them. Responses are decoded from bytes straight into post records by pydantic-core,
+which skips the fields not in the schema instead of building Python objects for the
+whole response.
+"""
+from typing import Annotated, Any, Literal
+
+from pydantic import AliasChoices, AliasPath, AfterValidator, Field, TypeAdapter
+from pydantic_core import to_json
+from typing_extensions import TypedDict
+
+
+def path(*keys: str) -> AliasChoices:
+    """
+    Path of a field in API responses, whose keys are in snake case, or in the web page's
+    initial state, whose keys are in camel case.
+    """
+    camel_keys = [k.split("_")[0] + "".join(w.title() for w in k.split("_")[1:])
+                  for k in keys]
+    return AliasChoices(AliasPath(*keys), AliasPath(*camel_keys))
+
+
+class Post(TypedDict):
+    id: str
+    xsec_token: Annotated[str, Field(validation_alias=path("xsec_token"))]
+    # no title is possible
+    title: Annotated[str, Field(default="",
+                                validation_alias=path("note_card", "display_title"))]
+    # resolution: blur, median, original (not available in feed)
+    cover_median_url: Annotated[str, Field(
+        validation_alias=path("note_card", "cover", "url_default"))]
+    user_id: Annotated[str, Field(validation_alias=path("note_card", "user", "user_id"))]
+    user_name: Annotated[str, Field(
+        validation_alias=path("note_card", "user", "nick_name"))]
+    user_xsec_token: Annotated[str, Field(
+        validation_alias=path("note_card", "user", "xsec_token"))]
+
+
+post_fields = list(Post.__annotations__)
+
+
+class SearchNote(Post):
+    model_type: Literal["note"]
+
+
+def not_note(model_type: str) -> str:
+    assert model_type != "note", "A post in searching results doesn't match the schema."
+    return model_type
+
+
+class SearchOther(TypedDict):
+    """
+    Items of searching results which are not posts, e.g. related queries.
+    """
+    model_type: Annotated[str, AfterValidator(not_note)]
+
+
+class Status(TypedDict):
+    """
+    Whether an API accepts the request.
+    """
+    success: Annotated[bool, Field(default=False)]
+    code: Annotated[int | None, Field(default=None)]
+    msg: Annotated[str, Field(default="")]
+
+
+class HomefeedData(TypedDict):
+    cursor_score: str
+    items: list[Post]
+
+
+class HomefeedResponse(TypedDict):
+    success: bool
+    msg: Annotated[str, Field(default="")]
+    data: Annotated[HomefeedData | None, Field(default=None)]
+
+
+class SearchData(TypedDict):
+    has_more: Annotated[bool, Field(default=False)]
+    items: Annotated[list[Annotated[SearchNote | SearchOther,
+                                    Field(union_mode="left_to_right")]] | None,
+                     Field(default=None)]
+
+
+class SearchResponse(TypedDict):
+    success: bool
+    msg: Annotated[str, Field(default="")]
+    data: Annotated[SearchData | None, Field(default=None)]
+
+
+class DetailItem(TypedDict):
+    # Fields of the post are read as in the web page's initial state.
+    note_card: dict[str, Any]
+
+
+class DetailData(TypedDict):
+    items: Annotated[list[DetailItem] | None, Field(default=None)]
+
+
+class DetailResponse(TypedDict):
+    success: bool
+    msg: Annotated[str, Field(default="")]
+    data: Annotated[DetailData | None, Field(default=None)]
+
+
+class CommentReply(TypedDict):
+    user_name: Annotated[str, Field(default="",
+                                    validation_alias=path("user_info", "nickname"))]
+    content: Annotated[str, Field(default="")]
+
+
+class Comment(TypedDict):
+    id: str
+    user_name: Annotated[str, Field(default="",
+                                    validation_alias=path("user_info", "nickname"))]
+    content: Annotated[str, Field(default="")]
+    like_count: Annotated[str, Field(default="0")]
+    create_time: Annotated[int, Field(default=0)]
+    ip_location: Annotated[str, Field(default="")]
+    sub_comment_count: Annotated[str, Field(default="0")]
+    # The first replies of the comment, the others are behind another cursor.
+    sub_comments: Annotated[list[CommentReply], Field(default_factory=list)]
+
+
+class CommentsData(TypedDict):
+    comments: Annotated[list[Comment], Field(default_factory=list)]
+    cursor: Annotated[str, Field(default="")]
+    has_more: Annotated[bool, Field(default=False)]
+
+
+class CommentsResponse(TypedDict):
+    success: bool
+    msg: Annotated[str, Field(default="")]
+    data: Annotated[CommentsData | None, Field(default=None)]
+
+
+status_adapter = TypeAdapter(Status)
+posts_adapter = TypeAdapter(list[Post])
+homefeed_adapter = TypeAdapter(HomefeedResponse)
+search_adapter = TypeAdapter(SearchResponse)
+detail_adapter = TypeAdapter(DetailResponse)
+comments_adapter = TypeAdapter(CommentsResponse)
+
+
+def dumps(obj: Any) -> str:
+    """
+    Compact JSON without escaping non-ASCII characters, faster than "json.dumps".
+    """
+    return to_json(obj).decode("utf-8")
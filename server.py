@@ -1,13 +1,33 @@
+import asyncio
+import functools
 import json
 import logging
 import os
 import sys
+import time
+from argparse import ArgumentParser
 
-from mcp.server.fastmcp import FastMCP
-from requests import Session
+import anyio
+from mcp.server.fastmcp import Context, FastMCP
 
-from cookies import load_cookies
-from get_data import feed_first_page, feed_subsequent_page, search_page, get_details_
+import get_data
+import metrics
+from accounts import Account, AccountPool
+from cache import CommentCache, DetailCache, SearchCache
+from cookies import load_cookies_dir, load_cookies_file
+from deadline import deadline_after
+from feed_pool import FeedPool, feed_post_count
+from get_data import (feed_page, new_feed_state, search_page, search_page_cached,
+                      get_details_, get_comments_, www_origin, edith_origin,
+                      default_rates)
+from http_pool import create_client, warm_up
+from image_cache import ImageCache
+from note_index import NoteIndex
+from output_format import check_output, dump_posts
+from pagination import decode_cursor, encode_cursor, fetch_pages, merge_results
+from prefetch import Prefetcher
+from schema import dumps
+from xhshow_contrib import search_id
 
 # %% Logging system.
 logging.basicConfig(
@@ -34,11 +54,131 @@ def handle_exception(exc_type, exc_value, exc_traceback):
 sys.excepthook = handle_exception
 
 # %% Initial definitions.
+parser = ArgumentParser()
+parser.add_argument("--transport", choices=["stdio", "streamable-http", "sse"],
+                    default="stdio",
+                    help="\"stdio\" serves the MCP client which starts this process. "
+                         "\"streamable-http\" and \"sse\" serve many MCP clients at "
+                         "\"http://$host:$port/mcp\" and \"http://$host:$port/sse\", "
+                         "sharing the connections, rate limits and caches.")
+parser.add_argument("--host", default="127.0.0.1",
+                    help="Host to listen at, with HTTP transports.")
+parser.add_argument("--port", type=int, default=8000,
+                    help="Port to listen at, with HTTP transports.")
+parser.add_argument("--http2", action="store_true",
+                    help="Use HTTP/2 to connect the website, requires \"h2\" package.")
+parser.add_argument("--warm_up", action="store_true",
+                    help="Connect the website when starting the server.")
+parser.add_argument("--rates",
+                    help="JSON file mapping hosts or endpoints (e.g. \"edith/search\") to "
+                         "[requests per second, burst], overriding the default rates.")
+parser.add_argument("--record",
+                    help="Append requests to the website and responses to this file.")
+parser.add_argument("--replay",
+                    help="Serve responses recorded in this file instead of visiting the "
+                         "website.")
+parser.add_argument("--metrics", action="store_true",
+                    help="Record latency of each stage, read by MCP resource "
+                         "\"stats://latency\".")
+parser.add_argument("--prometheus_path",
+                    help="Write metrics in Prometheus text format to this file after "
+                         "each tool call, implies --metrics.")
+parser.add_argument("--search_ttl", type=float, default=300,
+                    help="Seconds before cached searching results become stale. 0 "
+                         "disables the cache.")
+parser.add_argument("--search_stale_ttl", type=float, default=3600,
+                    help="Seconds before stale searching results are no longer served. "
+                         "Stale results are fetched again in background.")
+parser.add_argument("--comment_ttl", type=float, default=3600,
+                    help="Seconds before cached pages of comments expire. 0 disables the "
+                         "cache.")
+parser.add_argument("--cookies_dir", default="raw/cookies",
+                    help="Folder of cookies of several accounts, one CSV file per "
+                         "account. If it doesn't exist, \"raw/cookies.csv\" is used.")
+parser.add_argument("--detail_backend", choices=get_data.detail_backends, default="html",
+                    help="\"html\" downloads the web page of each post, and \"api\" calls "
+                         "the JSON API, falling back to the web page if the API fails.")
+parser.add_argument("--prefetch", type=int, default=0,
+                    help="Number of top results of \"search\" and \"get_feed\" whose "
+                         "details are fetched in background. 0 disables prefetching.")
+parser.add_argument("--feed_pool", type=int, default=0,
+                    help="Number of posts of home feed fetched in background, so that "
+                         "\"get_feed\" is answered from them at once. 0 disables it.")
+parser.add_argument("--feed_max_age", type=float, default=600,
+                    help="Seconds before posts of home feed fetched in background are "
+                         "dropped.")
+parser.add_argument("--time_budget", type=float, default=50,
+                    help="Default seconds before a tool returns the results finished so "
+                         "far, so that MCP clients don't time out. 0 disables it.")
+parser.add_argument("--image_cache_mb", type=float, default=512,
+                    help="Megabytes of images kept in \"raw/images\" by \"get_images\". 0 "
+                         "disables the tool.")
+cmd, _ = parser.parse_known_args()
+
 os.makedirs("raw", exist_ok=True)
-mcp = FastMCP("rednote-assistant")
+mcp = FastMCP("rednote-assistant", host=cmd.host, port=cmd.port)
 with open("role_introduction") as f:
     role = f.read()
-cookies = load_cookies()
+get_data.detail_backend = cmd.detail_backend
+if cmd.rates:
+    with open(cmd.rates) as f:
+        default_rates.update(json.load(f))
+detail_cache = DetailCache("raw/details.sqlite3")
+note_index = NoteIndex("raw/notes.sqlite3")
+comment_cache = (CommentCache("raw/comments.sqlite3", ttl=cmd.comment_ttl)
+                 if cmd.comment_ttl > 0 else None)
+search_cache = (SearchCache("raw/search.sqlite3", ttl=cmd.search_ttl,
+                            stale_ttl=max(cmd.search_ttl, cmd.search_stale_ttl))
+                if cmd.search_ttl > 0 else None)
+if os.path.isdir(cmd.cookies_dir):
+    cookies_of_accounts = load_cookies_dir(cmd.cookies_dir)
+else:
+    # It raises an error if the cookies don't exist or expired.
+    cookies_of_accounts = {"cookies.csv": load_cookies_file()}
+# HTTP clients are shared by every tool call, so that connections to the website are
+# reused.
+account_pool = AccountPool([
+    Account(name, cookies,
+            create_client(cookies, http2=cmd.http2, record_path=cmd.record,
+                          replay_path=cmd.replay),
+            default_rates, expires_at=expires_at)
+    for name, (cookies, expires_at) in cookies_of_accounts.items()
+])
+image_cache = (ImageCache("raw/images",
+                           max_bytes=int(cmd.image_cache_mb * 1024 * 1024))
+               if cmd.image_cache_mb > 0 else None)
+# Images are served by a CDN which doesn't need cookies.
+image_client = create_client({}, http2=cmd.http2, record_path=cmd.record,
+                             replay_path=cmd.replay)
+feed_pool = (FeedPool(account_pool, capacity=cmd.feed_pool, max_age=cmd.feed_max_age)
+             if cmd.feed_pool > 0 else None)
+prefetcher = (Prefetcher(account_pool, detail_cache, index=note_index, top_k=cmd.prefetch)
+              if cmd.prefetch > 0 else None)
+
+metrics.enabled = cmd.metrics or bool(cmd.prometheus_path)
+
+
+def tool_deadline(time_budget: float | None) -> float | None:
+    return deadline_after(cmd.time_budget if time_budget is None else time_budget)
+
+
+def instrumented(function):
+    """
+    Record latency of the tool, and pause prefetching while the tool is running.
+    """
+    @functools.wraps(function)
+    async def wrapper(*args, **kwargs):
+        with metrics.span("tool", function.__name__):
+            if prefetcher is None:
+                result = await function(*args, **kwargs)
+            else:
+                async with prefetcher.foreground():
+                    result = await function(*args, **kwargs)
+        if cmd.prometheus_path:
+            metrics.write_prometheus(cmd.prometheus_path)
+        return result
+    return wrapper
+
 
 # %% API.
 @mcp.prompt()
@@ -49,8 +189,33 @@ def rednote_assistant_general_workflow():
     return role
 
 
+def dump_pages(posts: list[dict], output_format: str, fields: list[str], kind: str,
+               state: dict | None, error: str | None, ages: list[float] = ()):
+    """
+    Serialize posts, followed by a JSON object of the next cursor, the error, and the
+    age of cached pages if any of them exist.
+    """
+    if prefetcher is not None:
+        prefetcher.schedule(posts)
+    table = dump_posts(posts, output_format, fields)
+    info = {}
+    if state is not None:
+        info['next_cursor'] = encode_cursor({**state, 'kind': kind})
+    if error is not None:
+        info['error'] = error
+    if ages:
+        info['cached_pages'] = len(ages)
+        info['age_seconds'] = round(max(ages))
+    if not info:
+        return table
+    return [table, dumps(info)]
+
+
 @mcp.tool()
-def get_feed(pages: int):
+@instrumented
+async def get_feed(pages: int, output_format: str = "columns",
+                   fields: list[str] | None = None, cursor: str | None = None,
+                   time_budget: float | None = None, ctx: Context = None):
     """
     Retrieves recommended posts for the home page, personalized according to user
     preferences. Each calling may fetch different results, because the server may
@@ -58,9 +223,21 @@ def get_feed(pages: int):
     to display or explore recommended content without specific search terms.
     Args:
         pages: integer, number of pages. The first page has 39 posts, and each subsequent
-        pages has 15 records.
+        pages has 15 records. Ask for 1 page to see the first posts fastest, then
+        continue with "cursor".
+        output_format: string, "columns" (default), "records" or "tsv".
+            columns: JSON object {"columns": [column names], "rows": [[values], ...]}.
+            records: JSON list of objects, each object is a post.
+            tsv: tab-separated values, the first line is column names.
+        fields: list of string, the columns to return. Default to "id", "xsec_token",
+        "title", "cover_median_url". Ask for other columns only when needed.
+        cursor: string, "next_cursor" returned by the last call, to fetch the pages
+        after it. Empty to start from the first page, or, if the server keeps posts
+        fetched in background, to take the posts not returned yet.
+        time_budget: number, seconds before the tool returns the results finished so
+        far, default to 50. 0 waits until everything is finished.
     Returns:
-        JSON format of table of recommended posts with the following columns.
+        Table of recommended posts with the following columns.
             id: Post unique identifier
             xsec_token: Token for accessing detailed content
             title: Post title
@@ -68,28 +245,29 @@ def get_feed(pages: int):
             user_id: Author's unique identifier (not useful)
             user_name: Author's nickname (not useful)
             user_xsec_token: Token for author's homepage (not useful)
+        The table is followed by a JSON object with the following keys, if any.
+            next_cursor: pass it as "cursor" to fetch more pages.
+            error: why a page failed, or that the time budget is used up. Posts of the
+            pages before it are still returned, and "next_cursor" retries the page.
     """
-    assert pages >= 1, "Number of pages must be a positive integer."
-
-    session = Session()
-    posts = feed_first_page(session, cookies)
-    if pages == 1:
-        return json.dumps(posts)
-    cursor_score = ""
-    for page in range(1, pages):
-        new_posts, cursor_score = feed_subsequent_page(
-            session=session,
-            cookies=cookies,
-            note_index=len(posts) - 1,
-            page=page,
-            cursor_score=cursor_score
-        )
-        posts += new_posts
-    return json.dumps(posts)
+    fields = check_output(output_format, fields)
+    deadline = tool_deadline(time_budget)
+    state = decode_cursor(cursor, "feed") if cursor else None
+    if feed_pool is not None and (state is None or state.get('pool')):
+        posts, error = await feed_pool.take(feed_post_count(pages), deadline)
+        return dump_pages(posts, output_format, fields, "feed", {"pool": True}, error)
+    if state is None or state.get('pool'):
+        state = new_feed_state()
+    posts, state, error = await fetch_pages(account_pool, feed_page, state, pages, ctx,
+                                            deadline)
+    return dump_pages(posts, output_format, fields, "feed", state, error)
 
 
 @mcp.tool()
-def search(query: str, pages: int):
+@instrumented
+async def search(query: str, pages: int, output_format: str = "columns",
+                 fields: list[str] | None = None, cursor: str | None = None,
+                 time_budget: float | None = None, ctx: Context = None):
     """
     Search posts by keyword or query terms. Use this function when you want to find posts
     on specific topics or keywords.
@@ -97,9 +275,20 @@ def search(query: str, pages: int):
         query: string, the input to the searching box.
         pages: integer, number of pages. Each page returns 20 posts. The number of pages
         returned may be less than this value, which usually mean there are not enough
-        searching results.
+        searching results. Ask for 1 page to see the first posts fastest, then continue
+        with "cursor".
+        output_format: string, "columns" (default), "records" or "tsv".
+            columns: JSON object {"columns": [column names], "rows": [[values], ...]}.
+            records: JSON list of objects, each object is a post.
+            tsv: tab-separated values, the first line is column names.
+        fields: list of string, the columns to return. Default to "id", "xsec_token",
+        "title", "cover_median_url". Ask for other columns only when needed.
+        cursor: string, "next_cursor" returned by the last call with the same query, to
+        fetch the pages after it. Empty to start from the first page.
+        time_budget: number, seconds before the tool returns the results finished so
+        far, default to 50. 0 waits until everything is finished.
     Returns:
-        JSON format of table of searching results (posts) with the following columns.
+        Table of searching results (posts) with the following columns.
             id: Post unique identifier
             xsec_token: Token for accessing detailed content
             title: Post title
@@ -107,19 +296,134 @@ def search(query: str, pages: int):
             user_id: Author's unique identifier (not useful)
             user_name: Author's nickname (not useful)
             user_xsec_token: Token for author's homepage (not useful)
+        The table is followed by a JSON object with the following keys, if any.
+            next_cursor: pass it as "cursor" to fetch more pages.
+            error: why a page failed, or that the time budget is used up. Posts of the
+            pages before it are still returned, and "next_cursor" retries the page.
+            cached_pages: number of pages read from local cache, which may miss posts
+            published recently.
+            age_seconds: age of the oldest cached page.
+    """
+    fields = check_output(output_format, fields)
+    if cursor:
+        state = decode_cursor(cursor, "search")
+        assert state['query'] == query, \
+            f"The cursor belongs to query \"{state['query']}\" instead of \"{query}\"."
+    else:
+        state = None
+    ages = []
+    posts, state, error = await search_pages(query, pages, state, ages, ctx,
+                                             tool_deadline(time_budget))
+    return dump_pages(posts, output_format, fields, "search", state, error, ages)
+
+
+async def search_pages(query: str, pages: int, state: dict | None, ages: list[float],
+                       ctx: Context = None, deadline: float = None):
+    """
+    Fetch pages of searching results, see "fetch_pages".
+    Args:
+        state: state of the first page decoded from a cursor, or None to start from the
+        first page.
+        ages: list which the age of each page read from the cache is appended to.
     """
-    session = Session()
-    posts = []
-    for page in range(pages):
-        new_posts, has_more = search_page(session, cookies, query, page)
-        posts += new_posts
-        if not has_more:
-            break
-    return json.dumps(posts)
+    if state is None:
+        state = {"page": 0, "query": query,
+                 "search_id": search_id(int(time.time() * 1000))}
+
+    async def fetch_page(account, state):
+        if search_cache is None:
+            return await search_page(account, query, state['page'], state['search_id'])
+        posts, has_more, age = await search_page_cached(
+            account, query, state['page'], search_cache, account_pool,
+            state['search_id'])
+        if age is not None:
+            ages.append(age)
+        return posts, has_more
+
+    return await fetch_pages(account_pool, fetch_page, state, pages, ctx, deadline)
 
 
 @mcp.tool()
-def get_details(id_list: list[str], xsec_token_list: list[str]):
+@instrumented
+async def search_many(queries: list[str], pages: int = 1, output_format: str = "columns",
+                      fields: list[str] | None = None, time_budget: float | None = None,
+                      ctx: Context = None):
+    """
+    Search several queries, e.g. variations of a keyword, and merge the results without
+    duplicates, in one call instead of calling "search" for each query in turn. Searching
+    is rate limited per account, so queries only run in parallel when the server has
+    several accounts; with one account, it takes as long as searching them in turn.
+    Args:
+        queries: list of string, the inputs to the searching box.
+        pages: integer, number of pages of each query. Each page returns 20 posts.
+        output_format: string, "columns" (default), "records" or "tsv", see "search".
+        fields: list of string, the columns to return. Default to "id", "xsec_token",
+        "title", "cover_median_url", "queries". Ask for other columns only when needed.
+        time_budget: number, seconds before the tool returns the results finished so
+        far, default to 50. 0 waits until everything is finished.
+    Returns:
+        Table of unique posts with the columns of "search", and "queries", the queries
+        which found the post. Top posts of every query come first.
+        The table is followed by a JSON object with the following keys, if any.
+            next_cursors: JSON object mapping queries to "next_cursor", pass it as
+            "cursor" of "search" to fetch more pages of the query.
+            errors: JSON object mapping queries to why they failed. Posts of other
+            queries, and of the pages before the failure, are still returned.
+            cached_pages: number of pages read from local cache.
+            age_seconds: age of the oldest cached page.
+    """
+    fields = check_output(output_format, fields, extra_fields=["queries"])
+    queries = list(dict.fromkeys(query.strip() for query in queries if query.strip()))
+    assert queries, "At least one query is required."
+    deadline = tool_deadline(time_budget)
+    ages = []
+    finished = 0
+
+    async def search_query(query):
+        nonlocal finished
+        try:
+            return await search_pages(query, pages, None, ages, deadline=deadline)
+        except Exception as e:
+            logging.warning(f"Fail to search \"{query}\": {e}")
+            return [], None, str(e)
+        finally:
+            finished += 1
+            if ctx is not None:
+                await ctx.report_progress(finished, len(queries),
+                                          f"{finished} of {len(queries)} queries")
+
+    # Each query borrows the least busy account, and requests still wait for the rate
+    # limits of the account, so the queries only overlap as far as the limits allow.
+    results = await asyncio.gather(*[search_query(query) for query in queries])
+    errors = {query: error for query, (_, _, error) in zip(queries, results)
+              if error is not None}
+    assert len(errors) < len(queries), \
+        "Every query fails: " + "; ".join(f"{q}: {e}" for q, e in errors.items())
+    posts = merge_results([(query, posts) for query, (posts, _, _)
+                           in zip(queries, results)])
+    if prefetcher is not None:
+        prefetcher.schedule(posts)
+    table = dump_posts(posts, output_format, fields, extra_fields=["queries"])
+    info = {}
+    next_cursors = {query: encode_cursor({**state, 'kind': "search"})
+                    for query, (_, state, _) in zip(queries, results)
+                    if state is not None}
+    if next_cursors:
+        info['next_cursors'] = next_cursors
+    if errors:
+        info['errors'] = errors
+    if ages:
+        info['cached_pages'] = len(ages)
+        info['age_seconds'] = round(max(ages))
+    if not info:
+        return table
+    return [table, dumps(info)]
+
+
+@mcp.tool()
+@instrumented
+async def get_details(id_list: list[str], xsec_token_list: list[str],
+                      time_budget: float | None = None):
     """
     Retrieves detailed content of a list of posts, identified by the list of "id" and
     the corresponding list of "xsec_token". Use this function to access complete post
@@ -128,8 +432,19 @@ def get_details(id_list: list[str], xsec_token_list: list[str]):
         id_list: list of string, the list of post IDs.
         xsec_token_list: list of string, the list of access tokens corresponding to the
         post IDs.
+        time_budget: number, seconds before the tool returns the results finished so
+        far, default to 50. 0 waits until everything is finished.
     Returns:
-        JSON format of detailed content of the requested posts with the following columns.
+        JSON object with the following keys.
+            posts: detailed content of the requested posts.
+            cache_hits: number of posts read from local cache instead of the website.
+            cache_misses: number of posts fetched from the website.
+            retries: number of requests sent again after transient failures, if any.
+            errors: JSON object mapping IDs of posts to why they failed, if any.
+            unfinished: posts not fetched when the time budget is used up, if any, as
+            {"id_list": [...], "xsec_token_list": [...]}. Pass them to this tool again
+            to fetch them.
+        Each post has the following keys.
             url: URL link of the post
             title: Title of the post
             description: Textual content of the post
@@ -138,10 +453,166 @@ def get_details(id_list: list[str], xsec_token_list: list[str]):
             published_time: The time when the post is published
             location: The location of the author when publishing the post
     """
-    session = Session()
-    posts = get_details_(session, cookies, id_list, xsec_token_list)
-    return json.dumps(posts)
+    deadline = tool_deadline(time_budget)
+    if prefetcher is not None:
+        await prefetcher.claim(id_list, deadline)
+    posts, stats = await get_details_(account_pool, id_list, xsec_token_list,
+                                      cache=detail_cache, index=note_index,
+                                      deadline=deadline)
+    return dumps({"posts": posts, **stats})
+
+
+@mcp.tool()
+@instrumented
+async def get_comments(id_list: list[str], xsec_token_list: list[str],
+                       max_per_post: int = 20, time_budget: float | None = None):
+    """
+    Retrieves comments of a list of posts, identified by the list of "id" and the
+    corresponding list of "xsec_token". Use this function to learn what readers think of
+    the posts, e.g. whether a recommendation is confirmed or disputed by others.
+    Args:
+        id_list: list of string, the list of post IDs.
+        xsec_token_list: list of string, the list of access tokens corresponding to the
+        post IDs.
+        max_per_post: integer, maximum number of comments of each post, default to 20.
+        Comments are fetched 10 by 10, so large numbers take longer.
+        time_budget: number, seconds before the tool returns the results finished so
+        far, default to 50. 0 waits until everything is finished.
+    Returns:
+        JSON object with the following keys.
+            posts: list of {"id", "comments", "has_more"}, "has_more" tells whether the
+            post has more comments than returned.
+            cached_pages: number of pages of comments read from local cache.
+            fetched_pages: number of pages of comments fetched from the website.
+            retries: number of requests sent again after transient failures, if any.
+            errors: JSON object mapping IDs of posts to why they failed, if any.
+            unfinished: posts not fetched when the time budget is used up, if any, as
+            {"id_list": [...], "xsec_token_list": [...]}.
+        Each comment has the following keys.
+            id: ID of the comment
+            user_name: Name of the commenter
+            content: Text of the comment
+            like_count: Number of likes
+            published_time: The time when the comment is published
+            location: The location of the commenter
+            reply_count: Number of replies
+            replies: The first replies, each with "user_name" and "content"
+    """
+    posts, stats = await get_comments_(account_pool, id_list, xsec_token_list,
+                                       max_per_post=max_per_post, cache=comment_cache,
+                                       deadline=tool_deadline(time_budget))
+    return dumps({"posts": posts, **stats})
+
+
+@mcp.tool()
+@instrumented
+async def search_local(query: str = "", since: str = None, until: str = None,
+                       labels: list[str] = None, limit: int = 20):
+    """
+    Searches posts whose details were retrieved before by "get_details", without visiting
+    the website. It takes milliseconds, so try it before "search" when the topic may have
+    been researched already.
+    Args:
+        query: space-separated keywords, each of which must appear in the title,
+        description, labels or location of the post. Empty to match every post.
+        since: optional, earliest published time as "YYYY-MM-DD" or "YYYY-MM-DD HH:MM:SS"
+        in China Standard Time.
+        until: optional, latest published time in the same format as "since".
+        labels: optional, topic labels which every returned post must have.
+        limit: maximum number of posts returned.
+    Returns:
+        JSON list of posts, most relevant or newest first. Each post has the keys of
+        "get_details", with "id" and "xsec_token".
+    """
+    posts = note_index.search(query, since=since, until=until, labels=labels,
+                              limit=limit)
+    return dumps(posts)
+
+
+@mcp.tool()
+@instrumented
+async def get_images(urls: list[str], max_side: int = 0,
+                     time_budget: float | None = None):
+    """
+    Downloads images, e.g. "cover_median_url" of posts or "images" of "get_details", to
+    local files, and returns their paths. Images downloaded before are not downloaded
+    again, so use the paths instead of the URLs when looking at images repeatedly.
+    Args:
+        urls: list of string, URLs of images.
+        max_side: integer, if positive, the returned images are downscaled so that the
+        longer side is at most this number of pixels, e.g. 512 for thumbnails. 0
+        (default) returns the original images.
+        time_budget: number, seconds before the tool returns the results finished so
+        far, default to 50. 0 waits until everything is finished.
+    Returns:
+        JSON object with the following keys.
+            paths: JSON object mapping URLs to local paths of the images.
+            errors: JSON object mapping URLs to why they failed, if any.
+            cache_hits: number of images read from local files.
+            downloaded_bytes: bytes downloaded from the website.
+            unfinished: URLs not downloaded when the time budget is used up, if any.
+    """
+    assert image_cache is not None, \
+        "Images are not stored, because the server is started with --image_cache_mb 0."
+    assert max_side >= 0, "Max side must not be negative."
+    paths, errors, stats = await image_cache.get_many(image_client, urls, max_side,
+                                                      tool_deadline(time_budget))
+    result = {"paths": {url: os.path.abspath(path) for url, path in paths.items()}}
+    if errors:
+        result['errors'] = errors
+    return dumps({**result, **stats})
+
+
+@mcp.resource("stats://latency", mime_type="application/json")
+def latency_stats():
+    """
+    Latency of each stage (rate limit waiting, signing, HTTP, parsing) and each tool in
+    milliseconds, with HTTP status codes and bytes downloaded. Empty unless the server
+    is started with "--metrics".
+    """
+    return json.dumps(metrics.snapshot())
+
+
+@mcp.resource("stats://prometheus", mime_type="text/plain")
+def prometheus_stats():
+    """
+    The same statistics as "stats://latency" in Prometheus text format.
+    """
+    return metrics.prometheus_text()
+
+
+@mcp.resource("stats://accounts", mime_type="application/json")
+def account_stats():
+    """
+    Accounts in the pool, whether they are healthy (neither expired nor blocked), and
+    their requests in flight.
+    """
+    return json.dumps(account_pool.status())
+
+
+async def main():
+    # HTTP clients are bound to the event loop, so they are opened and closed in the same
+    # loop as the MCP server.
+    if cmd.warm_up:
+        for account in account_pool.accounts:
+            await warm_up(account.client, [www_origin, edith_origin])
+    if feed_pool is not None:
+        feed_pool.fill()
+    try:
+        if cmd.transport == "streamable-http":
+            await mcp.run_streamable_http_async()
+        elif cmd.transport == "sse":
+            await mcp.run_sse_async()
+        else:
+            await mcp.run_stdio_async()
+    finally:
+        if prefetcher is not None:
+            prefetcher.cancel()
+        if feed_pool is not None:
+            feed_pool.cancel()
+        await account_pool.aclose()
+        await image_client.aclose()
 
 
 if __name__ == '__main__':
-    mcp.run()
+    anyio.run(main)
@@ -0,0 +1,333 @@
+"""
+Local stand-in of www.xiaohongshu.com and edith.xiaohongshu.com, used by tests and
+benchmarks so that performance can be measured without cookies, network or the risk of
+being blocked. It serves the home page "/explore", post details "/explore/{id}" and
+"/api/sns/web/v1/feed", home feed "/api/sns/web/v1/homefeed", searching
+"/api/sns/web/v1/search/notes", comments "/api/sns/web/v2/comment/page" and images
+"/image/{name}". Signatures and cookies are not
+checked.
+Usage:
+    python stub_server.py --port 8000 --latency 0.2 --error_rate 0.1
+"""
+import json
+import random
+import sys
+import threading
+import time
+import zlib
+from argparse import ArgumentParser
+from collections import Counter
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+from urllib.parse import parse_qs, urlsplit
+
+homefeed_fixture_path = "tests/feed_subsequent_page_response.json"
+# Number of pages of searching results of any keyword.
+search_pages = 3
+# Number of pages of comments of any post, and comments of each page.
+comment_pages = 3
+comments_per_page = 10
+
+
+def note_card(i: int) -> dict:
+    """
+    Card of a post in home feed and searching results, keys in snake case.
+    """
+    return {
+        "display_title": f"Post {i} {{undefined}}",
+        "cover": {"url_default": f"http://sns-webpic-qc.xhscdn.com/cover/{i}"},
+        "user": {"user_id": f"user{i}", "nick_name": f"User {i}",
+                 "xsec_token": f"user-token-{i}"},
+        "interact_info": {"liked": False, "liked_count": str(i)},
+        "type": "normal",
+    }
+
+
+def camel_case(obj):
+    if isinstance(obj, dict):
+        return {
+            k.split("_")[0] + "".join(w.title() for w in k.split("_")[1:]): camel_case(v)
+            for k, v in obj.items()
+        }
+    if isinstance(obj, list):
+        return [camel_case(v) for v in obj]
+    return obj
+
+
+def html_page(initial_state: dict, head: str = "") -> str:
+    """
+    Build an HTML page which embeds "initial_state" in the same way as the website.
+    """
+    state = json.dumps(initial_state, ensure_ascii=False)
+    state = state.replace('"notificationInterval": 30', '"notificationInterval": undefined')
+    return (
+        f'<!doctype html><html><head>{head}'
+        f'<script>window.__SSR__=true</script></head>'
+        f'<body><div id="app">{"<div class=note></div>" * 500}</div>'
+        f'<script>window.__INITIAL_STATE__={state}</script></body></html>'
+    )
+
+
+def explore_page() -> str:
+    """
+    Build an HTML page which has the same structure as "/explore".
+    """
+    feeds = [
+        {"id": f"{i:024x}", "xsecToken": f"token-{i}", "modelType": "note",
+         "noteCard": camel_case(note_card(i))}
+        for i in range(39)
+    ]
+    return html_page({
+        "global": {"appSettings": {"notificationInterval": 30}},
+        "feed": {"feeds": feeds},
+    })
+
+
+def detail_note(id_: str) -> dict:
+    """
+    Details of a post, keys in snake case.
+    """
+    return {
+        "note_id": id_,
+        "type": "normal",
+        "title": f"Title of {id_}",
+        "desc": "Description {with braces} and the word undefined. " * 20,
+        "tag_list": [{"id": "1", "name": "travel", "type": "topic"},
+                     {"id": "2", "name": "food", "type": "topic"}],
+        "ip_location": "Shanghai",
+        "time": 1767225600000,
+        "user": {"user_id": "user0", "nickname": "User 0", "avatar": "http://avatar"},
+        "interact_info": {"liked_count": "10", "collected_count": "5",
+                          "comment_count": "3", "share_count": "1"},
+        "image_list": [
+            {"url_default": f"http://sns-webpic-qc.xhscdn.com/{id_}/{i}",
+             "width": 1080, "height": 1440}
+            for i in range(4)
+        ],
+    }
+
+
+def detail_page(id_: str) -> str:
+    """
+    Build an HTML page which has the same structure as "/explore/{id}".
+    """
+    initial_state = {
+        "global": {"appSettings": {"notificationInterval": 30}},
+        "note": {
+            "noteDetailMap": {
+                id_: {
+                    "comments": {"list": [], "cursor": "", "hasMore": True},
+                    "note": camel_case(detail_note(id_)),
+                },
+            },
+        },
+        # The website fills the state with megabytes of unrelated data.
+        "feed": {"feeds": [{"id": str(i), "noteCard": {"displayTitle": "x" * 200}}
+                           for i in range(300)]},
+    }
+    images = "".join(
+        f'<meta name="og:image" content="http://sns-webpic-qc.xhscdn.com/{id_}/{i}">'
+        for i in range(4)
+    )
+    return html_page(initial_state, head=f"<title>{id_}</title>{images}")
+
+
+def image(name: str, size: int = 200 * 1024) -> bytes:
+    """
+    Content of an image, which is the same for the same name. The bytes are random, so
+    they are not valid UTF-8, like a real image.
+    """
+    return random.Random(name).randbytes(size)
+
+
+def feed_response(id_: str) -> dict:
+    """
+    Response of "/api/sns/web/v1/feed", details of a post.
+    """
+    return {
+        "code": 0, "success": True, "msg": "成功",
+        "data": {
+            "cursor_score": "",
+            "items": [{"id": id_, "model_type": "note", "note_card": detail_note(id_)}],
+            "current_time": int(time.time() * 1000),
+        },
+    }
+
+
+def homefeed_response(cursor_score: str) -> dict:
+    """
+    Subsequent page of home feed, based on a response saved from the website. Posts of
+    each page have different IDs.
+    """
+    with open(homefeed_fixture_path, encoding="utf-8") as f:
+        response = json.load(f)
+    page = int(cursor_score or 0)
+    for item in response['data']['items']:
+        item['id'] = f"{page + 1:04x}{item['id'][4:]}"
+    response['data']['cursor_score'] = str(page + 1)
+    return response
+
+
+def search_response(keyword: str, page: int) -> dict:
+    """
+    Page of searching results, "page" starts from 1. Posts depend on the keyword.
+    """
+    if page > search_pages:
+        return {"code": 0, "success": True, "msg": "成功",
+                "data": {"has_more": False}}
+    prefix = f"{zlib.crc32(keyword.encode('utf-8')):08x}{page:04x}"
+    items = [{"id": f"{prefix}{i:012x}", "model_type": "note",
+              "xsec_token": f"token-{prefix}-{i}", "note_card": note_card(i)}
+             for i in range(20)]
+    # Searching results also have related queries, which are not posts.
+    items.insert(5, {"id": f"{prefix}hot", "model_type": "hot_query",
+                     "hot_query": {"queries": [{"name": keyword}]}})
+    return {"code": 0, "success": True, "msg": "成功",
+            "data": {"has_more": page < search_pages, "items": items}}
+
+
+def comments_response(note_id: str, cursor: str) -> dict:
+    """
+    Page of comments of a post, the cursor is the index of the page.
+    """
+    page = int(cursor or 0)
+    comments = [{"id": f"{note_id}-{page}-{i}", "content": f"Comment {i} of page {page}.",
+                 "like_count": str(i), "create_time": 1700000000000 + i,
+                 "ip_location": "上海", "sub_comment_count": "1",
+                 "user_info": {"user_id": f"user{i}", "nickname": f"User {i}"},
+                 "sub_comments": [{"content": "Reply.",
+                                   "user_info": {"nickname": "Author"}}]}
+                for i in range(comments_per_page)]
+    return {"code": 0, "success": True, "msg": "成功",
+            "data": {"comments": comments, "cursor": str(page + 1),
+                     "has_more": page + 1 < comment_pages}}
+
+
+class StubHandler(BaseHTTPRequestHandler):
+    # Keep connections alive like the website.
+    protocol_version = "HTTP/1.1"
+    # Send headers and body together, otherwise delayed ACK adds 40ms to every request.
+    wbufsize = -1
+    disable_nagle_algorithm = True
+    latency = 0.0
+    error_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def reply(self, status: int, content_type: str, body: str | bytes):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_HEAD(self):
+        self.send_response(200)
+        self.send_header("Content-Length", "0")
+        self.end_headers()
+
+    def delay_or_fail(self, api: bool) -> bool:
+        """
+        Simulate latency and errors of the website.
+        Returns:
+            Whether an error is responded.
+        """
+        time.sleep(self.latency)
+        self.server.hits[urlsplit(self.path).path] += 1
+        if random.random() >= self.error_rate:
+            return False
+        if api and random.random() < 0.5:
+            self.reply(200, "application/json", json.dumps(
+                {"code": 300013, "success": False, "msg": "访问频次异常"}))
+        else:
+            self.reply(503, "text/plain", "Service unavailable.")
+        return True
+
+    def do_POST(self):
+        path = urlsplit(self.path).path
+        length = int(self.headers.get("Content-Length", 0))
+        payload = json.loads(self.rfile.read(length) or "{}")
+        if self.delay_or_fail(api=True):
+            return
+        if path == "/api/sns/web/v1/homefeed":
+            response = homefeed_response(payload.get("cursor_score", ""))
+        elif path == "/api/sns/web/v1/search/notes":
+            response = search_response(payload["keyword"], payload["page"])
+        elif path == "/api/sns/web/v1/feed":
+            response = feed_response(payload["source_note_id"])
+        else:
+            self.reply(404, "text/plain", "Not found.")
+            return
+        self.reply(200, "application/json; charset=utf-8",
+                   json.dumps(response, ensure_ascii=False))
+
+    def do_GET(self):
+        path = urlsplit(self.path).path
+        query = parse_qs(urlsplit(self.path).query)
+        if self.delay_or_fail(api=path.startswith("/api/")):
+            return
+        if path == "/api/sns/web/v2/comment/page":
+            response = comments_response(query["note_id"][0],
+                                         query.get("cursor", [""])[0])
+            self.reply(200, "application/json; charset=utf-8",
+                       json.dumps(response, ensure_ascii=False))
+        elif path == "/explore":
+            self.reply(200, "text/html; charset=utf-8", explore_page())
+        elif path.startswith("/explore/"):
+            self.reply(200, "text/html; charset=utf-8",
+                       detail_page(path.removeprefix("/explore/")))
+        elif path.startswith("/image/"):
+            self.reply(200, "image/jpeg", image(path.removeprefix("/image/")))
+        else:
+            self.reply(404, "text/plain", "Not found.")
+
+
+class StubServer(ThreadingHTTPServer):
+    # Clients open many connections at the same time.
+    request_queue_size = 128
+    daemon_threads = True
+
+    def handle_error(self, request, client_address):
+        # Clients close connections when they cancel requests, e.g. at the deadline of
+        # a tool call.
+        if not isinstance(sys.exc_info()[1], ConnectionError):
+            super().handle_error(request, client_address)
+
+
+def start_stub_server(port: int = 0, latency: float = 0.0, error_rate: float = 0.0):
+    """
+    Start the stub server in a daemon thread.
+    Args:
+        port: port to listen at, 0 means any free port.
+        latency: seconds of delay before answering each request.
+        error_rate: probability of responding an error, either HTTP 503 or, for APIs,
+        "success: false".
+
+    Returns:
+        The server and its base URL, e.g. "http://127.0.0.1:8000". Both
+        "get_data.www_origin" and "get_data.edith_origin" can be set to the base URL.
+        "server.hits" counts requests of each path.
+    """
+    handler = type("Handler", (StubHandler,),
+                   {"latency": latency, "error_rate": error_rate})
+    server = StubServer(("127.0.0.1", port), handler)
+    server.hits = Counter()
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_port}"
+
+
+if __name__ == '__main__':
+    parser = ArgumentParser()
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--error_rate", type=float, default=0.0)
+    cmd, _ = parser.parse_known_args()
+
+    server_, base_url = start_stub_server(cmd.port, cmd.latency, cmd.error_rate)
+    print(f"Stub server is listening at {base_url}")
+    try:
+        threading.Event().wait()
+    except KeyboardInterrupt:
+        server_.shutdown()
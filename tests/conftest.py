@@ -0,0 +1,35 @@
+import pytest
+
+import get_data
+from accounts import Account
+from http_pool import create_client
+from stub_server import start_stub_server
+
+cookies = {"a1": "a1", "xsecappid": "xhs-pc-web"}
+
+
+@pytest.fixture
+def account():
+    """
+    Function creating an account without rate limits, with options of "create_client",
+    or with the given HTTP client.
+    """
+    def new_account(name="test", client=None, **client_options):
+        client = client or create_client(cookies, **client_options)
+        return Account(name, cookies, client, rates={})
+
+    return new_account
+
+
+@pytest.fixture
+def stub(request, monkeypatch):
+    """
+    Stub server, with options of "start_stub_server" given by indirect parametrization,
+    e.g. {"latency": 0.3}.
+    """
+    server, base_url = start_stub_server(**getattr(request, "param", {}))
+    monkeypatch.setattr(get_data, "www_origin", base_url)
+    monkeypatch.setattr(get_data, "edith_origin", base_url)
+    yield server
+    server.shutdown()
+    server.server_close()
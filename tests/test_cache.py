@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+from cache import DetailCache, SearchCache
+
+
+def test_detail_cache(tmp_path):
+    cache = DetailCache(str(tmp_path / "details.sqlite3"), ttl=60, max_entries=2)
+    cache.put_many({"a": {"title": "A"}, "b": {"title": "B"}})
+    assert cache.get_many(["a", "b", "c"]) == {"a": {"title": "A"}, "b": {"title": "B"}}
+
+    # "a" is used more recently than "b", so "b" is evicted.
+    time.sleep(0.01)
+    cache.get_many(["a"])
+    cache.put_many({"c": {"title": "C"}})
+    assert cache.get_many(["a", "b", "c"]).keys() == {"a", "c"}
+
+    cache.put_many({"d": {"title": "D"}}, ttl=0)
+    assert cache.get_many(["d"]) == {}
+    cache.close()
+
+
+def test_search_cache(tmp_path):
+    path = str(tmp_path / "search.sqlite3")
+    cache = SearchCache(path, ttl=60, stale_ttl=120)
+    key = cache.key(" Hangzhou  travel", 0, {"sort": "general"})
+    assert key == cache.key("hangzhou travel", 0, {"sort": "general"})
+    assert cache.get(key) is None
+    cache.put(key, [[{"id": "a"}], True])
+    value, age = cache.get(key)
+    assert value == [[{"id": "a"}], True] and age < 1
+    # Entries are persisted.
+    cache.close()
+    assert SearchCache(path).get(key)[0] == value
+
+
+def test_search_cache_refresh(tmp_path):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"), ttl=0, stale_ttl=60)
+    cache.put("key", "old")
+    calls = []
+
+    async def fetch():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "new"
+
+    async def main():
+        # A stale entry is refreshed once, no matter how many times it's read.
+        for _ in range(3):
+            assert cache.get("key")[0] == "old"
+            cache.refresh("key", fetch)
+        await asyncio.gather(*cache.refreshing.values())
+
+    asyncio.run(main())
+    assert calls == [1]
+    assert cache.get("key")[0] == "new"
@@ -0,0 +1,26 @@
+import json
+import os
+import time
+
+from cookies import compiled_path, dump_cookies, read_cookies
+
+
+def test_dump_cookies(tmp_path):
+    expiry = time.time() + 86400
+    exported = {"cookies": [
+        {"name": "a1", "value": "0123", "expirationDate": expiry, "httpOnly": False},
+        {"name": "web_session", "value": "abc", "session": True},
+    ]}
+    with open(tmp_path / "export.json", "w") as f:
+        json.dump(exported, f)
+    csv_path = str(tmp_path / "cookies" / "account.csv")
+    dump_cookies(str(tmp_path / "export.json"), csv_path)
+    assert os.path.isfile(compiled_path(csv_path))
+    # Values are strings, and session cookies don't affect the expiry.
+    assert read_cookies(csv_path) == ({"a1": "0123", "web_session": "abc"},
+                                      expiry + 86400)
+    # Without the compiled cookies, the CSV file is parsed.
+    os.remove(compiled_path(csv_path))
+    assert read_cookies(csv_path) == ({"a1": "0123", "web_session": "abc"},
+                                      expiry + 86400)
+
@@ -0,0 +1,27 @@
+import asyncio
+import time
+
+from deadline import deadline_after, gather_until
+
+
+def test_gather_until():
+    async def job(seconds, fail=False):
+        await asyncio.sleep(seconds)
+        if fail:
+            raise ValueError("Fail on purpose.")
+        return seconds
+
+    async def main():
+        start = time.monotonic()
+        results, errors, unfinished = await gather_until(
+            {"fast": job(0), "failing": job(0, fail=True), "slow": job(10)},
+            deadline_after(0.2))
+        assert time.monotonic() - start < 1
+        assert results == {"fast": 0}
+        assert errors == {"failing": "Fail on purpose."}
+        assert unfinished == ["slow"]
+        # Without deadline, every coroutine finishes.
+        assert await gather_until({"a": job(0.01)}) == ({"a": 0.01}, {}, [])
+
+    asyncio.run(main())
+    assert deadline_after(0) is None
@@ -1,10 +1,12 @@
-from requests import Session
+import asyncio
 
+from accounts import Account, AccountPool
 from cookies import load_cookies
-from get_data import get_details_
+from get_data import default_rates, get_details_
+from http_pool import create_client
 
 cookies = load_cookies()
 print(cookies.keys())
 
-session = Session()
-get_details_(session, cookies, ["67a187b4000000001800ff16"], ["ABWzAbp8jYBRXMEPxo_WfehHHS6PxA0QJyCLRb-T9BY1M="])
+account = Account("cookies.csv", cookies, create_client(cookies), default_rates)
+asyncio.run(get_details_(AccountPool([account]), ["67a187b4000000001800ff16"], ["ABWzAbp8jYBRXMEPxo_WfehHHS6PxA0QJyCLRb-T9BY1M="]))
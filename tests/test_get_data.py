@@ -0,0 +1,17 @@
+from get_data import note_record, parse_detail
+from stub_server import detail_page
+
+
+def test_parse_detail():
+    record = parse_detail(detail_page("abc"), "abc", "url")
+    assert record['title'] == "Title of abc"
+    assert record['url'] == "url"
+
+
+def test_published_time():
+    record = note_record("url", {"time": 1767225600000}, images=[], labels=[],
+                         location="")
+    assert record['published_time'] == "2026-01-01 08:00:00 +0800"
+    # Posts without time have an empty published time.
+    assert note_record("url", {}, images=[], labels=[], location="")[
+        'published_time'] == ""
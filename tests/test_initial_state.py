@@ -0,0 +1,29 @@
+from stub_server import detail_page
+from xhshow_contrib import extract_initial_state, extract_og_images
+
+
+def test_extract_initial_state():
+    html = (
+        '<html><head><meta name="og:image" content="http://a.com/1?x=1&amp;y=2">'
+        "<script>window.__SSR__=true</script></head><body>"
+        '<script>window.__INITIAL_STATE__ = {"a":undefined,"b":"} undefined {",'
+        '"c":[undefined, "It\'s \\"quoted\\" undefined"],"d":{"e":\'single "q"\'},'
+        '"f":True,"undefinedKey":null};window.x=undefined</script></body></html>'
+    )
+    assert extract_initial_state(html) == {
+        "a": None,
+        "b": "} undefined {",
+        "c": [None, 'It\'s "quoted" undefined'],
+        "d": {"e": 'single "q"'},
+        "f": True,
+        "undefinedKey": None,
+    }
+    assert extract_og_images(html) == ["http://a.com/1?x=1&y=2"]
+    assert extract_initial_state("<html></html>") is None
+
+
+def test_extract_detail_page():
+    html = detail_page("abc")
+    note = extract_initial_state(html)['note']['noteDetailMap']['abc']['note']
+    assert "the word undefined" in note['desc']
+    assert len(extract_og_images(html)) == 4
@@ -0,0 +1,29 @@
+import asyncio
+
+import get_data
+import metrics
+
+
+def test_disabled():
+    assert metrics.span("http", "edith/search") is metrics.null_span
+
+
+def test_stages(stub, monkeypatch, account):
+    monkeypatch.setattr(metrics, "enabled", True)
+    monkeypatch.setattr(metrics, "histograms", {})
+    monkeypatch.setattr(metrics, "status_codes", metrics.Counter())
+    monkeypatch.setattr(metrics, "bytes_downloaded", metrics.Counter())
+
+    async def search(test_account):
+        await get_data.search_page(test_account, "旅行", 0)
+        await test_account.client.aclose()
+
+    asyncio.run(search(account()))
+    stages = metrics.snapshot()["stages"]
+    for stage in ["rate_wait", "sign", "http", "parse"]:
+        assert stages[f"{stage} edith/search"]["count"] == 1
+    assert metrics.status_codes[("edith/search", 200)] == 1
+    assert metrics.bytes_downloaded["edith/search"] > 0
+    text = metrics.prometheus_text()
+    assert 'rednote_stage_seconds_count{stage="http",endpoint="edith/search"} 1' in text
+    assert 'le="+Inf"} 1' in text
@@ -0,0 +1,36 @@
+from note_index import NoteIndex, parse_time
+
+
+def note(title, description, labels, published_time):
+    return {"url": "url", "title": title, "description": description, "images": [],
+            "labels": labels, "location": "上海", "published_time": published_time}
+
+
+def test_note_index(tmp_path):
+    index = NoteIndex(str(tmp_path / "notes.sqlite3"))
+    index.add_many({
+        "a": note("周末去杭州旅行", "西湖边的咖啡馆", ["旅行", "杭州"],
+                  "2025-01-01 10:00:00 +0800"),
+        "b": note("上海咖啡馆推荐", "安福路探店", ["咖啡"], "2025-02-01 10:00:00 +0800"),
+        "c": note("Travel guide", "Three days in Shanghai", ["travel"], ""),
+    }, {"a": "token_a"})
+
+    # Terms shorter than 3 characters are matched too.
+    assert [post['id'] for post in index.search("咖啡馆")] in (["a", "b"], ["b", "a"])
+    assert [post['id'] for post in index.search("咖啡 西湖")] == ["a"]
+    assert [post['id'] for post in index.search("shanghai")] == ["c"]
+    assert index.search("杭州")[0]['xsec_token'] == "token_a"
+    assert [post['id'] for post in index.search("咖啡", since="2025-01-15")] == ["b"]
+    assert [post['id'] for post in index.search(until="2025-01-01")] == ["a"]
+    assert [post['id'] for post in index.search(labels=["旅行", "杭州"])] == ["a"]
+
+    # Fetching a post again replaces its entry.
+    index.add_many({"a": note("周末去苏州旅行", "", ["旅行"], "2025-01-01 10:00:00 +0800")})
+    assert index.search("杭州") == []
+    assert index.search("苏州")[0]['title'] == "周末去苏州旅行"
+    index.close()
+
+
+def test_parse_time():
+    assert parse_time("2025-01-01") == parse_time("2025-01-01 00:00:00 +0800")
+    assert parse_time("2025-01-01 08:00:00") == parse_time("2025-01-01 00:00:00 +0000")
@@ -0,0 +1,39 @@
+import json
+
+import pytest
+
+from output_format import dump_posts
+
+posts = [
+    {"id": "1", "xsec_token": "t1", "title": "标题\t1", "cover_median_url": "u1",
+     "user_id": "a", "user_name": "A", "user_xsec_token": "ta"},
+    {"id": "2", "xsec_token": "t2", "title": "", "cover_median_url": "u2",
+     "user_id": "b", "user_name": "B", "user_xsec_token": "tb"},
+]
+
+
+def test_dump_posts():
+    assert json.loads(dump_posts(posts, "columns", ["id", "title"])) == {
+        "columns": ["id", "title"], "rows": [["1", "标题\t1"], ["2", ""]]}
+    assert json.loads(dump_posts(posts, "records", ["user_name"])) == [
+        {"user_name": "A"}, {"user_name": "B"}]
+    assert dump_posts(posts, "tsv", ["id", "title"]) == "id\ttitle\n1\t标题 1\n2\t"
+    assert json.loads(dump_posts(posts))["columns"] == [
+        "id", "xsec_token", "title", "cover_median_url"]
+
+
+def test_dump_posts_invalid():
+    with pytest.raises(AssertionError):
+        dump_posts(posts, "xml")
+    with pytest.raises(AssertionError):
+        dump_posts(posts, "columns", ["likes"])
+
+
+def test_dump_posts_extra_fields():
+    merged = [{**post, "queries": ["露营", "露营装备"]} for post in posts]
+    assert json.loads(dump_posts(merged, "columns", extra_fields=["queries"]))[
+        "columns"] == ["id", "xsec_token", "title", "cover_median_url", "queries"]
+    assert dump_posts(merged, "tsv", ["id", "queries"], extra_fields=["queries"]) == \
+        "id\tqueries\n1\t露营, 露营装备\n2\t露营, 露营装备"
+    with pytest.raises(AssertionError):
+        dump_posts(merged, "columns", ["queries"])
@@ -0,0 +1,73 @@
+import asyncio
+
+import pytest
+
+from accounts import Account, AccountPool
+from deadline import deadline_after
+from http_pool import create_client
+from pagination import decode_cursor, encode_cursor, fetch_pages, merge_results
+
+
+def test_cursor():
+    state = {"kind": "search", "page": 2, "query": "旅行"}
+    assert decode_cursor(encode_cursor(state), "search") == state
+    with pytest.raises(AssertionError):
+        decode_cursor(encode_cursor(state), "feed")
+    with pytest.raises(AssertionError):
+        decode_cursor("not a cursor", "search")
+
+
+def test_fetch_pages():
+    pool = AccountPool([Account(name, {}, create_client({}), rates={})
+                        for name in ["a", "b"]])
+
+    async def fetch_page(account, state):
+        if state['page'] == state['fail_at']:
+            raise AssertionError("Fail to fetch.")
+        return [f"{account.name}{state['page']}"], state['page'] < 4
+
+    async def main():
+        # A failed page keeps the pages before it, and is retried with the next cursor.
+        state = {"page": 0, "fail_at": 2}
+        posts, state, error = await fetch_pages(pool, fetch_page, state, 3)
+        assert len(posts) == 2 and error == "Fail to fetch." and state['page'] == 2
+        # Later pages use the same account.
+        state['fail_at'] = None
+        more_posts, state, error = await fetch_pages(pool, fetch_page, state, 5)
+        assert more_posts == [posts[0][0] + str(page) for page in range(2, 5)]
+        assert state is None and error is None
+        # Nothing is returned if the first page fails.
+        with pytest.raises(AssertionError):
+            await fetch_pages(pool, fetch_page, {"page": 0, "fail_at": 0}, 3)
+        await pool.aclose()
+
+    asyncio.run(main())
+
+
+def test_fetch_pages_deadline():
+    pool = AccountPool([Account("a", {}, create_client({}), rates={})])
+
+    async def fetch_page(account, state):
+        await asyncio.sleep(0.05 if state['page'] < 2 else 10)
+        return [state['page']], True
+
+    async def main():
+        # Pages finished before the deadline are returned, and the cursor resumes from
+        # the unfinished page.
+        posts, state, error = await fetch_pages(pool, fetch_page, {"page": 0}, 5,
+                                                deadline=deadline_after(0.5))
+        assert posts == [0, 1] and state['page'] == 2 and "Time budget" in error
+        await pool.aclose()
+
+    asyncio.run(main())
+
+
+def test_merge_results():
+    a, b, c = ({"id": id_, "title": id_} for id_ in "abc")
+    results = [("q1", [a, b]), ("q2", [c, a]), ("q3", [])]
+    merged = merge_results(results)
+    # Top posts of each query first, duplicates merged in the order found.
+    assert [post['id'] for post in merged] == ["a", "c", "b"]
+    assert [post['queries'] for post in merged] == [["q1", "q2"], ["q2"], ["q1"]]
+    assert "queries" not in a
+    assert merge_results([]) == []
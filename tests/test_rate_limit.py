@@ -0,0 +1,31 @@
+import asyncio
+import time
+
+from rate_limit import RateScheduler
+
+
+async def acquire_all():
+    scheduler = RateScheduler({"host": (100, 2), "host/slow": (20, 1)})
+    # Burst of the host, but only one token of the slow endpoint.
+    assert await scheduler.acquire("host/fast") == 0
+    assert await scheduler.acquire("host/fast") == 0
+    start = time.monotonic()
+    await asyncio.gather(*[scheduler.acquire("host/slow") for _ in range(3)])
+    assert 0.05 < time.monotonic() - start < 0.2
+    # Endpoints of other hosts are not limited.
+    assert await scheduler.acquire("other/endpoint") == 0
+
+
+def test_rate_scheduler():
+    asyncio.run(acquire_all())
+
+
+def test_rate_scheduler_adapts():
+    scheduler = RateScheduler({"host": (100, 1)})
+    bucket = scheduler.buckets["host"]
+    scheduler.report("host/endpoint", ok=False)
+    scheduler.report("host/endpoint", ok=False)
+    assert bucket.slowdown == 4
+    for _ in range(100):
+        scheduler.report("host/endpoint", ok=True)
+    assert bucket.slowdown == 1
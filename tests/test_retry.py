@@ -0,0 +1,39 @@
+import asyncio
+import time
+
+import retry
+from retry import CircuitBreaker, backoff_delay
+
+
+def test_backoff_delay():
+    delays = [backoff_delay(3) for _ in range(100)]
+    assert all(0 <= delay <= retry.base_delay * 8 for delay in delays)
+    # Jitter spreads the retries of requests failed together.
+    assert len(set(delays)) > 1
+    assert backoff_delay(100) <= retry.max_delay
+
+
+def test_circuit_breaker():
+    breaker = CircuitBreaker(failure_threshold=2, reset_after=0.05)
+    breaker.report(False)
+    assert breaker.allow()
+    breaker.report(False)
+    assert not breaker.allow() and breaker.retry_after() > 0
+    time.sleep(0.06)
+    # One request is let through, and the others still fail at once.
+    assert breaker.allow() and not breaker.allow()
+    breaker.report(True)
+    assert breaker.allow() and breaker.retry_after() == 0
+
+
+def test_counting():
+    async def job():
+        retry.count("edith/search")
+
+    async def main():
+        with retry.counting() as retries:
+            await asyncio.gather(job(), job())
+        await job()
+        return retries
+
+    assert asyncio.run(main()) == {"edith/search": 2}
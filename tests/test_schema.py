@@ -0,0 +1,41 @@
+import json
+
+import pytest
+from pydantic import ValidationError
+
+from schema import homefeed_adapter, posts_adapter, search_adapter
+from stub_server import camel_case, note_card, search_response
+
+
+def test_homefeed():
+    with open("tests/feed_subsequent_page_response.json", "rb") as f:
+        response = homefeed_adapter.validate_json(f.read())
+    post = response['data']['items'][0]
+    assert post == {
+        "id": post['id'], "xsec_token": post['xsec_token'],
+        "title": "为什么我们不爱办运动会了",
+        "cover_median_url": post['cover_median_url'],
+        "user_id": "5cf248360000000010003beb", "user_name": "三千年来养生经",
+        "user_xsec_token": "ABLXZ1LVHdtszp5e8gs9LMaQ_8k2B_I1I1PZaRCvIIn7E=",
+    }
+
+
+def test_initial_state():
+    card = camel_case(note_card(1))
+    del card['displayTitle']
+    posts = posts_adapter.validate_python(
+        [{"id": "1", "xsecToken": "token", "noteCard": card}])
+    assert posts[0]['title'] == "" and posts[0]['user_name'] == "User 1"
+
+
+def test_search():
+    content = json.dumps(search_response("旅行", 1))
+    items = search_adapter.validate_json(content)['data']['items']
+    assert [item['model_type'] for item in items].count("note") == 20
+    assert len(items) == 21
+
+    # A post which doesn't match the schema isn't taken as other items.
+    broken = search_response("旅行", 1)
+    del broken['data']['items'][0]['note_card']['cover']
+    with pytest.raises(ValidationError):
+        search_adapter.validate_json(json.dumps(broken))
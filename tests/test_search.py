@@ -1,10 +1,12 @@
-from requests import Session
+import asyncio
 
+from accounts import Account
 from cookies import load_cookies
-from get_data import search_page
+from get_data import default_rates, search_page
+from http_pool import create_client
 
 cookies = load_cookies()
 print(cookies.keys())
 
-session = Session()
-search_page(session, cookies, "cherry studio", 0)
+account = Account("cookies.csv", cookies, create_client(cookies), default_rates)
+asyncio.run(search_page(account, "cherry studio", 0))
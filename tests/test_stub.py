@@ -0,0 +1,408 @@
+import asyncio
+import os
+import time
+
+import httpx
+import pytest
+
+import get_data
+import retry
+from accounts import AccountPool
+from cache import CommentCache, DetailCache, SearchCache
+from deadline import deadline_after
+from feed_pool import FeedPool, feed_post_count
+from http_pool import create_client
+from image_cache import ImageCache
+from prefetch import Prefetcher
+from stub_server import comments_response, detail_page, image
+
+async def fetch_all(account):
+    posts = await get_data.feed_first_page(account)
+    new_posts, cursor_score = await get_data.feed_subsequent_page(
+        account, note_index=len(posts) - 1, page=1, cursor_score="")
+    posts += new_posts
+    for page in range(4):
+        new_posts, has_more = await get_data.search_page(account, "旅行", page)
+        posts += new_posts
+        if not has_more:
+            break
+    details, _ = await get_data.get_details_(
+        AccountPool([account]), [post['id'] for post in posts[:5]],
+        [post['xsec_token'] for post in posts[:5]])
+    await account.client.aclose()
+    return posts, cursor_score, details
+
+
+def test_stub_server(stub, account):
+    posts, cursor_score, details = asyncio.run(fetch_all(account()))
+    # 39 posts of the first page, 39 of the fixture, and 3 pages of searching results.
+    assert len(posts) == 39 + 39 + 20 * 3
+    assert len({post['id'] for post in posts}) == len(posts)
+    assert cursor_score == "1"
+    assert [detail['title'] for detail in details] == [
+        f"Title of {post['id']}" for post in posts[:5]]
+    assert stub.hits["/api/sns/web/v1/search/notes"] == 3
+
+
+def test_record_replay(stub, tmp_path, account):
+    record_path = str(tmp_path / "recordings.jsonl")
+    recorded = asyncio.run(fetch_all(account(record_path=record_path)))
+    stub.shutdown()
+    replayed = asyncio.run(fetch_all(account(replay_path=record_path)))
+    assert replayed == recorded
+
+
+@pytest.mark.parametrize("stub", [{"error_rate": 1.0}], indirect=True)
+def test_error_injection(stub, account):
+    async def search():
+        test_account = account()
+        async with test_account.client:
+            await get_data.search_page(test_account, "旅行", 0)
+
+    with pytest.raises(get_data.ResponseError):
+        asyncio.run(search())
+
+
+@pytest.mark.parametrize("stub", [{"error_rate": 1.0}], indirect=True)
+def test_retry(stub, monkeypatch, account):
+    monkeypatch.setattr(retry, "base_delay", 0.01)
+    monkeypatch.setattr(retry, "breakers", {})
+
+    async def fetch():
+        test_account = account()
+        async with test_account.client:
+            return await get_data.get_detail_html(test_account, "0" * 24, "token")
+
+    with pytest.raises(get_data.ResponseError):
+        asyncio.run(fetch())
+    assert stub.hits["/explore/" + "0" * 24] == retry.max_attempts
+    # The website recovers before the circuit breaker opens.
+    stub.RequestHandlerClass.error_rate = 0.0
+    assert asyncio.run(fetch())['title'] == f"Title of {'0' * 24}"
+    # Requests fail at once after failing 5 times in a row.
+    stub.RequestHandlerClass.error_rate = 1.0
+    with pytest.raises(get_data.ResponseError):
+        asyncio.run(fetch())
+    with pytest.raises(retry.CircuitOpenError):
+        asyncio.run(fetch())
+    assert stub.hits["/explore/" + "0" * 24] == 3 + 1 + 5
+
+
+def test_search_cache(stub, tmp_path, account):
+    cache = SearchCache(str(tmp_path / "search.sqlite3"), ttl=0, stale_ttl=60)
+
+    async def search(test_account):
+        pool = AccountPool([test_account])
+        results = [await get_data.search_page_cached(test_account, "旅行", 0, cache, pool)
+                   for _ in range(2)]
+        # The background fetching borrows its own account from the pool.
+        await asyncio.sleep(0)
+        assert test_account.in_flight == 1
+        await asyncio.gather(*cache.refreshing.values())
+        assert test_account.in_flight == 0
+        await test_account.client.aclose()
+        return results
+
+    (posts, _, age), (cached_posts, _, cached_age) = asyncio.run(search(account()))
+    assert age is None and cached_age is not None
+    assert cached_posts == posts
+    # The stale page is fetched again in background.
+    assert stub.hits["/api/sns/web/v1/search/notes"] == 2
+
+
+def test_account_pool(stub, account):
+    accounts = [account("a"), account("b")]
+    pool = AccountPool(accounts)
+    id_list = [f"{i:024x}" for i in range(8)]
+
+    async def fetch():
+        details, _ = await get_data.get_details_(pool, id_list, ["token"] * 8)
+        await pool.aclose()
+        return details
+
+    assert len(asyncio.run(fetch())) == 8
+    # Both accounts are used.
+    assert all(a.client._transport.requests > 0 for a in accounts)
+
+    # A blocked account is removed from the pool.
+    blocked = httpx.Response(461, request=httpx.Request("GET", "http://localhost"))
+    accounts[0].check(blocked)
+    assert [pool.pick() for _ in range(3)] == [accounts[1]] * 3
+    accounts[1].expires_at = 0
+    with pytest.raises(AssertionError):
+        pool.pick()
+
+
+def test_prefetch(stub, tmp_path, account):
+    pool = AccountPool([account()])
+    cache = DetailCache(str(tmp_path / "details.sqlite3"))
+    prefetcher = Prefetcher(pool, cache, top_k=3)
+    posts = [{"id": f"{i:024x}", "xsec_token": "token"} for i in range(5)]
+
+    async def main():
+        async with prefetcher.foreground():
+            prefetcher.schedule(posts)
+            await asyncio.sleep(0.1)
+            # Nothing is prefetched while a tool call is running.
+            assert stub.hits["/explore/" + posts[0]['id']] == 0
+        await prefetcher.claim([posts[2]['id']])
+        await prefetcher.worker
+        details, stats = await get_data.get_details_(
+            pool, [post['id'] for post in posts], ["token"] * 5, cache=cache)
+        await pool.aclose()
+        return details, stats
+
+    details, stats = asyncio.run(main())
+    assert len(details) == 5
+    # The third post is claimed by the foreground, so it's not prefetched.
+    assert stats == {"cache_hits": 2, "cache_misses": 3}
+    assert sum(n for path, n in stub.hits.items() if path.startswith("/explore/")) == 5
+
+
+@pytest.mark.parametrize("stub", [{"latency": 0.5}], indirect=True)
+def test_prefetch_claim_deadline(stub, tmp_path, account):
+    pool = AccountPool([account()])
+    prefetcher = Prefetcher(pool, DetailCache(str(tmp_path / "details.sqlite3")))
+    id_ = "0" * 24
+
+    async def main():
+        prefetcher.schedule([{"id": id_, "xsec_token": "token"}])
+        await asyncio.sleep(0.05)
+        assert id_ in prefetcher.tasks
+        # The foreground stops waiting for the slow prefetching at its deadline.
+        start = time.monotonic()
+        await prefetcher.claim([id_], deadline_after(0.1))
+        elapsed = time.monotonic() - start
+        prefetcher.cancel()
+        await pool.aclose()
+        return elapsed
+
+    assert asyncio.run(main()) < 0.3
+
+
+def test_detail_backends(stub, monkeypatch, account):
+    id_list = [f"{i:024x}" for i in range(3)]
+
+    async def fetch():
+        test_account = account()
+        details, _ = await get_data.get_details_(
+            AccountPool([test_account]), id_list, ["token"] * 3)
+        await test_account.client.aclose()
+        return details
+
+    html_details = asyncio.run(fetch())
+    monkeypatch.setattr(get_data, "detail_backend", "api")
+    assert asyncio.run(fetch()) == html_details
+    assert stub.hits["/api/sns/web/v1/feed"] == 3
+
+    # The web page is used when the API fails.
+    monkeypatch.setattr(get_data, "edith_origin", get_data.www_origin + "/missing")
+    assert asyncio.run(fetch()) == html_details
+    assert stub.hits["/explore/" + id_list[0]] == 2
+
+    # Also when the API can't be connected after retries.
+    monkeypatch.setattr(retry, "base_delay", 0.01)
+    monkeypatch.setattr(retry, "breakers", {})
+    monkeypatch.setattr(get_data, "edith_origin", "http://127.0.0.1:1")
+    assert asyncio.run(fetch()) == html_details
+
+
+def test_detail_api_not_json(monkeypatch, account):
+    """
+    The web page is used when the API responds a page which isn't JSON, e.g. a captcha.
+    """
+    monkeypatch.setattr(get_data, "detail_backend", "api")
+
+    def handler(request):
+        if request.url.path.startswith("/api/"):
+            return httpx.Response(200, text="<html>captcha</html>",
+                                  headers={"content-type": "text/html"})
+        return httpx.Response(200, text=detail_page(request.url.path.split("/")[-1]),
+                              headers={"content-type": "text/html"})
+
+    async def fetch():
+        test_account = account(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        async with test_account.client:
+            return await get_data.get_detail(test_account, "0" * 24, "token")
+
+    assert asyncio.run(fetch())['title'] == f"Title of {'0' * 24}"
+
+
+def test_image_cache(stub, tmp_path):
+    base_url = get_data.www_origin
+    # Query strings are ignored by the stub server, so the last two URLs have the same
+    # content.
+    urls = [f"{base_url}/image/a", f"{base_url}/image/b", f"{base_url}/image/b?v=2"]
+
+    async def main():
+        client = create_client({})
+        cache = ImageCache(str(tmp_path), max_bytes=10 ** 6)
+        paths, errors, stats = await cache.get_many(client, urls + [urls[0]])
+        assert list(paths) == urls and not errors
+        assert stats == {"cache_hits": 0, "downloaded_bytes": 3 * 200 * 1024}
+        assert paths[urls[1]] == paths[urls[2]] != paths[urls[0]]
+        with open(paths[urls[0]], "rb") as f:
+            assert f.read() == image("a")
+        # Repeated calls don't download anything.
+        paths_again, _, stats = await cache.get_many(client, urls)
+        assert paths_again == paths and stats['downloaded_bytes'] == 0
+        _, errors, _ = await cache.get_many(client, [f"{base_url}/missing"])
+        assert list(errors) == [f"{base_url}/missing"]
+        # The least recently used image is deleted when the cap is exceeded.
+        cache.max_bytes = 500 * 1024
+        await cache.get_many(client, [urls[1]])
+        await cache.get_many(client, [f"{base_url}/image/c"])
+        assert not os.path.exists(paths[urls[0]]) and os.path.exists(paths[urls[1]])
+        cache.close()
+        await client.aclose()
+
+    asyncio.run(main())
+    assert stub.hits["/image/a"] == 1 and stub.hits["/image/b"] == 2
+
+
+def test_record_replay_images(stub, tmp_path):
+    record_path = str(tmp_path / "recordings.jsonl")
+    urls = [f"{get_data.www_origin}/image/{i}" for i in range(2)]
+
+    async def download(folder, **client_options):
+        client = create_client({}, **client_options)
+        cache = ImageCache(str(tmp_path / folder))
+        paths, errors, _ = await cache.get_many(client, urls)
+        assert not errors
+        cache.close()
+        await client.aclose()
+        return paths
+
+    recorded = asyncio.run(download("recorded", record_path=record_path))
+    stub.shutdown()
+    replayed = asyncio.run(download("replayed", replay_path=record_path))
+    for i, url in enumerate(urls):
+        # Images are binary, and replayed byte for byte, so they have the same hash.
+        assert os.path.basename(replayed[url]) == os.path.basename(recorded[url])
+        with open(replayed[url], "rb") as f:
+            assert f.read() == image(str(i))
+
+
+def test_image_cache_batch_over_cap(stub, tmp_path):
+    urls = [f"{get_data.www_origin}/image/{i}" for i in range(3)]
+
+    async def main():
+        client = create_client({})
+        # The cap holds one image, but every image of a call is kept until it returns.
+        cache = ImageCache(str(tmp_path), max_bytes=300 * 1024)
+        paths, errors, _ = await cache.get_many(client, urls)
+        assert not errors and all(os.path.exists(path) for path in paths.values())
+        # Images of earlier calls are evicted by the next call.
+        new_paths, _, _ = await cache.get_many(client, [f"{get_data.www_origin}/image/d"])
+        assert not any(os.path.exists(path) for path in paths.values())
+        assert all(os.path.exists(path) for path in new_paths.values())
+        cache.close()
+        await client.aclose()
+
+    asyncio.run(main())
+
+
+@pytest.mark.parametrize("stub", [{"latency": 0.3}], indirect=True)
+def test_details_deadline(stub, account):
+    id_list = [f"{i:024x}" for i in range(5)]
+
+    async def main():
+        test_account = account()
+        test_account.details_in_flight = asyncio.Semaphore(2)
+        details, stats = await get_data.get_details_(
+            AccountPool([test_account]), id_list, ["token"] * 5, max_workers=5,
+            deadline=deadline_after(0.5))
+        await test_account.client.aclose()
+        return details, stats
+
+    details, stats = asyncio.run(main())
+    # Two posts are fetched in the first 0.3 seconds, and the others are given up.
+    assert [detail['title'] for detail in details] == [
+        f"Title of {id_}" for id_ in id_list[:2]]
+    assert stats['unfinished'] == {"id_list": id_list[2:],
+                                   "xsec_token_list": ["token"] * 3}
+
+
+def test_feed_pool(stub, account):
+    async def main():
+        test_account = account()
+        pool = FeedPool(AccountPool([test_account]), capacity=60, max_age=600)
+        pool.fill()
+        first, error = await pool.take(feed_post_count(1))
+        assert error is None and len(first) == 39
+        # The worker has filled the buffer after the first page.
+        await pool.worker
+        assert len(pool.buffer) >= 60
+        start = time.monotonic()
+        second, _ = await pool.take(feed_post_count(2))
+        assert time.monotonic() - start < 0.05
+        assert len(second) == 54
+        assert len({post['id'] for post in first + second}) == 39 + 54
+        # Posts older than "max_age" are dropped, and the feed restarts.
+        pool.max_age = 0
+        pool.expire()
+        assert not pool.buffer and pool.state['page'] == 0
+        pool.cancel()
+        await test_account.client.aclose()
+
+    asyncio.run(main())
+    assert stub.hits["/explore"] == 1
+
+
+def test_comments_signed_query(monkeypatch, account):
+    from xhshow import Xhshow
+
+    signed = []
+    build_content_string = Xhshow._build_content_string
+
+    def record(self, method, uri, payload=None):
+        signed.append(build_content_string(self, method, uri, payload))
+        return signed[-1]
+
+    monkeypatch.setattr(Xhshow, "_build_content_string", record)
+    sent = []
+
+    def handler(request):
+        sent.append(request.url.raw_path.decode("ascii"))
+        return httpx.Response(200, json=comments_response("0" * 24, ""))
+
+    async def fetch():
+        test_account = account(
+            client=httpx.AsyncClient(transport=httpx.MockTransport(handler)))
+        async with test_account.client:
+            return await get_data.comments_page(test_account, "0" * 24, "AB/c+d=", "")
+
+    assert len(asyncio.run(fetch())['comments']) == 10
+    # The query string sent is the one signed, commas included.
+    assert sent == signed
+    assert "image_formats=jpg,webp,avif" in sent[0]
+
+
+def test_comments(stub, tmp_path, account):
+    cache = CommentCache(str(tmp_path / "comments.sqlite3"))
+    id_list = [f"{i:024x}" for i in range(2)]
+
+    async def main():
+        test_account = account()
+        pool = AccountPool([test_account])
+        first, first_stats = await get_data.get_comments_(
+            pool, id_list, ["token"] * 2, max_per_post=15, cache=cache)
+        # Asking for more comments fetches only the pages after the cached ones.
+        second, second_stats = await get_data.get_comments_(
+            pool, id_list, ["token"] * 2, max_per_post=50, cache=cache)
+        await test_account.client.aclose()
+        return first, first_stats, second, second_stats
+
+    first, first_stats, second, second_stats = asyncio.run(main())
+    cache.close()
+    assert [post['id'] for post in first] == id_list
+    assert all(len(post['comments']) == 15 and post['has_more'] for post in first)
+    assert first_stats == {"cached_pages": 0, "fetched_pages": 4}
+    assert all(len(post['comments']) == 30 and not post['has_more'] for post in second)
+    assert second_stats == {"cached_pages": 4, "fetched_pages": 2}
+    comment = second[0]['comments'][0]
+    assert comment['user_name'] == "User 0" and comment['location'] == "上海"
+    assert comment['replies'] == [{"user_name": "Author", "content": "Reply."}]
+    assert comment['published_time'].endswith("+0800")
+    assert stub.hits["/api/sns/web/v2/comment/page"] == 6
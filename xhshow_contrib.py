@@ -1,62 +1,81 @@
 # Ref: https://github.com/Cloxl/xhshow/issues/49
+import html
 import json
 import random
 import re
 import string
+from datetime import timedelta, timezone
 
-from bs4 import BeautifulSoup
+# Published time of posts is in China Standard Time, which has no daylight saving time.
+china_timezone = timezone(timedelta(hours=8))
+
+# Javascript object "window.__INITIAL_STATE__" is JSON except "undefined" values and,
+# rarely, single-quoted strings. A run of text that needs no conversion: anything
+# except quotes and the first letters of the literals, complete double-quoted strings,
+# and those letters when they don't start a literal.
+state_run = re.compile(
+    r"""(?:[^"'uTFN]+|"[^"\\]*(?:\\.[^"\\]*)*"|(?!(?:undefined|True|False|None)\b)[uTFN])*+"""
+)
+js_literal = re.compile(r"(?:undefined|True|False|None)\b")
+js_literal_to_json = {"undefined": "null", "True": "true", "False": "false", "None": "null"}
+single_quoted = re.compile(r"'([^'\\]*(?:\\.[^'\\]*)*)'")
+state_assignment = re.compile(r"window\.__INITIAL_STATE__\s*=\s*(?={)")
+og_image = re.compile(r"""<meta\s[^>]*?name=["']og:image["'][^>]*>""")
+meta_content = re.compile(r"""content=(["'])(.*?)\1""", re.S)
 
 
 def extract_initial_state(html_content: str) -> dict | None:
     """
-    Extract window.__INITIAL_STATE__ from HTML and convert to JSON.
+    Extract window.__INITIAL_STATE__ from HTML and convert to JSON. The HTML is scanned
+    once without building a document tree; strings are skipped as a whole, so braces
+    and the word "undefined" inside text are kept as they are.
     Args:
-        html_content:
+        html_content: HTML document of the web page.
 
     Returns:
-
+        The state object, or None if the page doesn't have it.
     """
-    soup = BeautifulSoup(html_content, "html.parser")
-
-    for script in soup.find_all("script"):
-        if not script.string or "window.__INITIAL_STATE__" not in script.string:
-            continue
+    assignment = state_assignment.search(html_content)
+    if not assignment:
+        return None
+    pos = assignment.end()
+    # A script element can't contain "</script>", even inside strings.
+    end = html_content.find("</script>", pos)
+    if end == -1:
+        end = len(html_content)
 
-        match = re.search(
-            r"window\.__INITIAL_STATE__\s*=\s*({.*})", script.string, re.S
-        )
-        if not match:
-            continue
+    pieces = []
+    while pos < end:
+        run_end = state_run.match(html_content, pos, end).end()
+        pieces.append(html_content[pos:run_end])
+        pos = run_end
+        if pos >= end:
+            break
+        if literal := js_literal.match(html_content, pos, end):
+            pieces.append(js_literal_to_json[literal.group()])
+            pos = literal.end()
+        elif string := single_quoted.match(html_content, pos, end):
+            text = string.group(1).replace("\\'", "'").replace('"', '\\"')
+            pieces.append(f'"{text}"')
+            pos = string.end()
+        else:  # Unterminated string, leave it to the JSON decoder to report.
+            pieces.append(html_content[pos:end])
+            break
+    # Decoding stops at the end of the object, ignoring the rest of the script.
+    initial_state, _ = json.JSONDecoder().raw_decode("".join(pieces))
+    return initial_state
 
-        # Extract raw Javascript object
-        js_str = match.group(1)
-        stack = []
-        for i, char in enumerate(js_str):
-            if char == "{":
-                stack.append(char)
-            elif char == "}":
-                stack.pop()
-                if not stack:
-                    js_str = js_str[: i + 1]
-                    break
 
-        # Convert to valid JSON
-        js_str = (
-            js_str.replace("undefined", "null")
-            .replace("True", "true")
-            .replace("False", "false")
-            .replace("None", "null")
-        )
-
-        # Handle single quote
-        js_str = re.sub(r"'([^']*?)'(\s*:)", r'"\1"\2', js_str)
-        js_str = re.sub(
-            r":\s*'([^']*?)'",
-            lambda m: ': "' + m.group(1).replace('"', '\\"') + '"',
-            js_str,
-        )
-        return json.loads(js_str)
-    return None
+def extract_og_images(html_content: str) -> list[str]:
+    """
+    Extract URLs of images from <meta name="og:image" content="..."> tags.
+    """
+    images = []
+    for tag in og_image.finditer(html_content):
+        content = meta_content.search(tag.group())
+        if content:
+            images.append(html.unescape(content.group(2)))
+    return images
 
 
 def base36encode(number) -> str: